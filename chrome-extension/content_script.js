@@ -11,17 +11,41 @@ if (window.ytCommentsAnalyzerInitialized) {
     const SERVER_URL = "your_server_url"; // 실제 서버 URL로 변경 필요
     const SERVER_ANALYZE_URL = SERVER_URL + "/analyze";
     const SERVER_REPORT_WORD_URL = SERVER_URL + "/report_word";
+    const SERVER_PREFETCH_URL = SERVER_URL + "/prefetch";
+    // 서버 스케줄러의 클라이언트별 공정 분배에 쓰이는 식별자 (페이지 로드마다 새로 생성)
+    const CLIENT_ID = `yt-${Math.random().toString(36).slice(2, 10)}`;
     const COMMENTS_SECTION_SELECTOR = "ytd-comments#comments"; // 댓글 섹션 전체
     const COMMENT_WRAPPER_SELECTOR = "ytd-comment-thread-renderer, ytd-comment-view-model[is-reply]";
     const CONTENT_WRAPPER_SELECTOR = "#content-text";
     const TEXT_SPAN_SELECTOR = "span.yt-core-attributed-string"; // 실제 텍스트가 표시되는 span
 
+    // --- 배치/뷰포트 설정 ---
+    const VIEWPORT_ROOT_MARGIN = "800px 0px"; // 화면 위아래 800px 이내 댓글은 '보이는' 것으로 간주
+    const BATCH_MIN_SIZE = 1;
+    const BATCH_MAX_SIZE = 20;
+    const BATCH_INITIAL_SIZE = 5;
+    const BATCH_TARGET_LATENCY_MS = 1500; // 배치 응답이 이보다 빠르면 배치를 키우고, 느리면 줄인다
+    const BATCH_FLUSH_DELAY = 150; // 배치가 덜 찼을 때 추가 댓글을 기다리는 최대 시간
+    const PREFETCH_PAGE_SIZE = 50; // 화면 밖 댓글을 /prefetch로 한 번에 보내는 개수
+    const PREFETCH_FLUSH_DELAY = 1000;
+
     // currentCommentsData: key: contentId, value: { originalTextSnapshot, processed, sending, uiState, classification, userOverridden }
     let currentCommentsData = {};
-    let processingXHR = false; // 한 번에 하나의 서버 요청만 처리하기 위한 플래그
+    let processingXHR = false; // 한 번에 하나의 서버 요청(배치)만 처리하기 위한 플래그
     let commentObserver = null;
+    let viewportObserver = null; // 화면 근처 댓글을 우선 처리하기 위한 IntersectionObserver
     let debounceTimer = null;
-    let requestQueue = []; // 서버 요청 대기 큐 (개별 댓글 작업 객체 저장)
+    let visibleQueue = []; // 화면(근처)에 보이는 댓글 작업 큐 - 먼저 전송
+    let prefetchQueue = []; // 아직 화면 밖인 댓글 작업 큐 (/prefetch로 서버에 미리 분석 요청)
+    let prefetchedTasks = new Map(); // /prefetch로 보낸 뒤 화면에 들어오기를 기다리는 작업 (key: contentId)
+    let prefetchJobId = null; // 현재 영상의 서버측 사전 분석 작업 ID
+    let prefetchFlushTimer = null;
+    let pendingElements = new Set(); // MutationObserver가 새로 발견한, 아직 처리하지 않은 댓글 요소
+
+    // --- 적응형 배치 전송 ---
+    let currentBatchSize = BATCH_INITIAL_SIZE;
+    let batchFlushTimer = null;
+    let batchFlushDue = false;
 
     let isScraping = false; // 스크래핑 함수 실행 중 플래그
 
@@ -244,13 +268,38 @@ if (window.ytCommentsAnalyzerInitialized) {
     }
 
 
-    function sendCommentToServer(commentTask) {
-        console.log(`YouTube 댓글 분석기: 🚀 서버로 댓글 전송 시도 (ID: ${commentTask.id.slice(0, 50)}...)`);
+    function markTasksAsFailed(tasks) {
+        const failedIds = new Set();
+        tasks.forEach(task => {
+            failedIds.add(task.id);
+            if (currentCommentsData[task.id]) {
+                currentCommentsData[task.id].sending = false;
+                currentCommentsData[task.id].uiState = 'error';
+            }
+        });
+        restoreAllMatchingElementsToNormalOnError(failedIds);
+    }
+
+    function adjustBatchSize(latencyMs) {
+        // AIMD: 목표 지연 이내면 한 개씩 늘리고, 초과하면 절반으로 줄인다.
+        if (latencyMs <= BATCH_TARGET_LATENCY_MS) {
+            currentBatchSize = Math.min(BATCH_MAX_SIZE, currentBatchSize + 1);
+        } else {
+            currentBatchSize = Math.max(BATCH_MIN_SIZE, Math.floor(currentBatchSize / 2));
+        }
+    }
+
+    function sendBatchToServer(tasks) {
+        console.log(`YouTube 댓글 분석기: 🚀 서버로 댓글 ${tasks.length}개 전송 시도 (우선순위: ${tasks[0].priority}, 배치 크기: ${currentBatchSize})`);
+        const requestStartTime = performance.now();
 
         fetch(SERVER_ANALYZE_URL, {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ comments: [{ id: commentTask.id, text: commentTask.text, videoId: commentTask.videoId }] }),
+            body: JSON.stringify({
+                clientId: CLIENT_ID,
+                comments: tasks.map(task => ({ id: task.id, text: task.text, videoId: task.videoId, priority: task.priority }))
+            }),
         })
             .then(response => {
                 if (!response.ok) {
@@ -259,47 +308,56 @@ if (window.ytCommentsAnalyzerInitialized) {
                 return response.json();
             })
             .then(data => {
-                console.log("YouTube 댓글 분석기: ✅ 서버 응답 받음:", data);
-                if (data && data.comments && data.comments.length > 0) {
-                    const result = data.comments[0];
-                    if (currentCommentsData[result.id]) {
-                        currentCommentsData[result.id].processed = true;
-                        currentCommentsData[result.id].sending = false;
-                        currentCommentsData[result.id].classification = result.classification;
-                        // uiState will be set by applyCensorship or if user has overridden
-                        // If user has overridden, their choice takes precedence.
-                        if (!currentCommentsData[result.id].userOverridden) {
-                            currentCommentsData[result.id].uiState = result.classification === '혐오' ? 'processed_hate' : 'processed_normal';
-                        }
-                    }
-                    applyCensorshipToMatchingElements(result.id, result.classification, result.reason);
-                } else {
+                adjustBatchSize(performance.now() - requestStartTime);
+                if (!data || !Array.isArray(data.comments)) {
                     console.warn("YouTube 댓글 분석기: 서버 응답 형식이 잘못됨.", data);
-                    restoreAllMatchingElementsToNormalOnError(commentTask.id);
-                    if (currentCommentsData[commentTask.id]) {
-                        currentCommentsData[commentTask.id].sending = false;
-                        currentCommentsData[commentTask.id].uiState = 'error';
+                    markTasksAsFailed(tasks);
+                    return;
+                }
+                console.log(`YouTube 댓글 분석기: ✅ 서버 응답 받음 (${data.comments.length}개)`);
+
+                const resultsById = new Map();
+                data.comments.forEach(result => {
+                    if (!result || !currentCommentsData[result.id] || result.error) {
+                        return;
+                    }
+                    const entry = currentCommentsData[result.id];
+                    entry.processed = true;
+                    entry.sending = false;
+                    entry.classification = result.classification;
+                    // If user has overridden, their choice takes precedence.
+                    if (!entry.userOverridden) {
+                        entry.uiState = result.classification === '혐오' ? 'processed_hate' : 'processed_normal';
                     }
+                    resultsById.set(result.id, result);
+                });
+                applyResultsToMatchingElements(resultsById);
+
+                const missingTasks = tasks.filter(task => !resultsById.has(task.id));
+                if (missingTasks.length > 0) {
+                    markTasksAsFailed(missingTasks);
                 }
             })
             .catch(error => {
-                console.error(`YouTube 댓글 분석기: ❌ 서버 전송/처리 오류 (ID: ${commentTask.id.slice(0, 50)}):`, error);
-                restoreAllMatchingElementsToNormalOnError(commentTask.id);
-                if (currentCommentsData[commentTask.id]) {
-                    currentCommentsData[commentTask.id].sending = false;
-                    currentCommentsData[commentTask.id].uiState = 'error';
-                }
+                console.error(`YouTube 댓글 분석기: ❌ 서버 전송/처리 오류 (댓글 ${tasks.length}개):`, error);
+                adjustBatchSize(Infinity);
+                markTasksAsFailed(tasks);
             })
             .finally(() => {
-                console.log(`YouTube 댓글 분석기: 서버 요청 처리 완료 (ID: ${commentTask.id.slice(0, 50)}).`);
                 processingXHR = false;
                 processRequestQueue();
             });
     }
 
+    function takeNextBatch() {
+        // 화면 밖 댓글은 /prefetch로 서버 캐시를 데우고, 화면에 들어온 뒤에 /analyze로 결과를 받는다.
+        return visibleQueue.splice(0, currentBatchSize);
+    }
+
     function processRequestQueue() {
-        if (processingXHR || requestQueue.length === 0) {
-            if (requestQueue.length === 0 && !processingXHR) {
+        const queuedCount = visibleQueue.length;
+        if (processingXHR || queuedCount === 0) {
+            if (queuedCount === 0 && !processingXHR) {
                 if (queueFillStartTime && !queueProcessingFinished) {
                     const queueEmptyTime = performance.now();
                     const duration = (queueEmptyTime - queueFillStartTime) / 1000; // 초 단위
@@ -309,89 +367,212 @@ if (window.ytCommentsAnalyzerInitialized) {
             }
             return;
         }
+
+        // 배치가 덜 찼으면 잠시 모아서 보낸다 (뷰포트 판정도 이 사이에 도착).
+        const batchReady = visibleQueue.length >= currentBatchSize;
+        if (!batchReady && !batchFlushDue) {
+            if (!batchFlushTimer) {
+                batchFlushTimer = setTimeout(() => {
+                    batchFlushTimer = null;
+                    batchFlushDue = true;
+                    processRequestQueue();
+                }, BATCH_FLUSH_DELAY);
+            }
+            return;
+        }
+        clearTimeout(batchFlushTimer);
+        batchFlushTimer = null;
+        batchFlushDue = false;
+
+        const batch = takeNextBatch();
         processingXHR = true;
-        const nextTask = requestQueue.shift();
-        console.log(`YouTube 댓글 분석기: 큐에서 다음 작업 가져옴 (남은 큐: ${requestQueue.length}개), ID: ${nextTask.id.slice(0, 50)}`);
-        sendCommentToServer(nextTask);
+        console.log(`YouTube 댓글 분석기: 큐에서 ${batch.length}개 작업 가져옴 (남은 큐: ${visibleQueue.length}개, 사전 분석 대기: ${prefetchQueue.length + prefetchedTasks.size}개)`);
+        sendBatchToServer(batch);
     }
 
-    async function scrapeAndProcessComments() {
-        if (isScraping) {
-            return;
+    function enqueueTask(contentId, text, element) {
+        const priority = element.dataset.analyzerInViewport === 'true' ? 'visible' : 'prefetch';
+        const task = { id: contentId, text: text, videoId: getVideoId(), priority: priority };
+        if (priority === 'visible') {
+            visibleQueue.push(task);
+        } else {
+            prefetchQueue.push(task);
+            schedulePrefetchFlush();
         }
-        isScraping = true;
+    }
 
-        try {
-            const commentElements = document.querySelectorAll(COMMENT_WRAPPER_SELECTOR);
-            let newTasksAddedToQueue = 0;
+    function promoteTaskToVisible(contentId) {
+        let task = prefetchedTasks.get(contentId);
+        if (task) {
+            prefetchedTasks.delete(contentId);
+        } else {
+            const index = prefetchQueue.findIndex(queued => queued.id === contentId);
+            if (index === -1) {
+                return;
+            }
+            [task] = prefetchQueue.splice(index, 1);
+        }
+        task.priority = 'visible';
+        visibleQueue.push(task);
+    }
+
+    function schedulePrefetchFlush() {
+        if (!prefetchFlushTimer) {
+            prefetchFlushTimer = setTimeout(flushPrefetchQueue, PREFETCH_FLUSH_DELAY);
+        }
+    }
 
-            commentElements.forEach(el => {
-                const currentAnalyzerState = el.dataset.analyzerState;
-                const originalTextForThisComment = getOriginalTextFromElement(el) || el.dataset.originalContentAnalyzer;
+    // 화면 밖 댓글을 페이지 단위로 서버에 보내 백그라운드에서 미리 분석하게 한다 (결과는 서버 캐시에 저장).
+    function flushPrefetchQueue() {
+        prefetchFlushTimer = null;
+        if (prefetchQueue.length === 0) {
+            return;
+        }
+        const page = prefetchQueue.splice(0, PREFETCH_PAGE_SIZE);
+        page.forEach(task => prefetchedTasks.set(task.id, task));
 
-                if (!originalTextForThisComment) {
+        fetch(SERVER_PREFETCH_URL, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({
+                clientId: CLIENT_ID,
+                videoId: getVideoId(),
+                jobId: prefetchJobId,
+                comments: page.map(task => ({ id: task.id, text: task.text }))
+            }),
+        })
+            .then(response => response.json().then(data => ({ ok: response.ok, status: response.status, data })))
+            .then(({ ok, status, data }) => {
+                if (!ok) {
+                    // 한도 초과 등은 치명적이지 않음: 해당 댓글은 화면에 들어올 때 /analyze로 분석된다.
+                    console.warn(`YouTube 댓글 분석기: 사전 분석 요청 거절 (${status})`, data);
                     return;
                 }
+                prefetchJobId = data.jobId;
+                console.log(`YouTube 댓글 분석기: 사전 분석 진행 ${data.done}/${data.total} (작업: ${data.jobId.slice(0, 8)})`);
+            })
+            .catch(error => console.warn("YouTube 댓글 분석기: 사전 분석 요청 실패", error))
+            .finally(() => {
+                if (prefetchQueue.length > 0) {
+                    schedulePrefetchFlush();
+                }
+            });
+    }
 
-                const contentId = generateCommentId(originalTextForThisComment);
-                if (!contentId) {
-                    return;
+    // 다른 영상으로 이동하면 서버에 남은 사전 분석을 취소한다.
+    function cancelPrefetchJob() {
+        clearTimeout(prefetchFlushTimer);
+        prefetchFlushTimer = null;
+        // 버리는 작업의 댓글은 '전송 중' 표시를 풀어야 같은 영상으로 돌아왔을 때 다시 큐에 들어간다.
+        [...prefetchQueue, ...prefetchedTasks.values()].forEach(task => {
+            const entry = currentCommentsData[task.id];
+            if (entry && !entry.processed) {
+                entry.sending = false;
+                entry.uiState = null;
+            }
+        });
+        prefetchQueue = [];
+        prefetchedTasks.clear();
+        if (!prefetchJobId) {
+            return;
+        }
+        const jobId = prefetchJobId;
+        prefetchJobId = null;
+        fetch(`${SERVER_PREFETCH_URL}/${jobId}?clientId=${encodeURIComponent(CLIENT_ID)}`, { method: "DELETE", keepalive: true })
+            .catch(error => console.warn("YouTube 댓글 분석기: 사전 분석 취소 실패", error));
+    }
+
+    // 댓글 요소 하나를 상태에 맞게 갱신하고, 새 작업이 큐에 들어갔으면 true를 반환한다.
+    function processCommentElement(el) {
+        const currentAnalyzerState = el.dataset.analyzerState;
+        const originalTextForThisComment = getOriginalTextFromElement(el) || el.dataset.originalContentAnalyzer;
+
+        if (!originalTextForThisComment) {
+            return false;
+        }
+
+        const contentId = generateCommentId(originalTextForThisComment);
+        if (!contentId) {
+            return false;
+        }
+
+        if (!el.dataset.originalContentAnalyzer) {
+            el.dataset.originalContentAnalyzer = originalTextForThisComment;
+        }
+
+        const commentDataEntry = currentCommentsData[contentId];
+        let queued = false;
+
+        if (commentDataEntry) {
+            if (commentDataEntry.userOverridden) {
+                if (commentDataEntry.classification === '혐오') {
+                    if (currentAnalyzerState !== 'processed_hate_user_viewing') {
+                        showOriginalHateCommentWithHideButton(el);
+                    }
+                } else { // User considered it normal
+                    if (currentAnalyzerState !== 'processed_normal') {
+                        restoreElementUIToNormal(el); // Don't pass fromUserAction
+                    }
                 }
+                addCustomActionButtonToComment(el);
+                return false;
+            }
 
-                if (!el.dataset.originalContentAnalyzer) {
-                    el.dataset.originalContentAnalyzer = originalTextForThisComment;
+            if (commentDataEntry.processed) {
+                if (commentDataEntry.classification === "혐오" && currentAnalyzerState !== 'processed_hate') {
+                    setElementUIToCensored(el);
+                } else if (commentDataEntry.classification === "정상" && currentAnalyzerState !== 'processed_normal') {
+                    restoreElementUIToNormal(el);
                 }
+            } else if (commentDataEntry.sending) {
+                if (currentAnalyzerState !== 'checking') {
+                    setElementUIToChecking(el, commentDataEntry.originalTextSnapshot);
+                }
+            } else {
+                setElementUIToChecking(el, commentDataEntry.originalTextSnapshot);
+                currentCommentsData[contentId].sending = true;
+                currentCommentsData[contentId].uiState = 'checking';
+                enqueueTask(contentId, commentDataEntry.originalTextSnapshot, el);
+                queued = true;
+            }
+        } else {
+            setElementUIToChecking(el, originalTextForThisComment);
+            currentCommentsData[contentId] = {
+                originalTextSnapshot: originalTextForThisComment,
+                processed: false,
+                sending: true,
+                uiState: 'checking',
+                classification: null,
+                userOverridden: false
+            };
+            enqueueTask(contentId, originalTextForThisComment, el);
+            queued = true;
+        }
+        addCustomActionButtonToComment(el);
+        return queued;
+    }
 
-                const commentDataEntry = currentCommentsData[contentId];
-
-                if (commentDataEntry) {
-                    if (commentDataEntry.userOverridden) {
-                        // START OF MODIFIED SECTION: Handle user override for hate comments (show with "Hide Again")
-                        if (commentDataEntry.classification === '혐오') {
-                            if (currentAnalyzerState !== 'processed_hate_user_viewing') {
-                                showOriginalHateCommentWithHideButton(el);
-                            }
-                        } else { // User considered it normal
-                            if (currentAnalyzerState !== 'processed_normal') {
-                                restoreElementUIToNormal(el); // Don't pass fromUserAction
-                            }
-                        }
-                        // END OF MODIFIED SECTION
-                        addCustomActionButtonToComment(el);
-                        return;
-                    }
+    function processPendingElements() {
+        if (isScraping) {
+            return;
+        }
+        isScraping = true;
 
-                    if (commentDataEntry.processed) {
-                        if (commentDataEntry.classification === "혐오" && currentAnalyzerState !== 'processed_hate') {
-                            setElementUIToCensored(el);
-                        } else if (commentDataEntry.classification === "정상" && currentAnalyzerState !== 'processed_normal') {
-                            restoreElementUIToNormal(el);
-                        }
-                    } else if (commentDataEntry.sending) {
-                        if (currentAnalyzerState !== 'checking') {
-                            setElementUIToChecking(el, commentDataEntry.originalTextSnapshot);
-                        }
-                    } else {
-                        setElementUIToChecking(el, commentDataEntry.originalTextSnapshot);
-                        currentCommentsData[contentId].sending = true;
-                        currentCommentsData[contentId].uiState = 'checking';
-                        requestQueue.push({ id: contentId, text: commentDataEntry.originalTextSnapshot, videoId: getVideoId() });
-                        newTasksAddedToQueue++;
-                    }
-                } else {
-                    setElementUIToChecking(el, originalTextForThisComment);
-                    currentCommentsData[contentId] = {
-                        originalTextSnapshot: originalTextForThisComment,
-                        processed: false,
-                        sending: true,
-                        uiState: 'checking',
-                        classification: null,
-                        userOverridden: false
-                    };
-                    requestQueue.push({ id: contentId, text: originalTextForThisComment, videoId: getVideoId() });
+        try {
+            const elements = Array.from(pendingElements);
+            pendingElements.clear();
+            let newTasksAddedToQueue = 0;
+
+            elements.forEach(el => {
+                if (!el.isConnected) {
+                    return;
+                }
+                if (viewportObserver) {
+                    viewportObserver.observe(el);
+                }
+                if (processCommentElement(el)) {
                     newTasksAddedToQueue++;
                 }
-                addCustomActionButtonToComment(el);
             });
 
             if (newTasksAddedToQueue > 0) {
@@ -401,58 +582,71 @@ if (window.ytCommentsAnalyzerInitialized) {
                 processRequestQueue();
             }
         } catch (error) {
-            console.error("YouTube 댓글 분석기: scrapeAndProcessComments 중 오류 발생", error);
+            console.error("YouTube 댓글 분석기: processPendingElements 중 오류 발생", error);
         } finally {
             isScraping = false;
+            if (pendingElements.size > 0) {
+                schedulePendingProcessing();
+            }
         }
     }
 
+    function schedulePendingProcessing() {
+        clearTimeout(debounceTimer);
+        debounceTimer = setTimeout(processPendingElements, DEBOUNCE_DELAY);
+    }
+
+    // 초기 진입 시 한 번만 전체 댓글을 훑는다. 이후에는 새로 추가된 노드만 처리한다.
+    function scrapeAndProcessComments() {
+        document.querySelectorAll(COMMENT_WRAPPER_SELECTOR).forEach(el => pendingElements.add(el));
+        processPendingElements();
+    }
+
+
+    function applyCensorshipToElement(el, targetContentId, classification) {
+        const commentData = currentCommentsData[targetContentId];
+        if (commentData && commentData.userOverridden) {
+            // If user is viewing a hate comment or marked it as normal, keep user's choice.
+            return;
+        }
+
+        if (el.dataset.analyzerState === 'checking' || (commentData && commentData.classification !== classification) ||
+            (classification === "혐오" && el.dataset.analyzerState !== 'processed_hate') ||
+            (classification === "정상" && el.dataset.analyzerState !== 'processed_normal')) {
+            if (classification === "정상") {
+                restoreElementUIToNormal(el);
+            } else if (classification === "혐오") {
+                setElementUIToCensored(el);
+            } else {
+                console.warn(`YouTube 댓글 분석기: 알 수 없는 분류 (${classification}), 정상으로 처리.`);
+                restoreElementUIToNormal(el);
+            }
+        }
+    }
 
-    function applyCensorshipToMatchingElements(targetContentId, classification, reason) {
-        let updatedCount = 0;
+    // 배치 응답 전체를 DOM 한 번 순회로 반영한다.
+    function applyResultsToMatchingElements(resultsById) {
+        if (resultsById.size === 0) {
+            return;
+        }
         document.querySelectorAll(COMMENT_WRAPPER_SELECTOR).forEach(el => {
             const originalTextForThisElement = getOriginalTextFromElement(el) || el.dataset.originalContentAnalyzer;
             const elContentId = generateCommentId(originalTextForThisElement);
-
-            if (elContentId === targetContentId) {
-                const commentData = currentCommentsData[targetContentId];
-                if (commentData && commentData.userOverridden) {
-                    // START OF MODIFIED SECTION: If user is viewing a hate comment, server result shouldn't change it back to censored
-                    if (commentData.classification === '혐오' && el.dataset.analyzerState === 'processed_hate_user_viewing') {
-                        // console.log(`YouTube 댓글 분석기: 사용자 원본 보기 상태 유지 (ID: ${targetContentId.slice(0,50)})`);
-                        return; // Keep user's choice to view original
-                    }
-                    // If user marked as normal, restoreElementUIToNormal would have handled it.
-                    // console.log(`YouTube 댓글 분석기: 사용자 복원 상태이므로 서버 결과(${classification}) 무시 (ID: ${targetContentId.slice(0,50)})`);
-                    // END OF MODIFIED SECTION
-                    return;
-                }
-
-                if (el.dataset.analyzerState === 'checking' || (commentData && commentData.classification !== classification) ||
-                    (classification === "혐오" && el.dataset.analyzerState !== 'processed_hate') ||
-                    (classification === "정상" && el.dataset.analyzerState !== 'processed_normal')) {
-                    if (classification === "정상") {
-                        restoreElementUIToNormal(el);
-                    } else if (classification === "혐오") {
-                        setElementUIToCensored(el);
-                    } else {
-                        console.warn(`YouTube 댓글 분석기: 알 수 없는 분류 (${classification}), 정상으로 처리.`);
-                        restoreElementUIToNormal(el);
-                    }
-                    updatedCount++;
-                }
+            const result = elContentId && resultsById.get(elContentId);
+            if (result) {
+                applyCensorshipToElement(el, elContentId, result.classification);
             }
         });
     }
 
-    function restoreAllMatchingElementsToNormalOnError(targetContentId) {
-        console.warn(`YouTube 댓글 분석기: 오류 발생, ID ${targetContentId.slice(0, 50)} 관련 댓글 원상 복구 시도.`);
+    function restoreAllMatchingElementsToNormalOnError(targetContentIds) {
+        console.warn(`YouTube 댓글 분석기: 오류 발생, 댓글 ${targetContentIds.size}개 관련 요소 원상 복구 시도.`);
         let restoredCount = 0;
         document.querySelectorAll(COMMENT_WRAPPER_SELECTOR).forEach(el => {
             const originalTextForThisElement = getOriginalTextFromElement(el) || el.dataset.originalContentAnalyzer;
             const elContentId = generateCommentId(originalTextForThisElement);
 
-            if (elContentId === targetContentId) {
+            if (targetContentIds.has(elContentId)) {
                 if (el.dataset.analyzerState === 'checking') {
                     restoreElementUIToNormal(el);
                     el.dataset.analyzerState = 'error_restored';
@@ -461,36 +655,54 @@ if (window.ytCommentsAnalyzerInitialized) {
             }
         });
         if (restoredCount > 0) {
-            console.log(`YouTube 댓글 분석기: ${restoredCount}개 요소 오류로 인해 원상 복구됨 (ID: ${targetContentId.slice(0, 50)})`);
+            console.log(`YouTube 댓글 분석기: ${restoredCount}개 요소 오류로 인해 원상 복구됨`);
         }
     }
 
 
     function handleCommentMutations(mutationsList) {
-        let newRelevantChanges = false;
+        const sizeBefore = pendingElements.size;
         for (const mutation of mutationsList) {
-            if (mutation.type === "childList" && mutation.addedNodes.length > 0) {
+            if (mutation.type === "childList") {
                 for (const node of mutation.addedNodes) {
-                    if (node.nodeType === Node.ELEMENT_NODE && (node.matches(COMMENT_WRAPPER_SELECTOR) || node.querySelector(COMMENT_WRAPPER_SELECTOR))) {
-                        newRelevantChanges = true;
-                        break;
+                    if (node.nodeType !== Node.ELEMENT_NODE) {
+                        continue;
+                    }
+                    if (node.matches(COMMENT_WRAPPER_SELECTOR)) {
+                        pendingElements.add(node);
                     }
+                    node.querySelectorAll(COMMENT_WRAPPER_SELECTOR).forEach(el => pendingElements.add(el));
                 }
-            }
-            if (mutation.type === "characterData" && mutation.target.parentElement.closest(COMMENT_WRAPPER_SELECTOR)) {
-                const commentWrapper = mutation.target.parentElement.closest(COMMENT_WRAPPER_SELECTOR);
+            } else if (mutation.type === "characterData") {
+                const commentWrapper = mutation.target.parentElement?.closest(COMMENT_WRAPPER_SELECTOR);
+                // 아직 분석되지 않았거나 오류로 복구된 댓글만 다시 본다 (편집/입력 중인 텍스트는 무시).
                 if (commentWrapper && (!commentWrapper.dataset.analyzerState || commentWrapper.dataset.analyzerState === 'error_restored')) {
-                    newRelevantChanges = true;
+                    pendingElements.add(commentWrapper);
                 }
             }
-            if (newRelevantChanges) break;
         }
 
-        if (newRelevantChanges) {
-            clearTimeout(debounceTimer);
-            debounceTimer = setTimeout(() => {
-                scrapeAndProcessComments();
-            }, DEBOUNCE_DELAY);
+        if (pendingElements.size > sizeBefore) {
+            schedulePendingProcessing();
+        }
+    }
+
+    function handleViewportChanges(entries) {
+        let promoted = false;
+        for (const entry of entries) {
+            const el = entry.target;
+            el.dataset.analyzerInViewport = entry.isIntersecting ? 'true' : 'false';
+            if (!entry.isIntersecting || el.dataset.analyzerState !== 'checking') {
+                continue;
+            }
+            const contentId = generateCommentId(el.dataset.originalContentAnalyzer);
+            if (contentId) {
+                promoteTaskToVisible(contentId);
+                promoted = true;
+            }
+        }
+        if (promoted) {
+            processRequestQueue();
         }
     }
 
@@ -502,16 +714,25 @@ if (window.ytCommentsAnalyzerInitialized) {
             return;
         }
 
-        console.log("YouTube 댓글 분석기: ✅ 댓글 섹션 발견. 초기 댓글 스캔 및 MutationObserver 시작.");
+        console.log("YouTube 댓글 분석기: ✅ 댓글 섹션 발견. 초기 댓글 스캔 및 MutationObserver/IntersectionObserver 시작.");
+
+        if (viewportObserver) viewportObserver.disconnect();
+        viewportObserver = new IntersectionObserver(handleViewportChanges, { rootMargin: VIEWPORT_ROOT_MARGIN });
+
         scrapeAndProcessComments();
 
         if (commentObserver) commentObserver.disconnect();
         commentObserver = new MutationObserver(handleCommentMutations);
         commentObserver.observe(commentsSectionElement, { childList: true, subtree: true, characterData: true });
 
+        document.addEventListener('yt-navigate-start', cancelPrefetchJob);
+
         window.addEventListener('unload', () => {
+            cancelPrefetchJob();
             if (commentObserver) commentObserver.disconnect();
+            if (viewportObserver) viewportObserver.disconnect();
             clearTimeout(debounceTimer);
+            clearTimeout(batchFlushTimer);
         });
     }
 
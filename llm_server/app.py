@@ -1,6 +1,9 @@
 # app.py
 import os
-from flask import Flask, request, jsonify, make_response
+import functools
+import hmac
+import json
+from flask import Flask, request, jsonify, make_response, send_from_directory, abort
 from flask_cors import CORS
 import llm_analyzer
 import config
@@ -12,6 +15,10 @@ from db import init_db, db, add_report, get_word_report_count, get_reason_list_f
 
 # 새로 만든 모듈에서 함수 import
 from vectorDB_update import process_triggered_report 
+from scheduler import AnalysisScheduler, PRIORITY_VISIBLE
+from prefetch import PrefetchManager, PrefetchQuotaError, extract_prefetch_texts
+import resources
+import profiler
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///reports.db'
@@ -25,13 +32,23 @@ if not app.debug:
     app.logger.setLevel(logging.INFO)
 
 components_initialized = False
+analysis_scheduler = None
+prefetch_manager = None
+memory_guard = None
 
 def initialize_app_components():
-    global components_initialized
+    global components_initialized, analysis_scheduler, prefetch_manager, memory_guard
     if not components_initialized:
         app.logger.info("Flask 앱: LLM 구성 요소 초기화 시작...")
         app.logger.info(f"Flask 앱: 사용 장치: {config.DEVICE}")
         if llm_analyzer.initialize_llm_components():
+            analysis_scheduler = AnalysisScheduler()
+            analysis_scheduler.start()
+            prefetch_manager = PrefetchManager(analysis_scheduler)
+            # 메모리 예산을 넘으면 먼저 판정 캐시를 비우고, 그래도 넘으면 새 요청을 503으로 거절
+            memory_guard = resources.MemoryGuard(on_pressure=analysis_scheduler.cache.clear)
+            # ADMIN_TOKEN이 있을 때만 시간 구간 프로파일 트리거 파일을 감시
+            profiler.start_trigger_watcher()
             components_initialized = True
             app.logger.info("Flask 앱: LLM 구성 요소 초기화 완료.")
         else:
@@ -39,7 +56,80 @@ def initialize_app_components():
     else:
         app.logger.info("Flask 앱: LLM 구성 요소 이미 초기화됨.")
 
+def is_admin_request() -> bool:
+    if not config.ADMIN_TOKEN:
+        return False
+    token = request.headers.get('X-Admin-Token', '')
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        token = auth_header[len('Bearer '):]
+    return hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode())
+
+
+def admin_required(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not config.ADMIN_TOKEN:
+            abort(404) # 관리자 기능이 꺼져 있으면 존재 자체를 드러내지 않음
+        if not is_admin_request():
+            return jsonify({"error": "관리자 토큰이 필요합니다."}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def profile_if_requested(view):
+    """?profile=1인 관리자 요청만 샘플링 프로파일러로 감싸고, 응답 JSON에 프로파일 요약과 결과 파일 이름을 넣습니다."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'POST' or request.args.get('profile') != '1':
+            return view(*args, **kwargs)
+        if not is_admin_request():
+            return jsonify({"error": "프로파일링은 관리자 토큰이 필요합니다."}), 403
+        session = profiler.start_session("analyze")
+        if session is None:
+            return jsonify({"error": "이미 다른 프로파일링이 진행 중입니다."}), 409
+        try:
+            response = make_response(view(*args, **kwargs))
+        finally:
+            profile_summary = profiler.finish_session(session)
+        payload = response.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload["profile"] = profile_summary
+            response.set_data(json.dumps(payload, ensure_ascii=False))
+        return response
+    return wrapper
+
+
+@app.route('/admin/profile/window', methods=['POST'])
+@admin_required
+def profile_window_endpoint():
+    """모든 워커 프로세스에서 지정한 시간 동안 프로파일링합니다. 결과는 /admin/profiles에 워커별로 생깁니다."""
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get('seconds', 30))
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds는 숫자여야 합니다."}), 400
+    trigger = profiler.request_window(seconds)
+    app.logger.info(f"시간 구간 프로파일 요청: {trigger}")
+    return jsonify(trigger), 202
+
+
+@app.route('/admin/profiles', methods=['GET'])
+@admin_required
+def profile_list_endpoint():
+    return jsonify({"profiles": profiler.list_artifacts()})
+
+
+@app.route('/admin/profiles/<name>', methods=['GET'])
+@admin_required
+def profile_download_endpoint(name):
+    if not profiler.ARTIFACT_NAME_PATTERN.match(name):
+        abort(404)
+    return send_from_directory(config.PROFILE_DIR, name, as_attachment=True)
+
+
 @app.route('/analyze', methods=['POST', 'OPTIONS'])
+@profile_if_requested
 def analyze_comment_endpoint():
     if request.method == 'OPTIONS':
         response = make_response()
@@ -59,6 +149,10 @@ def analyze_comment_endpoint():
         app.logger.warning("'/analyze' 요청: 분석기 준비 안됨. 503 반환.")
         return jsonify({"error": "분석기 준비 안됨. 초기화 실패 또는 진행 중일 수 있습니다."}), 503
 
+    if memory_guard.over_budget():
+        app.logger.warning("'/analyze' 요청: 메모리 예산 초과. 503 반환.")
+        return memory_over_budget_response()
+
     if not request.is_json:
         app.logger.warning("'/analyze' 요청: JSON 형식이 아님. 400 반환.")
         return jsonify({"error": "요청은 JSON 형식이어야 합니다."}), 400
@@ -79,17 +173,30 @@ def analyze_comment_endpoint():
         app.logger.warning(f"'/analyze' 요청: 잘못된 'comments' 필드 (리스트가 아님). 요청 데이터: {data}")
         return jsonify({"error": "잘못된 'comments' 필드, 댓글 객체의 배열이어야 합니다."}), 400
 
-    app.logger.info(f"{len(comments_to_analyze)}개 댓글 분석 시작...")
+    client_id = get_client_id(data)
+
+    app.logger.info(f"{len(comments_to_analyze)}개 댓글 분석 시작... (client: {client_id})")
     processed_results = []
     total_processing_time = 0
 
+    # 1) 유효한 댓글을 모두 스케줄러에 제출 (KoELECTRA micro-batch / LLM 호출 순서는 스케줄러가 결정)
+    submitted = []
     for i, comment_data in enumerate(comments_to_analyze):
-        start_time = time.time()
         comment_text = comment_data.get('text')
         comment_id = comment_data.get('id', f"unknown_id_{i}") # ID가 없으면 임시 ID 생성
 
         if not comment_text or not isinstance(comment_text, str):
             app.logger.warning(f"잘못된 댓글 텍스트 (ID: {comment_id}): {comment_text}")
+            submitted.append((comment_id, comment_text, None, 0))
+            continue
+
+        priority = comment_data.get('priority', PRIORITY_VISIBLE)
+        future = analysis_scheduler.submit(comment_text, client_id, priority)
+        submitted.append((comment_id, comment_text, future, time.time()))
+
+    # 2) 제출 순서대로 결과 수집
+    for comment_id, comment_text, future, start_time in submitted:
+        if future is None:
             # 클라이언트가 이 형식으로 오류를 처리할 수 있도록 함
             processed_results.append({
                 "id": comment_id,
@@ -99,11 +206,9 @@ def analyze_comment_endpoint():
             })
             continue
 
-        #app.logger.info(f"댓글 분석 중 (ID: {comment_id}, 텍스트 일부: {comment_text[:50]}...)")
+        analysis_result = {}
         try:
-            # 각 댓글을 llm_analyzer로 개별 분석
-            analysis_result = llm_analyzer.analyze_comment(comment_text)
-            #app.logger.info(f"ID {comment_id} 분석 결과: {analysis_result}")
+            analysis_result = future.result(timeout=config.ANALYZE_TIMEOUT_SECONDS)
 
             is_hateful = analysis_result.get("classification", "불명확") == "혐오"
             
@@ -122,6 +227,7 @@ def analyze_comment_endpoint():
                 "is_hateful": is_hateful,
                 "classification": analysis_result.get("classification", "불명확"),
                 "reason": analysis_result.get("reason", "파싱 실패"),
+                "degraded": analysis_result.get("degraded", False), # LLM 없이 간이 판정된 경우 True
                 # "raw_llm_output": analysis_result.get("raw_llm_output", ""), # 필요에 따라 포함
                 # "koelectra_output": analysis_result.get("koelectra_output", "") # 필요에 따라 포함
             })
@@ -138,11 +244,8 @@ def analyze_comment_endpoint():
         end_time = time.time()
         processing_time = end_time - start_time
         total_processing_time += processing_time
-        # ✅ 깔끔한 로그 출력 (이모지 포함)
-        print("\n📝 [분석 결과]")
-        print(f'💬 댓글: "{comment_text[:50]}{"..." if len(comment_text) > 50 else ""}"')
-        print(f'🧠 판단 사유: {analysis_result.get("reason", "❌ 파싱 실패")}')
-        print(f'⏱️ 처리 시간: {processing_time:.2f}초')
+        # 댓글별 판정 기록은 스케줄러가 감사 로그(audit_log.py)에 비동기로 남김
+        app.logger.debug(f"댓글 (ID: {comment_id}) 처리 시간: {processing_time:.2f}초 → {processed_results[-1].get('classification')}")
 
     app.logger.info(f"\n총 {len(comments_to_analyze)}개 댓글 처리 완료. 총 소요 시간: {total_processing_time:.2f}초")
     
@@ -153,6 +256,65 @@ def analyze_comment_endpoint():
     return response
 
 
+def memory_over_budget_response():
+    response = jsonify({"error": "서버 메모리 사용량이 많아 잠시 요청을 받을 수 없습니다."})
+    response.headers['Retry-After'] = str(max(1, int(config.MEMORY_CHECK_INTERVAL_SECONDS)))
+    return response, 503
+
+
+def get_client_id(data) -> str:
+    # 요청 단위 클라이언트 식별자: 확장이 보낸 clientId > 헤더 > IP 순
+    client_id = data.get('clientId') if isinstance(data, dict) else None
+    return client_id or request.headers.get('X-Client-Id') or request.remote_addr or "anonymous"
+
+
+@app.route('/prefetch', methods=['POST'])
+def prefetch_endpoint():
+    """영상의 댓글 묶음(또는 그 다음 페이지)을 낮은 우선순위로 미리 분석해 캐시에 넣습니다."""
+    if not components_initialized:
+        return jsonify({"error": "분석기 준비 안됨. 초기화 실패 또는 진행 중일 수 있습니다."}), 503
+
+    if memory_guard.over_budget():
+        return memory_over_budget_response()
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('comments'), list):
+        return jsonify({"error": "잘못된 'comments' 필드, 댓글 객체의 배열이어야 합니다."}), 400
+
+    client_id = get_client_id(data)
+    video_id = data.get('videoId', 'unknown_video_id')
+    texts, skipped = extract_prefetch_texts(data['comments'])
+    if not texts:
+        return jsonify({"error": "사전 분석할 댓글이 없습니다.", "skipped": skipped}), 400
+
+    try:
+        job = prefetch_manager.submit(client_id, video_id, texts, job_id=data.get('jobId'))
+    except KeyError:
+        return jsonify({"error": "존재하지 않는 사전 분석 작업입니다."}), 404
+    except PrefetchQuotaError as e:
+        app.logger.warning(f"'/prefetch' 한도 초과 (client: {client_id}, video: {video_id}): {e}")
+        return jsonify({"error": str(e)}), 429
+
+    response = job.to_dict()
+    response["skipped"] = skipped
+    return jsonify(response), 202
+
+
+@app.route('/prefetch/<job_id>', methods=['GET', 'DELETE'])
+def prefetch_job_endpoint(job_id):
+    if not components_initialized:
+        return jsonify({"error": "분석기 준비 안됨. 초기화 실패 또는 진행 중일 수 있습니다."}), 503
+
+    client_id = get_client_id(request.args)
+    if request.method == 'DELETE':
+        job = prefetch_manager.cancel(job_id, client_id)
+    else:
+        job = prefetch_manager.get(job_id, client_id)
+    if job is None:
+        return jsonify({"error": "존재하지 않는 사전 분석 작업입니다."}), 404
+    return jsonify(job.to_dict())
+
+
 @app.route("/report_word", methods=["POST"])
 def report_word():
     data = request.json
@@ -181,6 +343,9 @@ def report_word():
             
             if success:
                 app.logger.info(f"단어 '{word}' 자동 처리 성공.")
+                if analysis_scheduler is not None:
+                    # 사전이 바뀌었으므로 이전 판정은 더 이상 유효하지 않을 수 있음
+                    analysis_scheduler.cache.clear()
             else:
                 app.logger.error(f"단어 '{word}' 자동 처리 중 문제 발생. vectorDB_update.py 로그 확인 필요.")
                 # 실패 시 어떤 응답을 줄지, DB에서 신고 기록을 어떻게 할지 정책 필요
@@ -198,6 +363,8 @@ if __name__ == '__main__':
     app.logger.handlers.extend(gunicorn_logger.handlers) # gunicorn 로거와 핸들러 공유 (선택 사항)
     app.logger.setLevel(logging.INFO) # INFO 레벨 명시적 설정
 
+    # 코어 고정/스레드 수는 모델 로드와 스레드 풀 생성 전에 적용해야 새 스레드들이 물려받음
+    resources.apply_resource_limits()
     initialize_app_components()
     port = int(os.environ.get("PORT", 5000))
     app.logger.info(f"Flask 서버 시작 중... http://0.0.0.0:{port}")
@@ -0,0 +1,244 @@
+# audit_log.py
+"""
+댓글 판정 감사 로그.
+
+요청 스레드는 메모리 링 버퍼(deque)에 기록만 하고, 백그라운드 스레드가 모아서 SQLite 또는 회전 JSONL 파일에 씁니다.
+버퍼가 가득 차면 가장 오래된 기록부터 버리므로(버린 개수는 stats에 표시) 디스크가 느려도 분석 요청은 막히지 않습니다.
+댓글 원문은 저장하지 않고 정규화된 텍스트의 해시(판정 캐시 키와 동일)만 남깁니다.
+
+    python audit_log.py summary --hours 24    # 경로(tier)별 건수/지연, 판정 분포 (SQLite 저장소)
+"""
+import argparse
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+
+import config
+from verdict_cache import make_cache_key
+
+logger = logging.getLogger(__name__)
+
+# 판정이 만들어진 경로
+TIER_CACHE = "cache"
+TIER_BYPASS = "bypass"
+TIER_LLM = "llm"
+TIER_DEGRADED = "degraded"
+TIER_SHED = "shed"
+TIER_ERROR = "error"
+
+_COLUMNS = ("ts", "text_hash", "client_id", "priority", "tier", "classification", "probs", "latency_ms",
+            "model_version", "index_version")
+
+
+def model_version() -> str:
+    return f"{config.OPENAI_MODEL_NAME}+{config.KOELECTRA_FINETUNED_REPO_ID}/{config.KOELECTRA_FINETUNED_FILENAME}"
+
+
+def index_version() -> str:
+    """현재 로드된 인덱스 종류/크기와 임베딩 설정. 사전이 갱신되면 ntotal이 바뀌어 구분됩니다."""
+    import llm_analyzer  # llm_analyzer가 로드한 vectorstore를 읽기만 함
+
+    vectorstore = llm_analyzer.vectorstore
+    if vectorstore is None:
+        return "unloaded"
+    import index_builder
+
+    return (f"{index_builder.index_type_of(vectorstore.index)}:{vectorstore.index.ntotal}:"
+            f"{config.EMBEDDING_BACKEND}:{config.EMBEDDING_DIM or 'full'}")
+
+
+class SQLiteSink:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False) # flush 스레드 전용
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, text_hash TEXT NOT NULL, "
+            "client_id TEXT, priority TEXT, tier TEXT NOT NULL, classification TEXT, probs TEXT, latency_ms REAL, "
+            "model_version TEXT, index_version TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_ts ON verdicts (ts)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_text_hash ON verdicts (text_hash)")
+        self._conn.commit()
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        rows = [tuple(json.dumps(r[c]) if c == "probs" else r[c] for c in _COLUMNS) for r in records]
+        with self._conn:  # 한 트랜잭션으로 묶어 쓰기
+            self._conn.executemany(
+                f"INSERT INTO verdicts ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' for _ in _COLUMNS)})", rows
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class JSONLSink:
+    """크기 기준으로 회전하는 JSONL 파일 (logging의 RotatingFileHandler 재사용)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=config.AUDIT_JSONL_MAX_BYTES, backupCount=config.AUDIT_JSONL_BACKUP_COUNT, encoding="utf-8"
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            self._handler.emit(logging.makeLogRecord({"msg": json.dumps(record, ensure_ascii=False)}))
+        self._handler.flush()
+
+    def close(self) -> None:
+        self._handler.close()
+
+
+class AuditLog:
+    def __init__(self, sink, buffer_size: int = config.AUDIT_BUFFER_SIZE,
+                 flush_interval: float = config.AUDIT_FLUSH_INTERVAL_SECONDS,
+                 flush_batch_size: int = config.AUDIT_FLUSH_BATCH_SIZE):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()  # 버퍼와 written/dropped 카운터를 함께 보호
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._flush_loop, name="audit-log-flush", daemon=True)
+        self._thread.start()
+
+    def record(self, text: str, tier: str, result: Optional[Dict[str, Any]] = None, probs: Optional[List[float]] = None,
+               latency: float = 0.0, client_id: str = "", priority: str = "") -> None:
+        """요청 스레드에서 호출합니다. I/O 없이 버퍼에 넣기만 합니다."""
+        entry = {
+            "ts": time.time(),
+            "text_hash": make_cache_key(text),
+            "client_id": client_id,
+            "priority": priority,
+            "tier": tier,
+            "classification": (result or {}).get("classification", "오류"),
+            "probs": [round(float(p), 4) for p in probs] if probs is not None else None,
+            "latency_ms": round(latency * 1000, 2),
+            "model_version": model_version(),
+            "index_version": index_version(),
+        }
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1  # deque(maxlen)이 가장 오래된 기록을 버림
+            self._buffer.append(entry)
+            should_flush = len(self._buffer) >= self.flush_batch_size
+        if should_flush:
+            self._wakeup.set()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = min(len(self._buffer), self.flush_batch_size)
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def flush(self) -> None:
+        while True:
+            records = self._drain()
+            if not records:
+                return
+            try:
+                self.sink.write(records)
+                with self._lock:
+                    self.written += len(records)
+            except Exception as e:
+                with self._lock:
+                    self.dropped += len(records)
+                logger.error(f"감사 로그 {len(records)}건 저장 실패: {e}", exc_info=True)
+
+    def _flush_loop(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        self.sink.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"buffered": len(self._buffer), "written": self.written, "dropped": self.dropped}
+
+
+# --- 프로세스 전역 감사 로그 ---
+_audit_log: Optional[AuditLog] = None
+_audit_log_lock = threading.Lock()
+
+
+def _create_sink():
+    if config.AUDIT_LOG_SINK == "sqlite":
+        return SQLiteSink(config.AUDIT_LOG_PATH or str(config.BASE_DIR / "audit_log.db"))
+    if config.AUDIT_LOG_SINK == "jsonl":
+        path = config.AUDIT_LOG_PATH or str(config.BASE_DIR / "audit_log.jsonl")
+        if config.WORKER_COUNT > 1:
+            # 파일 회전은 프로세스 간에 안전하지 않으므로 워커마다 따로 씀
+            root, ext = os.path.splitext(path)
+            path = f"{root}.{config.WORKER_INDEX}{ext}"
+        return JSONLSink(path)
+    raise ValueError(f"지원하지 않는 AUDIT_LOG_SINK: {config.AUDIT_LOG_SINK} (가능: sqlite, jsonl, off)")
+
+
+def get_audit_log() -> Optional[AuditLog]:
+    """AUDIT_LOG_SINK=off이면 None."""
+    global _audit_log
+    if config.AUDIT_LOG_SINK == "off":
+        return None
+    with _audit_log_lock:
+        if _audit_log is None:
+            _audit_log = AuditLog(_create_sink())
+            atexit.register(_audit_log.close)  # 종료 시 버퍼에 남은 기록 저장
+        return _audit_log
+
+
+# --- 조회 ---
+def summarize(db_path: str, hours: float) -> Dict[str, Any]:
+    conn = sqlite3.connect(db_path)
+    try:
+        since = time.time() - hours * 3600
+        tiers = {}
+        for tier, in conn.execute("SELECT DISTINCT tier FROM verdicts WHERE ts >= ?", (since,)).fetchall():
+            latencies = np.array([row[0] for row in conn.execute(
+                "SELECT latency_ms FROM verdicts WHERE ts >= ? AND tier = ?", (since, tier))], dtype="float64")
+            tiers[tier] = {
+                "count": len(latencies),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+            }
+        classifications = dict(conn.execute(
+            "SELECT classification, COUNT(*) FROM verdicts WHERE ts >= ? GROUP BY classification", (since,)).fetchall())
+        versions = dict(conn.execute(
+            "SELECT index_version, COUNT(*) FROM verdicts WHERE ts >= ? GROUP BY index_version", (since,)).fetchall())
+    finally:
+        conn.close()
+    return {"hours": hours, "tiers": tiers, "classifications": classifications, "index_versions": versions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="댓글 판정 감사 로그 조회 (SQLite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary_parser = sub.add_parser("summary", help="최근 기록의 경로별 건수/지연과 판정 분포")
+    summary_parser.add_argument("--hours", type=float, default=24)
+    summary_parser.add_argument("--db", default=config.AUDIT_LOG_PATH or str(config.BASE_DIR / "audit_log.db"))
+    args = parser.parse_args()
+    print(json.dumps(summarize(args.db, args.hours), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
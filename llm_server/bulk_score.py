@@ -0,0 +1,268 @@
+# bulk_score.py
+"""
+대용량 댓글 파일(CSV/JSONL)을 오프라인으로 재채점하는 배치 CLI.
+
+- 입력은 한 줄씩 스트리밍하며 chunk 단위로만 메모리에 올립니다.
+- KoELECTRA 분류와 예시 검색(임베딩)은 워커 프로세스 풀에서, LLM 호출은 메인 프로세스의 asyncio로 동시에 실행합니다.
+- 결과는 JSONL로 입력 순서대로 기록하고, chunk마다 체크포인트를 남겨 중단된 실행을 이어서 재개할 수 있습니다.
+- 댓글 하나의 오류는 그 댓글의 결과에만 기록되고 나머지 처리에는 영향을 주지 않습니다.
+  워커 프로세스 자체가 실패하면 체크포인트를 남긴 채 중단하므로, 같은 명령을 다시 실행하면 실패한 chunk부터 재시도합니다.
+
+사용 예:
+    python bulk_score.py comments.csv results.jsonl --text-column text --id-column comment_id --workers 4
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import config
+import index_builder
+import llm_analyzer
+import llm_client
+import resources
+
+logger = logging.getLogger(__name__)
+
+# 오프라인 작업은 degraded 판정을 남기지 않고 LLM이 복구될 때까지 기다렸다가 다시 시도
+LLM_UNAVAILABLE_MAX_ROUNDS = 5
+
+
+# --- 입력 스트리밍 ---
+def iter_input_rows(path: str, text_column: str, id_column: Optional[str]) -> Iterator[Tuple[int, Any, Any]]:
+    """(행 번호, 댓글 ID, 댓글 텍스트)를 하나씩 내보냅니다. 파일 전체를 메모리에 올리지 않습니다."""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for row_index, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    yield row_index, None, None
+                    continue
+                yield row_index, record.get(id_column) if id_column else row_index, record.get(text_column)
+    else:
+        with open(path, encoding="utf-8", newline="") as f:
+            for row_index, record in enumerate(csv.DictReader(f)):
+                yield row_index, record.get(id_column) if id_column else row_index, record.get(text_column)
+
+
+def iter_chunks(rows: Iterator[Tuple[int, Any, Any]], chunk_size: int) -> Iterator[List[Tuple[int, Any, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- 체크포인트 ---
+def load_checkpoint(path: str) -> Dict[str, int]:
+    if not os.path.exists(path):
+        return {"rows_done": 0, "output_bytes": 0}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, rows_done: int, output_bytes: int) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"rows_done": rows_done, "output_bytes": output_bytes}, f)
+    os.replace(tmp_path, path)  # 중간에 죽어도 체크포인트 파일이 깨지지 않도록 원자적 교체
+
+
+# --- 워커 프로세스 (KoELECTRA + 예시 검색/프롬프트 조립) ---
+def _init_worker(torch_threads: int) -> None:
+    # 워커 프로세스 여러 개가 코어를 나눠 쓰므로 모델별 스레드도 그 몫으로 제한
+    resources.apply_thread_limits({"torch": torch_threads, "torch_interop": 1, "embedding": torch_threads, "faiss": 1})
+    # 인덱스는 부모 프로세스가 run() 시작 전에 준비해 두었으므로 읽기만 함
+    if not llm_analyzer.initialize_llm_components(with_openai=False, build_index=False):
+        raise RuntimeError("워커 프로세스에서 분석 구성 요소 초기화 실패")
+
+
+def _error_record(message: str) -> Dict[str, Any]:
+    return {"classification": "오류", "reason": message, "tier": "error"}
+
+
+def prepare_chunk(texts: List[Any]) -> List[Dict[str, Any]]:
+    """
+    chunk의 각 댓글에 대해 최종 결과(bypass/오류) 또는 LLM에 보낼 프롬프트를 만듭니다.
+    KoELECTRA는 chunk 단위로 한 번에 돌리고, 실패하면 댓글 하나씩 다시 시도하여 오류를 격리합니다.
+    """
+    prepared: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    valid = [(i, t) for i, t in enumerate(texts) if isinstance(t, str) and t.strip()]
+    for i, t in enumerate(texts):
+        if not (isinstance(t, str) and t.strip()):
+            prepared[i] = _error_record("텍스트 없음")
+
+    for start in range(0, len(valid), config.KOELECTRA_BATCH_SIZE):
+        batch = valid[start:start + config.KOELECTRA_BATCH_SIZE]
+        try:
+            scores_list: List[Any] = list(llm_analyzer.classify_koelectra_batch([t for _, t in batch]))
+        except Exception:
+            scores_list = []
+            for _, t in batch:
+                try:
+                    scores_list.extend(llm_analyzer.classify_koelectra_batch([t]))
+                except Exception as e:
+                    scores_list.append(e)
+
+        for (i, text), scores in zip(batch, scores_list):
+            if isinstance(scores, Exception):
+                prepared[i] = _error_record(f"KoELECTRA 오류: {scores}")
+                continue
+            try:
+                bypass_result = llm_analyzer.build_bypass_result(scores)
+                if bypass_result is not None:
+                    prepared[i] = {"classification": bypass_result["classification"], "reason": bypass_result["reason"],
+                                   "tier": "bypass", "probs": scores.probs_list()}
+                    continue
+                # 메인 프로세스로 보내는 값이므로 배치 객체 대신 프롬프트/문자열/확률 목록만 담음
+                prompt = llm_analyzer.build_prompt(text, scores)
+                prepared[i] = {"prompt": prompt, "koelectra_output": scores.output(), "probs": scores.probs_list()}
+            except Exception as e:
+                prepared[i] = _error_record(f"프롬프트 준비 오류: {e}")
+    return prepared
+
+
+# --- 메인 프로세스 (LLM 비동기 fan-out) ---
+async def score_with_llm(text: str, item: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    async with semaphore:
+        for round_index in range(LLM_UNAVAILABLE_MAX_ROUNDS):
+            try:
+                raw_output = await llm_client.ainvoke(item["prompt"])
+                break
+            except llm_client.LLMUnavailableError as e:
+                wait = config.CIRCUIT_BREAKER_RESET_SECONDS if isinstance(e, llm_client.CircuitOpenError) else llm_client.backoff_delay(round_index + 2)
+                logger.warning(f"LLM 사용 불가, {wait:.1f}초 후 다시 시도 ({round_index + 1}/{LLM_UNAVAILABLE_MAX_ROUNDS}): {e}")
+                await asyncio.sleep(wait)
+            except Exception as e:
+                return {**_error_record(f"LLM 오류: {e}"), "probs": item["probs"]}
+        else:
+            return {**_error_record("LLM 사용 불가 (재시도 소진)"), "probs": item["probs"]}
+
+    result = llm_analyzer.build_llm_result(text, raw_output, item["koelectra_output"])
+    return {"classification": result["classification"], "reason": result["reason"], "tier": "llm", "probs": item["probs"]}
+
+
+async def finish_chunk(chunk: List[Tuple[int, Any, Any]], prepared: List[Dict[str, Any]],
+                       semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+    async def finish_one(row: Tuple[int, Any, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+        row_index, comment_id, text = row
+        if "prompt" in item:
+            item = await score_with_llm(text, item, semaphore)
+        return {"row": row_index, "id": comment_id, **item}
+
+    return await asyncio.gather(*(finish_one(row, item) for row, item in zip(chunk, prepared)))
+
+
+async def run(args: argparse.Namespace) -> None:
+    checkpoint_path = args.checkpoint or args.output + ".ckpt.json"
+    checkpoint = load_checkpoint(checkpoint_path)
+    rows_done = checkpoint["rows_done"]
+
+    # 마지막 체크포인트 이후에 쓰인(불완전할 수 있는) 결과를 잘라내고 이어서 기록
+    mode = "r+" if os.path.exists(args.output) else "w"
+    output = open(args.output, mode, encoding="utf-8")
+    output.seek(checkpoint["output_bytes"])
+    output.truncate()
+    if rows_done:
+        logger.info(f"체크포인트에서 재개: 이미 처리된 행 {rows_done}개 건너뜀")
+
+    rows = iter_input_rows(args.input, args.text_column, args.id_column)
+    rows = (row for row in rows if row[0] >= rows_done)
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(args.llm_concurrency)
+    started = time.monotonic()
+    scored = 0
+    torch_threads = max(1, (os.cpu_count() or 1) // args.workers)
+    # 인덱스가 없거나 설정이 맞지 않을 때 워커 N개가 같은 경로에 동시에 만들지 않도록 여기서 한 번만 준비
+    index_builder.ensure_saved_index()
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(torch_threads,)) as pool:
+        pending: deque = deque()
+        chunks = iter_chunks(rows, args.chunk_size)
+
+        def submit_next() -> bool:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return False
+            pending.append((chunk, loop.run_in_executor(pool, prepare_chunk, [text for _, _, text in chunk])))
+            return True
+
+        # 워커 수보다 조금 더 앞서 CPU 단계를 걸어 두어 LLM 대기 중에도 CPU가 놀지 않게 함 (메모리는 이 개수로 제한)
+        for _ in range(args.workers + 1):
+            if not submit_next():
+                break
+
+        # LLM 단계가 진행 중인 chunk (입력 순서). chunk 경계마다 가장 느린 호출 하나를 기다리느라 동시 호출 수가
+        # 떨어지지 않도록 여러 chunk의 LLM 호출을 겹쳐 진행하고, 결과는 끝나는 대로 입력 순서에 맞춰 기록함
+        in_flight: deque = deque()
+
+        async def write_oldest() -> None:
+            nonlocal rows_done, scored
+            chunk, finished = in_flight.popleft()
+            for record in await finished:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            rows_done = chunk[-1][0] + 1
+            scored += len(chunk)
+            save_checkpoint(checkpoint_path, rows_done, output.tell())
+
+            elapsed = time.monotonic() - started
+            logger.info(f"{rows_done}행 처리 완료 ({scored / max(elapsed, 1e-6):.1f}행/초)")
+
+        try:
+            while pending or in_flight:
+                # CPU 단계가 끝난 chunk를 --llm-window개까지 LLM 단계로 넘김
+                while pending and len(in_flight) < args.llm_window:
+                    chunk, prepared_future = pending.popleft()
+                    try:
+                        prepared = await prepared_future
+                    except Exception as e:
+                        # 댓글 단위 오류는 prepare_chunk 안에서 결과로 기록되므로, 여기로 오는 예외는 워커/풀 자체의 문제
+                        # (BrokenProcessPool, 메모리 부족으로 죽은 워커, 초기화 실패 등). 앞선 chunk까지만 기록하고
+                        # 체크포인트를 이 chunk 앞에 남겨 두어야 같은 명령으로 다시 실행했을 때 이 chunk부터 재시도됨
+                        for _, future in pending:
+                            future.cancel()
+                        pending.clear()
+                        while in_flight:
+                            await write_oldest()
+                        raise RuntimeError(
+                            f"워커 오류로 중단 (행 {chunk[0][0]}부터 재개 가능, 체크포인트: {checkpoint_path}): {e}"
+                        ) from e
+                    submit_next()
+                    in_flight.append((chunk, asyncio.ensure_future(finish_chunk(chunk, prepared, semaphore))))
+                await write_oldest()
+        finally:
+            for _, finished in in_flight:
+                finished.cancel()
+            output.close()
+
+    logger.info(f"완료: 이번 실행에서 {scored}행 처리, 결과: {args.output}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="대용량 댓글 파일 오프라인 재채점 (재개 가능)")
+    parser.add_argument("input", help="입력 파일 (.csv 또는 .jsonl)")
+    parser.add_argument("output", help="결과 JSONL 파일")
+    parser.add_argument("--text-column", default="text", help="댓글 텍스트 컬럼/키 이름")
+    parser.add_argument("--id-column", default=None, help="댓글 ID 컬럼/키 이름 (없으면 행 번호)")
+    parser.add_argument("--checkpoint", default=None, help="체크포인트 파일 (기본: <output>.ckpt.json)")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=2, help="KoELECTRA/임베딩 워커 프로세스 수")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="동시에 진행할 LLM 호출 수")
+    parser.add_argument("--llm-window", type=int, default=3, help="LLM 호출을 겹쳐 진행할 chunk 수 (결과는 입력 순서대로 기록)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -1,71 +1,247 @@
+# check_vectorDB.py
+"""
+혐오 표현 사전(CSV)과 FAISS 인덱스 관리 도구.
+
+    python check_vectorDB.py inspect              # 인덱스 내용 일부 확인 (기존 동작)
+    python check_vectorDB.py diff                 # CSV와 인덱스를 내용 해시로 비교
+    python check_vectorDB.py dedupe [--apply]     # CSV의 중복 예시표현 제거 (기본은 미리보기)
+    python check_vectorDB.py rebuild [--workers 4]  # CSV로 staging 디렉터리에 새 인덱스를 만든 뒤 원자적으로 교체
+
+각 단계의 소요 시간이 함께 출력됩니다.
+"""
+import argparse
+import csv
+import hashlib
 import os
-import llm_analyzer # 여러분의 llm_analyzer.py
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
 import config       # 여러분의 config.py
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
-
-# LLM 컴포넌트 초기화 또는 로드 (필수)
-if not llm_analyzer.vectorstore or not llm_analyzer.embeddings_model:
-    print("LLM 컴포넌트 초기화 시도...")
-    if not llm_analyzer.embeddings_model:
-        llm_analyzer.embeddings_model = HuggingFaceEmbeddings(
-            model_name=config.EMBEDDING_MODEL_NAME,
-            model_kwargs={'device': config.DEVICE},
-            encode_kwargs={'normalize_embeddings': True}
-        )
-    
-    if os.path.exists(config.FAISS_SAVE_PATH) and os.listdir(config.FAISS_SAVE_PATH):
-        print(f"FAISS 인덱스 로드 중: {config.FAISS_SAVE_PATH}")
-        try:
-            # llm_analyzer.vectorstore를 직접 업데이트하거나, 새로운 변수에 할당하여 확인
-            current_vectorstore = FAISS.load_local(
-                config.FAISS_SAVE_PATH, 
-                llm_analyzer.embeddings_model, 
-                allow_dangerous_deserialization=True
-            )
-        except Exception as e:
-            print(f"FAISS 인덱스 로드 중 오류: {e}")
-            current_vectorstore = None # 로드 실패 시 None으로 설정
-    else:
+import index_builder
+import embeddings_backend
+
+CSV_FIELDNAMES = ["범주", "예시표현", "간략 정의/맥락", "label"]
+
+phase_timings: List[Tuple[str, float]] = []
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    phase_timings.append((name, elapsed))
+    print(f"⏱️ [{name}] {elapsed:.2f}초")
+
+
+def print_timings() -> None:
+    if not phase_timings:
+        return
+    print("\n--- 단계별 소요 시간 ---")
+    for name, elapsed in phase_timings:
+        print(f"  {name:<20}: {elapsed:.2f}초")
+    print(f"  {'합계':<20}: {sum(e for _, e in phase_timings):.2f}초")
+
+
+# --- 내용 해시 ---
+def normalize_expression(page_content: str) -> str:
+    # CSVLoader는 "예시표현: xxx" 형식, 신고로 추가된 문서는 "xxx" 형식이므로 같은 값으로 맞춤
+    return page_content.replace(f"{config.CONTENT_COLUMN_NAME}:", "").strip()
+
+
+def entry_hash(expression: str, metadata: Dict[str, str]) -> str:
+    fields = [expression.strip()] + [str(metadata.get(name, "")).strip() for name in config.METADATA_COLUMN_NAMES]
+    return hashlib.sha1("\x1f".join(fields).encode("utf-8")).hexdigest()
+
+
+def document_hash(doc: Document) -> str:
+    metadata = {k.strip(): v for k, v in doc.metadata.items()}
+    return entry_hash(normalize_expression(doc.page_content), metadata)
+
+
+def read_csv_rows(csv_path=config.CSV_FILE_PATH) -> List[Dict[str, str]]:
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        return [{k.strip(): (v or "").strip() for k, v in row.items() if k} for row in csv.DictReader(f)]
+
+
+def row_hash(row: Dict[str, str]) -> str:
+    return entry_hash(row.get(config.CONTENT_COLUMN_NAME, ""), row)
+
+
+def load_current_vectorstore():
+    if not (os.path.exists(config.FAISS_SAVE_PATH) and os.listdir(config.FAISS_SAVE_PATH)):
         print("저장된 FAISS 인덱스를 찾을 수 없습니다.")
-        current_vectorstore = None
-else:
-    current_vectorstore = llm_analyzer.vectorstore # 이미 로드된 객체 사용
+        return None
+    try:
+        return index_builder.load_vectorstore(config.FAISS_SAVE_PATH, embeddings_backend.create_embeddings_model())
+    except Exception as e:
+        print(f"FAISS 인덱스 로드 중 오류: {e}")
+        return None
+
+
+# --- inspect ---
+def inspect_index(max_docs_to_show: int = 5) -> None:
+    with phase("인덱스 로드"):
+        current_vectorstore = load_current_vectorstore()
+    if not current_vectorstore:
+        print("VectorDB (FAISS)를 로드할 수 없었습니다.")
+        return
 
-if current_vectorstore:
     print(f"\n--- VectorDB (FAISS) 내용 확인 ---")
-    
     # FAISS 인덱스에 저장된 총 벡터 수 (문서 수와 일치해야 함)
-    if hasattr(current_vectorstore, 'index') and hasattr(current_vectorstore.index, 'ntotal'):
-        total_docs_in_index = current_vectorstore.index.ntotal
-        print(f"FAISS 인덱스 내 총 벡터(문서) 수: {total_docs_in_index}")
+    print(f"FAISS 인덱스 종류: {index_builder.index_type_of(current_vectorstore.index)}")
+    print(f"FAISS 인덱스 내 총 벡터(문서) 수: {current_vectorstore.index.ntotal}")
 
-    # Docstore에서 문서 정보 가져오기
     # 주의: docstore._dict는 내부 구현이므로 변경될 수 있습니다.
-    if hasattr(current_vectorstore, 'docstore') and hasattr(current_vectorstore.docstore, '_dict'):
-        docstore_dict = current_vectorstore.docstore._dict
-        print(f"Docstore 내 총 문서 수: {len(docstore_dict)}")
-        
-        # 모든 문서를 출력하면 너무 많을 수 있으므로, 처음 몇 개만 출력하거나 특정 ID로 조회
-        count = 0
-        max_docs_to_show = 5 # 보여줄 최대 문서 수
-        
-        for doc_id, document in docstore_dict.items():
-            if count < max_docs_to_show:
-                print(f"\n문서 ID: {doc_id}")
-                print(f"  내용 (page_content): {document.page_content}")
-                print(f"  메타데이터 (metadata): {document.metadata}")
-            else:
-                print(f"\n... (총 {len(docstore_dict)}개 문서 중 처음 {max_docs_to_show}개만 표시) ...")
-                break
-            count += 1
-        
-        if not docstore_dict:
-            print("Docstore가 비어있습니다.")
-            
-    else:
-        print("Docstore에 접근할 수 없거나 내부 구조가 예상과 다릅니다.")
-        print("유사도 검색을 통해 특정 문서를 찾아보는 방식으로 확인해야 할 수 있습니다.")
-
-else:
-    print("VectorDB (FAISS)를 로드할 수 없었습니다.")
\ No newline at end of file
+    docstore_dict = current_vectorstore.docstore._dict
+    print(f"Docstore 내 총 문서 수: {len(docstore_dict)}")
+    if not docstore_dict:
+        print("Docstore가 비어있습니다.")
+        return
+    for count, (doc_id, document) in enumerate(docstore_dict.items()):
+        if count >= max_docs_to_show:
+            print(f"\n... (총 {len(docstore_dict)}개 문서 중 처음 {max_docs_to_show}개만 표시) ...")
+            break
+        print(f"\n문서 ID: {doc_id}")
+        print(f"  내용 (page_content): {document.page_content}")
+        print(f"  메타데이터 (metadata): {document.metadata}")
+
+
+# --- diff ---
+def diff_csv_and_index() -> bool:
+    """CSV와 인덱스가 일치하면 True. 차이를 출력합니다."""
+    with phase("CSV 해시 계산"):
+        rows = read_csv_rows()
+        # 같은 내용이 몇 번 들어 있는지까지 비교해야 중복 행/중복 문서로 인한 어긋남도 잡힘
+        csv_counts: Counter = Counter()
+        expression_of: Dict[str, str] = {}
+        for row in rows:
+            h = row_hash(row)
+            csv_counts[h] += 1
+            expression_of[h] = row.get(config.CONTENT_COLUMN_NAME, "")
+        expression_counts = Counter(row.get(config.CONTENT_COLUMN_NAME, "") for row in rows)
+        duplicates = sorted(e for e, n in expression_counts.items() if n > 1)
+    with phase("인덱스 로드/해시 계산"):
+        current_vectorstore = load_current_vectorstore()
+        if current_vectorstore is None:
+            return False
+        docs = list(current_vectorstore.docstore._dict.values())
+        index_counts: Counter = Counter()
+        for doc in docs:
+            h = document_hash(doc)
+            index_counts[h] += 1
+            expression_of.setdefault(h, normalize_expression(doc.page_content))
+
+    # Counter 뺄셈은 양수만 남기므로 각 방향의 초과분(개수 차이)만 남음
+    only_csv = [f"{expression_of[h]} (+{n})" for h, n in (csv_counts - index_counts).items()]
+    only_index = [f"{expression_of[h]} (+{n})" for h, n in (index_counts - csv_counts).items()]
+    print(f"\nCSV 행: {len(rows)}개, 인덱스 문서: {len(docs)}개, 인덱스 벡터: {current_vectorstore.index.ntotal}개")
+    print(f"CSV에 더 많음 ({len(only_csv)}개): {only_csv[:20]}")
+    print(f"인덱스에 더 많음 ({len(only_index)}개): {only_index[:20]}")
+    print(f"CSV 내 중복 예시표현 ({len(duplicates)}개): {duplicates[:20]}")
+    if current_vectorstore.index.ntotal != len(docs):
+        print("⚠️ 인덱스 벡터 수와 docstore 문서 수가 다릅니다.")
+
+    consistent = not only_csv and not only_index and current_vectorstore.index.ntotal == len(docs)
+    print("✅ CSV와 인덱스가 일치합니다." if consistent else "❌ CSV와 인덱스가 다릅니다. 'rebuild'로 다시 만드세요.")
+    return consistent
+
+
+# --- dedupe ---
+def dedupe_csv(apply: bool) -> int:
+    """같은 예시표현이 여러 번 있으면 마지막(가장 최근에 추가된) 항목만 남깁니다. 제거한 행 수를 반환합니다."""
+    with phase("CSV 중복 제거"):
+        rows = read_csv_rows()
+        latest: Dict[str, Dict[str, str]] = {}
+        for row in rows:
+            expression = row.get(config.CONTENT_COLUMN_NAME, "")
+            latest.pop(expression, None)  # 다시 넣어 순서를 마지막 등장 위치로 옮김
+            latest[expression] = row
+        removed = len(rows) - len(latest)
+        print(f"중복 제거 대상: {removed}개 (전체 {len(rows)}개 → {len(latest)}개)")
+
+        if apply and removed:
+            tmp_path = f"{config.CSV_FILE_PATH}.tmp"
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=CSV_FIELDNAMES, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(latest.values())
+            os.replace(tmp_path, config.CSV_FILE_PATH)
+            print(f"'{config.CSV_FILE_PATH}' 갱신 완료. 인덱스에도 반영하려면 'rebuild'를 실행하세요.")
+        elif removed:
+            print("미리보기만 했습니다. 적용하려면 --apply를 붙이세요.")
+    return removed
+
+
+# --- rebuild + atomic swap ---
+def embed_in_parallel(documents: List[Document], embeddings_model, workers: int) -> np.ndarray:
+    """배치 단위로 나눠 여러 스레드에서 임베딩합니다 (torch 연산 중에는 GIL이 풀림)."""
+    batch_size = config.EMBEDDING_BATCH_SIZE
+    batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda batch: embeddings_model.embed_documents([d.page_content for d in batch]), batches))
+    return np.asarray([vector for batch in results for vector in batch], dtype="float32")
+
+
+def rebuild_index(workers: int) -> bool:
+    staging_path = f"{config.FAISS_SAVE_PATH}.staging"
+    if os.path.exists(staging_path):
+        shutil.rmtree(staging_path)
+
+    with phase("CSV 로드"):
+        documents = index_builder.load_csv_documents()
+        print(f"CSV 문서 {len(documents)}개")
+    with phase("임베딩 모델 로드"):
+        embeddings_model = embeddings_backend.create_embeddings_model()
+    with phase("임베딩 (병렬 배치)"):
+        vectors = embed_in_parallel(documents, embeddings_model, workers)
+    with phase("인덱스 학습/생성"):
+        vectorstore = index_builder.build_vectorstore(documents, embeddings_model, vectors=vectors)
+    with phase("staging 저장/검증"):
+        index_builder.save_vectorstore(vectorstore, staging_path)
+        reloaded = index_builder.load_vectorstore(staging_path, embeddings_model)
+        if reloaded.index.ntotal != len(documents) or len(reloaded.docstore._dict) != len(documents):
+            print(f"❌ staging 인덱스 검증 실패 (벡터 {reloaded.index.ntotal}개, 문서 {len(documents)}개). 교체하지 않습니다.")
+            return False
+    with phase("원자적 교체"), index_builder.index_write_lock(config.FAISS_SAVE_PATH):
+        index_builder.swap_in_staging(staging_path, config.FAISS_SAVE_PATH)
+    print(f"✅ '{config.FAISS_SAVE_PATH}' 인덱스 재생성 완료 ({len(documents)}개). "
+          f"실행 중인 서버는 재시작하거나 다음 사전 추가 때 새 인덱스를 다시 읽습니다.")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="혐오 표현 사전 CSV / FAISS 인덱스 관리")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("inspect", help="인덱스 내용 일부 확인")
+    sub.add_parser("diff", help="CSV와 인덱스를 내용 해시로 비교")
+    dedupe_parser = sub.add_parser("dedupe", help="CSV 중복 예시표현 제거")
+    dedupe_parser.add_argument("--apply", action="store_true", help="미리보기 대신 실제로 CSV를 갱신")
+    rebuild_parser = sub.add_parser("rebuild", help="CSV로 인덱스 재생성 후 원자적 교체")
+    rebuild_parser.add_argument("--workers", type=int, default=4, help="임베딩 병렬 스레드 수")
+    rebuild_parser.add_argument("--dedupe", action="store_true", help="재생성 전에 CSV 중복을 먼저 제거")
+    args = parser.parse_args()
+
+    command = args.command or "inspect"
+    if command == "inspect":
+        inspect_index()
+    elif command == "diff":
+        diff_csv_and_index()
+    elif command == "dedupe":
+        dedupe_csv(args.apply)
+    elif command == "rebuild":
+        if args.dedupe:
+            dedupe_csv(apply=True)
+        rebuild_index(args.workers)
+    print_timings()
+
+
+if __name__ == "__main__":
+    main()
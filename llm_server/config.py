@@ -1,7 +1,7 @@
 # config.py
 import os
 from dotenv import load_dotenv
-from typing import List
+from typing import Dict, List
 import torch
 from pathlib import Path
 
@@ -54,6 +54,7 @@ EXAMPLE_SELECTOR_INPUT_KEY: str = 'user_comment' # Key used in prompts for user
 RAG_CHAIN_INPUT_KEY: str = 'user_comment' # Key for the main input to the RAG chain
 KOELECTRA_CONTEXT_KEY: str = 'koelectra_context'
 INCLUDE_KOELECTRA_KEY: str = 'include_koelectra'
+RETRIEVAL_QUERY_KEY: str = 'retrieval_query' # 예시 검색에 쓰는 정규화된 댓글 텍스트
 
 # --- Device ---
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
@@ -62,3 +63,108 @@ DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 PORT: int = int(os.getenv('PORT', 5000)) # Default to 5000 if not set
 
 KOELECTRA_BYPASS_THRESHOLD = 0.9 # Threshold for bypassing KOELECTRA
+
+# --- Analysis Scheduler ---
+KOELECTRA_BATCH_SIZE: int = int(os.getenv('KOELECTRA_BATCH_SIZE', 16)) # KoELECTRA micro-batch 크기
+LLM_WORKER_COUNT: int = int(os.getenv('LLM_WORKER_COUNT', 4)) # 동시에 진행할 LLM 호출 수
+ANALYZE_TIMEOUT_SECONDS: float = float(os.getenv('ANALYZE_TIMEOUT_SECONDS', 60))
+# 클라이언트별 가중치 (예: "clientA:2,clientB:0.5"). 지정하지 않은 클라이언트는 1.0
+SCHEDULER_CLIENT_WEIGHTS: Dict[str, float] = {
+    name.strip(): float(weight)
+    for name, weight in (
+        item.split(':', 1) for item in os.getenv('SCHEDULER_CLIENT_WEIGHTS', '').split(',') if ':' in item
+    )
+}
+
+# --- Verdict Cache / Prefetch ---
+VERDICT_CACHE_SIZE: int = int(os.getenv('VERDICT_CACHE_SIZE', 50000)) # 캐시에 보관할 최대 판정 수
+VERDICT_CACHE_TTL_SECONDS: float = float(os.getenv('VERDICT_CACHE_TTL_SECONDS', 6 * 60 * 60))
+# 클라이언트+영상 하나당 사전 분석 상한 (그 영상의 모든 작업 합계). 예전 이름 PREFETCH_MAX_COMMENTS_PER_JOB도 인식
+PREFETCH_MAX_COMMENTS_PER_VIDEO: int = int(os.getenv('PREFETCH_MAX_COMMENTS_PER_VIDEO', os.getenv('PREFETCH_MAX_COMMENTS_PER_JOB', 1000)))
+PREFETCH_VIDEO_QUOTA_WINDOW_SECONDS: float = float(os.getenv('PREFETCH_VIDEO_QUOTA_WINDOW_SECONDS', 60 * 60)) # 마지막 요청 후 이 시간이 지나면 영상별 사용량 초기화
+PREFETCH_MAX_ACTIVE_JOBS_PER_CLIENT: int = int(os.getenv('PREFETCH_MAX_ACTIVE_JOBS_PER_CLIENT', 2))
+PREFETCH_JOB_RETENTION_SECONDS: float = float(os.getenv('PREFETCH_JOB_RETENTION_SECONDS', 10 * 60)) # 끝난 작업의 진행 정보 보관 시간
+
+# --- OpenAI Client Resilience ---
+OPENAI_TIMEOUT_SECONDS: float = float(os.getenv('OPENAI_TIMEOUT_SECONDS', 10)) # 호출 1회당 타임아웃
+OPENAI_MAX_RETRIES: int = int(os.getenv('OPENAI_MAX_RETRIES', 2)) # 재시도 횟수 (첫 시도 제외)
+OPENAI_RETRY_BASE_DELAY: float = float(os.getenv('OPENAI_RETRY_BASE_DELAY', 0.5))
+OPENAI_RETRY_MAX_DELAY: float = float(os.getenv('OPENAI_RETRY_MAX_DELAY', 4.0))
+OPENAI_POOL_MAX_CONNECTIONS: int = int(os.getenv('OPENAI_POOL_MAX_CONNECTIONS', 20))
+OPENAI_POOL_MAX_KEEPALIVE: int = int(os.getenv('OPENAI_POOL_MAX_KEEPALIVE', 10))
+CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5)) # 연속 실패 시 차단
+CIRCUIT_BREAKER_RESET_SECONDS: float = float(os.getenv('CIRCUIT_BREAKER_RESET_SECONDS', 30)) # 차단 후 재시도까지 대기
+# LLM을 쓸 수 없을 때(degraded mode) KoELECTRA/검색 점수만으로 '혐오'를 판정하는 기준
+DEGRADED_HATE_THRESHOLD: float = float(os.getenv('DEGRADED_HATE_THRESHOLD', 0.5))
+DEGRADED_RETRIEVAL_THRESHOLD: float = float(os.getenv('DEGRADED_RETRIEVAL_THRESHOLD', 0.85))
+
+# --- OpenAI Rate Governor (워커 프로세스 간 공유) ---
+RATE_GOVERNOR_ENABLED: bool = os.getenv('RATE_GOVERNOR_ENABLED', 'True').lower() == 'true'
+RATE_GOVERNOR_DB_PATH: str = os.getenv('RATE_GOVERNOR_DB_PATH', str(BASE_DIR / "rate_governor.db"))
+OPENAI_RPM_LIMIT: int = int(os.getenv('OPENAI_RPM_LIMIT', 500)) # 분당 요청 수
+OPENAI_TPM_LIMIT: int = int(os.getenv('OPENAI_TPM_LIMIT', 30000)) # 분당 토큰 수 (프롬프트 + 최대 출력)
+RATE_GOVERNOR_MAX_WAIT_SECONDS: float = float(os.getenv('RATE_GOVERNOR_MAX_WAIT_SECONDS', 10)) # 이보다 오래 기다려야 하면 degraded
+RATE_GOVERNOR_SHED_WAIT_SECONDS: float = float(os.getenv('RATE_GOVERNOR_SHED_WAIT_SECONDS', 2)) # 낮은 우선순위 작업은 이보다 오래 기다려야 하면 버림
+
+# --- FAISS Index Type ---
+# flat: 정확 검색 (작은 사전), hnsw: 그래프 기반 근사 검색, ivfpq: 역색인 + product quantization (대용량/메모리 절약)
+FAISS_INDEX_TYPE: str = os.getenv('FAISS_INDEX_TYPE', 'flat').lower()
+EMBEDDING_BATCH_SIZE: int = int(os.getenv('EMBEDDING_BATCH_SIZE', 64)) # 인덱스 빌드 시 임베딩 배치 크기
+HNSW_M: int = int(os.getenv('HNSW_M', 32))
+HNSW_EF_CONSTRUCTION: int = int(os.getenv('HNSW_EF_CONSTRUCTION', 200))
+HNSW_EF_SEARCH: int = int(os.getenv('HNSW_EF_SEARCH', 64))
+IVF_NLIST: int = int(os.getenv('IVF_NLIST', 256)) # 사전 크기에 맞춰 자동으로 줄어듦
+IVF_NPROBE: int = int(os.getenv('IVF_NPROBE', 16))
+PQ_M: int = int(os.getenv('PQ_M', 64)) # 임베딩 차원의 약수여야 함
+PQ_NBITS: int = int(os.getenv('PQ_NBITS', 8))
+
+# --- Embedding Backend ---
+# hf: sentence-transformers fp32 (기존 방식), torch: transformers fp32, int8: 동적 int8 양자화 (CPU), onnx: ONNX Runtime (optimum 필요)
+EMBEDDING_BACKEND: str = os.getenv('EMBEDDING_BACKEND', 'hf').lower()
+EMBEDDING_DIM: int = int(os.getenv('EMBEDDING_DIM', 0)) # 0이면 전체 차원, 예: 256 (Matryoshka 방식으로 앞부분만 사용)
+EMBEDDING_MAX_LENGTH: int = int(os.getenv('EMBEDDING_MAX_LENGTH', 512))
+ONNX_CACHE_DIR: str = os.getenv('ONNX_CACHE_DIR', str(BASE_DIR / "onnx_cache")) # EMBEDDING_BACKEND=onnx일 때 export한 모델 저장 위치 (모델별, 출력 차원과 무관)
+
+# --- Text Normalization ---
+# NFC/NFKC, ㅋㅋ/ㅎㅎ 반복 축약, zero-width/이모지 제거, 공백 정리. KoELECTRA/캐시 키/예시 검색에 공통 적용 (LLM 프롬프트는 원문)
+TEXT_NORMALIZATION_ENABLED: bool = os.getenv('TEXT_NORMALIZATION_ENABLED', 'True').lower() == 'true'
+TEXT_NORMALIZE_CACHE_SIZE: int = int(os.getenv('TEXT_NORMALIZE_CACHE_SIZE', 8192))
+
+# --- Pipeline (CPU 단계와 LLM 호출 겹쳐 실행) ---
+PIPELINE_CPU_WORKERS: int = int(os.getenv('PIPELINE_CPU_WORKERS', 2)) # KoELECTRA/예시 검색/프롬프트 조립 전용 스레드 수
+PIPELINE_LLM_CONCURRENCY: int = int(os.getenv('PIPELINE_LLM_CONCURRENCY', 16)) # 프로세스 전체 동시 LLM 호출 상한
+# KoELECTRA 결과 전에 LLM을 먼저 호출하고, bypass되거나 KoELECTRA 결과를 프롬프트에 넣어야 하면 취소 (OpenAI 사용량 증가 가능)
+SPECULATIVE_LLM_ENABLED: bool = os.getenv('SPECULATIVE_LLM_ENABLED', 'False').lower() == 'true'
+SPECULATIVE_LLM_MAX_IN_FLIGHT: int = int(os.getenv('SPECULATIVE_LLM_MAX_IN_FLIGHT', LLM_WORKER_COUNT)) # 스케줄러의 동시 추측 호출 상한 (화면에 보이는 댓글만 추측)
+
+# --- CPU / Memory Resources (resources.py) ---
+WORKER_COUNT: int = int(os.getenv('WORKER_COUNT', 1)) # 같은 머신에서 도는 서버 워커 프로세스 수
+WORKER_INDEX: int = int(os.getenv('WORKER_INDEX', 0)) # 이 워커의 번호 (0 ~ WORKER_COUNT-1), 코어 묶음 선택에 사용
+CPU_AFFINITY_ENABLED: bool = os.getenv('CPU_AFFINITY_ENABLED', 'False').lower() == 'true' # 워커를 자기 코어 묶음에 고정
+KOELECTRA_NUM_THREADS: int = int(os.getenv('KOELECTRA_NUM_THREADS', 0)) # torch intra-op 스레드 수 (0: 워커 코어 / PIPELINE_CPU_WORKERS)
+TORCH_INTEROP_THREADS: int = int(os.getenv('TORCH_INTEROP_THREADS', 1))
+EMBEDDING_NUM_THREADS: int = int(os.getenv('EMBEDDING_NUM_THREADS', 0)) # ONNX 임베딩 세션 스레드 수 (torch 백엔드는 KOELECTRA_NUM_THREADS 공유)
+FAISS_NUM_THREADS: int = int(os.getenv('FAISS_NUM_THREADS', 1)) # 쿼리 하나씩 검색하므로 1이 보통 가장 빠름
+MEMORY_BUDGET_MB: float = float(os.getenv('MEMORY_BUDGET_MB', 0)) # 프로세스 RSS 상한 (0: 제한 없음), 넘으면 /analyze, /prefetch 503
+MEMORY_CHECK_INTERVAL_SECONDS: float = float(os.getenv('MEMORY_CHECK_INTERVAL_SECONDS', 1.0))
+MEMORY_RECOVERY_RATIO: float = float(os.getenv('MEMORY_RECOVERY_RATIO', 0.9)) # 초과 후에는 예산 x 이 비율 아래로 내려와야 다시 요청 수락
+MEMORY_RECYCLE_AFTER_SECONDS: float = float(os.getenv('MEMORY_RECYCLE_AFTER_SECONDS', 0)) # 이 시간 넘게 초과가 계속되면 워커 종료 (gunicorn 등 관리자가 재시작, 0: 사용 안 함)
+
+# --- Profiling (관리자 전용) ---
+ADMIN_TOKEN: str = os.getenv('ADMIN_TOKEN', '') # 비어 있으면 프로파일링 기능 전체 비활성화
+PROFILE_DIR: str = os.getenv('PROFILE_DIR', str(BASE_DIR / "profiles")) # speedscope/torch 요약 파일 저장 위치
+PROFILE_SAMPLE_INTERVAL_SECONDS: float = float(os.getenv('PROFILE_SAMPLE_INTERVAL_SECONDS', 0.005))
+PROFILE_TORCH_OPS: bool = os.getenv('PROFILE_TORCH_OPS', 'True').lower() == 'true' # torch 연산별 시간도 수집
+PROFILE_TOP_TORCH_OPS: int = int(os.getenv('PROFILE_TOP_TORCH_OPS', 30))
+PROFILE_MAX_WINDOW_SECONDS: float = float(os.getenv('PROFILE_MAX_WINDOW_SECONDS', 120))
+PROFILE_TRIGGER_POLL_SECONDS: float = float(os.getenv('PROFILE_TRIGGER_POLL_SECONDS', 2))
+
+# --- Audit Log (댓글 판정 기록) ---
+# sqlite: 여러 워커가 한 DB(WAL)에 기록, jsonl: 크기 기준 회전 파일 (워커가 여럿이면 워커 번호별 파일), off: 기록 안 함
+AUDIT_LOG_SINK: str = os.getenv('AUDIT_LOG_SINK', 'sqlite').lower()
+AUDIT_LOG_PATH: str = os.getenv('AUDIT_LOG_PATH', '') # 비어 있으면 BASE_DIR/audit_log.db 또는 audit_log.jsonl
+AUDIT_BUFFER_SIZE: int = int(os.getenv('AUDIT_BUFFER_SIZE', 10000)) # 메모리 링 버퍼 크기 (넘치면 오래된 기록부터 버림)
+AUDIT_FLUSH_INTERVAL_SECONDS: float = float(os.getenv('AUDIT_FLUSH_INTERVAL_SECONDS', 2.0))
+AUDIT_FLUSH_BATCH_SIZE: int = int(os.getenv('AUDIT_FLUSH_BATCH_SIZE', 500))
+AUDIT_JSONL_MAX_BYTES: int = int(os.getenv('AUDIT_JSONL_MAX_BYTES', 50 * 1024 * 1024))
+AUDIT_JSONL_BACKUP_COUNT: int = int(os.getenv('AUDIT_JSONL_BACKUP_COUNT', 5))
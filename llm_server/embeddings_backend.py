@@ -0,0 +1,224 @@
+# embeddings_backend.py
+"""
+snowflake-arctic-embed 리트리버용 CPU 최적화 임베딩 백엔드.
+
+EMBEDDING_BACKEND로 fp32(sentence-transformers / transformers), 동적 int8 양자화, ONNX Runtime 중 하나를 고르고,
+EMBEDDING_DIM으로 Matryoshka 방식의 앞부분 차원만 잘라 써서 FAISS 인덱스 크기를 줄일 수 있습니다.
+백엔드를 바꿔도 같은 CLS pooling + L2 정규화 벡터를 만들기 때문에, 차원만 같으면 기존 인덱스와 호환됩니다.
+
+    python embeddings_backend.py parity --backend int8 --dim 256    # 기준(hf, 전체 차원) 대비 검색 일치도 확인
+"""
+import argparse
+import fcntl
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+from transformers import AutoModel, AutoTokenizer
+
+import config
+import resources
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("hf", "torch", "int8", "onnx")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def _truncate(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """Matryoshka 방식: 앞쪽 dim개 차원만 남기고 다시 정규화."""
+    if not dim or dim >= vectors.shape[1]:
+        return vectors
+    return _normalize(vectors[:, :dim])
+
+
+def onnx_export_dir(model_name: str) -> str:
+    # Matryoshka 차원 축소는 추론 뒤 _truncate에서 하므로 export 결과는 EMBEDDING_DIM과 무관 (모델마다 하나만 보관)
+    return os.path.join(config.ONNX_CACHE_DIR, model_name.replace('/', '--'))
+
+
+def _load_onnx_model(model_cls, model_name: str, session_options):
+    """
+    처음 한 번만 ONNX로 export해 캐시 디렉터리에 저장하고, 이후에는 저장된 모델을 읽습니다.
+    서버 워커/bulk_score 워커가 동시에 시작해도 파일 락으로 export는 한 프로세스만 합니다.
+    """
+    export_dir = onnx_export_dir(model_name)
+    os.makedirs(config.ONNX_CACHE_DIR, exist_ok=True)
+    with open(f"{export_dir}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if not os.path.isdir(export_dir):
+            logger.info(f"ONNX export (최초 1회): {model_name} → {export_dir}")
+            tmp_dir = f"{export_dir}.tmp-{os.getpid()}"
+            try:
+                model_cls.from_pretrained(model_name, export=True).save_pretrained(tmp_dir)
+                os.replace(tmp_dir, export_dir)  # 중간에 죽어도 반쯤 저장된 디렉터리를 캐시로 쓰지 않도록
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+    return model_cls.from_pretrained(export_dir, session_options=session_options)
+
+
+class ArcticEmbeddings(Embeddings):
+    """transformers/ONNX Runtime으로 직접 인코딩하는 LangChain Embeddings 구현 (CLS pooling, 정규화)."""
+
+    def __init__(self,
+                 backend: str = config.EMBEDDING_BACKEND,
+                 model_name: str = config.EMBEDDING_MODEL_NAME,
+                 dim: int = config.EMBEDDING_DIM,
+                 batch_size: int = config.EMBEDDING_BATCH_SIZE,
+                 max_length: int = config.EMBEDDING_MAX_LENGTH):
+        self.backend = backend
+        self.model_name = model_name
+        self.dim = dim
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        if backend == "onnx":
+            try:
+                import onnxruntime
+                from optimum.onnxruntime import ORTModelForFeatureExtraction
+            except ImportError as e:
+                raise ImportError("EMBEDDING_BACKEND=onnx에는 'optimum[onnxruntime]' 패키지가 필요합니다.") from e
+            # ONNX Runtime은 torch와 별도 스레드 풀을 쓰므로 스레드 수를 따로 제한
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = resources.embedding_threads()
+            session_options.inter_op_num_threads = 1
+            self.model = _load_onnx_model(ORTModelForFeatureExtraction, model_name, session_options)
+            self.device = "cpu"
+        else:
+            model = AutoModel.from_pretrained(model_name)
+            model.eval()
+            if backend == "int8":
+                # Linear 층 가중치를 int8로 양자화 (CPU 전용). 정확도 손실은 parity 명령으로 확인
+                model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+                self.device = "cpu"
+            else:
+                self.device = config.DEVICE
+            self.model = model.to(self.device)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt")
+        if self.backend == "onnx":
+            outputs = self.model(**inputs)
+            cls = outputs.last_hidden_state[:, 0]
+            cls = cls.numpy() if hasattr(cls, "numpy") else np.asarray(cls)
+        else:
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            with torch.inference_mode():
+                cls = self.model(**inputs).last_hidden_state[:, 0].float().cpu().numpy()
+        return _truncate(_normalize(cls.astype("float32")), self.dim)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """길이순으로 정렬해 배치 패딩을 줄인 뒤 원래 순서로 되돌립니다."""
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype="float32")
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        encoded = [self._encode_batch([texts[i] for i in order[start:start + self.batch_size]])
+                   for start in range(0, len(order), self.batch_size)]
+        vectors = np.empty((len(texts), encoded[0].shape[1]), dtype="float32")
+        vectors[order] = np.concatenate(encoded)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+class TruncatedEmbeddings(Embeddings):
+    """기존 HuggingFaceEmbeddings 결과에 Matryoshka 차원 축소만 적용하는 래퍼."""
+
+    def __init__(self, base: Embeddings, dim: int):
+        self.base = base
+        self.dim = dim
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return _truncate(np.asarray(self.base.embed_documents(texts), dtype="float32"), self.dim).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return _truncate(np.asarray([self.base.embed_query(text)], dtype="float32"), self.dim)[0].tolist()
+
+
+def create_embeddings_model(backend: str = config.EMBEDDING_BACKEND, dim: int = config.EMBEDDING_DIM) -> Embeddings:
+    if backend not in BACKENDS:
+        raise ValueError(f"지원하지 않는 EMBEDDING_BACKEND: {backend} (가능: {', '.join(BACKENDS)})")
+    logger.info(f"Loading embedding model: {config.EMBEDDING_MODEL_NAME} (backend={backend}, dim={dim or 'full'})")
+    if backend == "hf":
+        base = HuggingFaceEmbeddings(
+            model_name=config.EMBEDDING_MODEL_NAME,
+            model_kwargs={'device': config.DEVICE},
+            encode_kwargs={'normalize_embeddings': True, 'batch_size': config.EMBEDDING_BATCH_SIZE}
+        )
+        return TruncatedEmbeddings(base, dim) if dim else base
+    return ArcticEmbeddings(backend=backend, dim=dim)
+
+
+def embedding_signature(dim: int = config.EMBEDDING_DIM) -> Dict[str, Any]:
+    """인덱스 호환성 판단 기준. 백엔드(정밀도)는 달라도 되지만 모델과 출력 차원은 같아야 합니다."""
+    return {"model": config.EMBEDDING_MODEL_NAME, "dim": dim or None, "pooling": "cls", "normalized": True}
+
+
+# --- Retrieval parity check ---
+def parity_report(reference: np.ndarray, candidate: np.ndarray, queries_ref: np.ndarray,
+                  queries_cand: np.ndarray, k: int) -> Dict[str, float]:
+    """기준 임베딩과 후보 임베딩으로 각각 검색했을 때 top-k가 얼마나 겹치는지 계산합니다 (내적 = 코사인)."""
+    k = min(k, len(reference))
+    top_ref = np.argsort(-queries_ref @ reference.T, axis=1)[:, :k]
+    top_cand = np.argsort(-queries_cand @ candidate.T, axis=1)[:, :k]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(top_ref, top_cand)])
+    top1 = np.mean(top_ref[:, 0] == top_cand[:, 0])
+    report = {"topk_overlap": float(overlap), "top1_agreement": float(top1)}
+    if reference.shape[1] == candidate.shape[1]:
+        report["mean_cosine"] = float(np.mean(np.sum(reference * candidate, axis=1)))
+    return report
+
+
+def main():
+    import index_builder  # index_builder가 이 모듈을 import하므로 순환을 피하기 위해 여기서 import
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="임베딩 백엔드 검색 일치도/속도 비교")
+    sub = parser.add_subparsers(dest="command", required=True)
+    parity_parser = sub.add_parser("parity", help="기준(hf, 전체 차원) 대비 후보 백엔드의 검색 결과 비교")
+    parity_parser.add_argument("--backend", default=config.EMBEDDING_BACKEND, choices=BACKENDS)
+    parity_parser.add_argument("--dim", type=int, default=config.EMBEDDING_DIM)
+    parity_parser.add_argument("--k", type=int, default=10)
+    parity_parser.add_argument("--queries-file", default=None, help="한 줄에 댓글 하나 (없으면 사전 예시 표현을 쿼리로 사용)")
+    args = parser.parse_args()
+
+    documents = [doc.page_content for doc in index_builder.load_csv_documents()]
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = [doc.replace("예시표현:", "").strip() for doc in documents]
+
+    results = {}
+    for name, backend, dim in (("reference", "hf", 0), ("candidate", args.backend, args.dim)):
+        model = create_embeddings_model(backend, dim)
+        start = time.perf_counter()
+        doc_vectors = np.asarray(model.embed_documents(documents), dtype="float32")
+        elapsed = time.perf_counter() - start
+        query_vectors = np.asarray(model.embed_documents(queries), dtype="float32")
+        results[name] = (doc_vectors, query_vectors)
+        print(f"{name:<10} backend={backend:<6} dim={doc_vectors.shape[1]:<5} {len(documents) / elapsed:8.1f} docs/s")
+
+    report = parity_report(results["reference"][0], results["candidate"][0], results["reference"][1], results["candidate"][1], args.k)
+    for key, value in report.items():
+        print(f"{key:<16}: {value:.4f}")
+
+
+if __name__ == "__main__":
+    main()
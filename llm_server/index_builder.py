@@ -0,0 +1,341 @@
+# index_builder.py
+"""
+혐오 표현 사전(mz_hate_speech.csv)으로 FAISS 인덱스를 만들고 검색 설정을 비교하는 도구.
+
+    python index_builder.py build --index-type hnsw            # config.FAISS_SAVE_PATH에 인덱스 생성
+    python index_builder.py benchmark --index-types flat,hnsw,ivfpq --k 5
+"""
+import argparse
+import ctypes
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.document_loaders import CSVLoader
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+import config
+import embeddings_backend
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+INDEX_META_FILENAME = "index_meta.json"
+
+
+def load_csv_documents(csv_path=config.CSV_FILE_PATH) -> List[Document]:
+    loader = CSVLoader(
+        file_path=csv_path,
+        encoding='utf-8',
+        csv_args={'delimiter': ','},
+        source_column=config.CONTENT_COLUMN_NAME,
+        metadata_columns=config.METADATA_COLUMN_NAMES
+    )
+    documents = loader.load()
+    for doc in documents:
+        doc.metadata = {k.strip(): v for k, v in doc.metadata.items()}
+    return documents
+
+
+def embed_documents_in_batches(documents: List[Document], embeddings_model, batch_size: int = config.EMBEDDING_BATCH_SIZE) -> np.ndarray:
+    vectors = []
+    for start in range(0, len(documents), batch_size):
+        batch = documents[start:start + batch_size]
+        vectors.extend(embeddings_model.embed_documents([doc.page_content for doc in batch]))
+        logger.info(f"임베딩 {min(start + batch_size, len(documents))}/{len(documents)}")
+    return np.asarray(vectors, dtype="float32")
+
+
+def create_faiss_index(vectors: np.ndarray, index_type: str = config.FAISS_INDEX_TYPE) -> faiss.Index:
+    """벡터로 인덱스를 학습(필요 시)하고 채웁니다. 사전이 너무 작아 학습할 수 없으면 flat으로 대체합니다."""
+    n, dim = vectors.shape
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"지원하지 않는 FAISS_INDEX_TYPE: {index_type} (가능: {', '.join(INDEX_TYPES)})")
+
+    if index_type == "ivfpq":
+        if n < 2 ** config.PQ_NBITS or dim % config.PQ_M != 0:
+            logger.warning(f"IVF-PQ 학습 불가 (벡터 {n}개, 차원 {dim}, PQ_M {config.PQ_M}). flat 인덱스로 대체합니다.")
+            index_type = "flat"
+        else:
+            nlist = min(config.IVF_NLIST, max(1, n // 39))  # faiss 권장: centroid당 학습 벡터 39개 이상
+            quantizer = faiss.IndexFlatL2(dim)
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, config.PQ_M, config.PQ_NBITS)
+            index.train(vectors)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.HNSW_M)
+        index.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+    elif index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+
+    index.add(vectors)
+    apply_search_params(index)
+    return index
+
+
+def apply_search_params(index: faiss.Index) -> None:
+    """검색 시점 파라미터(efSearch, nprobe)는 저장/로드 후에도 config 값으로 맞춥니다."""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = config.IVF_NPROBE
+
+
+def index_type_of(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
+
+
+def build_vectorstore(documents: List[Document], embeddings_model, index_type: str = config.FAISS_INDEX_TYPE,
+                      vectors: Optional[np.ndarray] = None) -> FAISS:
+    """FAISS.from_documents와 같은 구조의 VectorStore를, 지정한 인덱스 종류로 만듭니다."""
+    if vectors is None:
+        vectors = embed_documents_in_batches(documents, embeddings_model)
+    index = create_faiss_index(vectors, index_type)
+    ids = [str(uuid.uuid4()) for _ in documents]
+    return FAISS(
+        embedding_function=embeddings_model,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(ids, documents))),
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+
+
+def save_vectorstore(vectorstore: FAISS, path: str) -> None:
+    vectorstore.save_local(path)
+    meta = {
+        "index_type": index_type_of(vectorstore.index),
+        "ntotal": vectorstore.index.ntotal,
+        "dim": vectorstore.index.d,
+        "embedding": embeddings_backend.embedding_signature(),
+    }
+    with open(os.path.join(path, INDEX_META_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+RENAME_EXCHANGE = 2  # linux/fs.h
+
+
+def _exchange_paths(path_a: str, path_b: str) -> bool:
+    """두 경로를 renameat2(RENAME_EXCHANGE)로 한 번에 맞바꿉니다. 지원하지 않는 환경이면 False."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+    at_fdcwd = -100
+    if renameat2(at_fdcwd, os.fsencode(path_a), at_fdcwd, os.fsencode(path_b), RENAME_EXCHANGE) != 0:
+        errno = ctypes.get_errno()
+        logger.warning(f"renameat2(RENAME_EXCHANGE) 실패: {os.strerror(errno)}")
+        return False
+    return True
+
+
+def swap_in_staging(staging_path: str, target_path: str) -> str:
+    """
+    staging 인덱스를 실제 경로로 교체하고, 새 버전 디렉터리 경로를 반환합니다.
+    target_path는 버전별 인덱스 디렉터리를 가리키는 심볼릭 링크이고, 새 링크를 옆에 만든 뒤 os.replace로 덮어쓰므로
+    교체 중에도 target_path는 항상 완전한 인덱스를 가리킵니다 (서버가 그 사이에 시작해도 인덱스를 새로 만들지 않음).
+    예전 방식의 실제 디렉터리가 있으면 처음 한 번은 renameat2(RENAME_EXCHANGE)로 링크와 맞바꿉니다.
+    이전 버전 디렉터리는 교체가 끝난 뒤 별도 단계로 삭제합니다.
+    """
+    # 같은 초에 여러 번 교체해도 겹치지 않도록 임의 접미사를 붙임
+    versioned_path = f"{target_path}.{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    os.rename(staging_path, versioned_path)
+    link_tmp = f"{versioned_path}.link-tmp"
+    os.symlink(os.path.basename(versioned_path), link_tmp)  # 같은 디렉터리 기준 상대 링크
+
+    previous_path = None
+    if os.path.islink(target_path):
+        previous_path = os.path.realpath(target_path)
+        os.replace(link_tmp, target_path)
+    elif os.path.isdir(target_path):
+        if _exchange_paths(link_tmp, target_path):
+            previous_path = link_tmp  # 맞바꾼 뒤에는 예전 실제 디렉터리가 link_tmp 이름에 있음
+        else:
+            # RENAME_EXCHANGE를 쓸 수 없으면 이 한 번만 두 단계로 옮김 (이후 재생성부터는 링크 교체로 원자적)
+            logger.warning("기존 인덱스 디렉터리를 링크로 바꾸는 동안 잠시 경로가 비어 있을 수 있습니다.")
+            previous_path = f"{versioned_path}.old"
+            os.rename(target_path, previous_path)
+            os.replace(link_tmp, target_path)
+    else:
+        os.replace(link_tmp, target_path)
+
+    # 백업(이전 버전) 정리: 이미 교체가 끝났으므로 실패해도 실행 중인 인덱스에는 영향 없음
+    if previous_path and os.path.realpath(previous_path) != os.path.realpath(target_path) and os.path.isdir(previous_path):
+        shutil.rmtree(previous_path, ignore_errors=True)
+    return versioned_path
+
+
+@contextmanager
+def index_write_lock(target_path: str = config.FAISS_SAVE_PATH) -> Iterator[None]:
+    """인덱스를 교체하는 쪽(재생성 도구, 서버 워커의 사전 추가)이 한 번에 하나씩만 교체하도록 하는 프로세스 간 락."""
+    with open(f"{target_path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def publish_vectorstore(vectorstore: FAISS, target_path: str = config.FAISS_SAVE_PATH) -> str:
+    """
+    인덱스를 staging 디렉터리에 저장한 뒤 swap_in_staging으로 교체합니다. 새 버전 디렉터리 경로를 반환합니다.
+    target_path에 바로 저장하면 링크가 가리키는 현재 버전을 제자리에서 덮어쓰게 되므로 항상 이 함수로 저장합니다.
+    """
+    staging_path = f"{target_path}.staging-{uuid.uuid4().hex[:8]}"
+    try:
+        save_vectorstore(vectorstore, staging_path)
+        return swap_in_staging(staging_path, target_path)
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)  # 교체에 성공했으면 이미 옮겨져 없음
+
+
+def resolve_index_dir(target_path: str = config.FAISS_SAVE_PATH) -> str:
+    """target_path가 지금 가리키는 버전 디렉터리. 재생성/교체되면 값이 바뀝니다."""
+    return os.path.realpath(target_path)
+
+
+def read_index_meta(path: str) -> Optional[Dict[str, Any]]:
+    meta_path = os.path.join(path, INDEX_META_FILENAME)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_index_compatible(path: str) -> bool:
+    """저장된 인덱스가 현재 임베딩 설정(모델/출력 차원)으로 만든 것인지 확인합니다."""
+    meta = read_index_meta(path)
+    if meta is None:
+        # 메타 정보가 없는 예전 인덱스는 기본 설정(전체 차원)으로 만든 것으로 간주
+        return not config.EMBEDDING_DIM
+    return meta.get("embedding", embeddings_backend.embedding_signature(0)) == embeddings_backend.embedding_signature()
+
+
+def load_vectorstore(path: str, embeddings_model) -> FAISS:
+    vectorstore = FAISS.load_local(path, embeddings_model, allow_dangerous_deserialization=True)
+    apply_search_params(vectorstore.index)
+    loaded_type = index_type_of(vectorstore.index)
+    if loaded_type != config.FAISS_INDEX_TYPE:
+        logger.warning(
+            f"저장된 인덱스 종류({loaded_type})가 FAISS_INDEX_TYPE({config.FAISS_INDEX_TYPE})와 다릅니다. "
+            f"'python index_builder.py build'로 다시 만드세요."
+        )
+    return vectorstore
+
+
+def ensure_saved_index(path: str = config.FAISS_SAVE_PATH, csv_path: str = config.CSV_FILE_PATH) -> bool:
+    """
+    저장된 인덱스가 없거나 현재 임베딩 설정과 맞지 않으면 CSV로 만들어 저장합니다. 새로 만들었으면 True.
+    여러 프로세스가 같은 인덱스를 읽기 전에 부모 프로세스에서 한 번만 호출합니다.
+    """
+    if os.path.isdir(path) and os.listdir(path) and is_index_compatible(path):
+        return False
+    logger.info(f"'{path}'에 쓸 수 있는 인덱스가 없어 새로 만듭니다 ({config.FAISS_INDEX_TYPE}).")
+    vectorstore = build_vectorstore(load_csv_documents(csv_path), create_embeddings_model())
+    with index_write_lock(path):
+        publish_vectorstore(vectorstore, path)
+    return True
+
+
+def create_embeddings_model():
+    return embeddings_backend.create_embeddings_model()
+
+
+# --- Benchmark ---
+def _search_params_grid(index_type: str) -> List[Dict[str, int]]:
+    if index_type == "hnsw":
+        return [{"efSearch": ef} for ef in (16, 32, 64, 128, 256)]
+    if index_type == "ivfpq":
+        return [{"nprobe": nprobe} for nprobe in (1, 4, 16, 64)]
+    return [{}]
+
+
+def _set_search_params(index: faiss.Index, params: Dict[str, int]) -> None:
+    if "efSearch" in params:
+        index.hnsw.efSearch = params["efSearch"]
+    if "nprobe" in params:
+        index.nprobe = min(params["nprobe"], index.nlist)
+
+
+def benchmark(vectors: np.ndarray, queries: np.ndarray, index_types: List[str], k: int) -> List[Dict[str, Any]]:
+    """flat 정확 검색 결과를 기준으로 각 인덱스/검색 설정의 recall@k와 쿼리당 지연을 측정합니다."""
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for index_type in index_types:
+        build_start = time.perf_counter()
+        index = create_faiss_index(vectors, index_type)
+        build_seconds = time.perf_counter() - build_start
+        size_bytes = faiss.serialize_index(index).nbytes
+        for params in _search_params_grid(index_type_of(index)):
+            _set_search_params(index, params)
+            search_start = time.perf_counter()
+            _, found = index.search(queries, k)
+            latency_ms = (time.perf_counter() - search_start) * 1000 / len(queries)
+            recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+            rows.append({
+                "index_type": index_type_of(index), "params": params, "recall_at_k": round(float(recall), 4),
+                "latency_ms": round(latency_ms, 4), "build_s": round(build_seconds, 2), "size_mb": round(size_bytes / 2 ** 20, 2),
+            })
+    return rows
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="FAISS 인덱스 빌드/벤치마크")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="CSV로 인덱스를 학습/생성하여 저장")
+    build_parser.add_argument("--index-type", default=config.FAISS_INDEX_TYPE, choices=INDEX_TYPES)
+    build_parser.add_argument("--output", default=config.FAISS_SAVE_PATH)
+
+    bench_parser = sub.add_parser("benchmark", help="인덱스 종류/검색 설정별 recall@k와 지연 비교")
+    bench_parser.add_argument("--index-types", default="flat,hnsw,ivfpq")
+    bench_parser.add_argument("--k", type=int, default=10)
+    bench_parser.add_argument("--queries-file", default=None, help="한 줄에 댓글 하나 (없으면 사전 항목 일부를 쿼리로 사용)")
+    bench_parser.add_argument("--num-queries", type=int, default=200)
+    args = parser.parse_args()
+
+    embeddings_model = create_embeddings_model()
+    documents = load_csv_documents()
+    logger.info(f"사전 항목 {len(documents)}개 로드됨")
+
+    if args.command == "build":
+        start = time.perf_counter()
+        vectorstore = build_vectorstore(documents, embeddings_model, args.index_type)
+        with index_write_lock(args.output):
+            publish_vectorstore(vectorstore, args.output)
+        logger.info(f"'{args.output}'에 {index_type_of(vectorstore.index)} 인덱스 저장 완료 ({time.perf_counter() - start:.1f}초)")
+        return
+
+    vectors = embed_documents_in_batches(documents, embeddings_model)
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            query_texts = [line.strip() for line in f if line.strip()][:args.num_queries]
+        queries = np.asarray(embeddings_model.embed_documents(query_texts), dtype="float32")
+    else:
+        rng = np.random.default_rng(0)
+        queries = vectors[rng.choice(len(vectors), size=min(args.num_queries, len(vectors)), replace=False)]
+
+    print(f"{'index':<8}{'params':<20}{'recall@k':>10}{'ms/query':>10}{'build_s':>9}{'size_mb':>9}")
+    for row in benchmark(vectors, queries, args.index_types.split(","), args.k):
+        print(f"{row['index_type']:<8}{json.dumps(row['params']):<20}{row['recall_at_k']:>10.4f}"
+              f"{row['latency_ms']:>10.4f}{row['build_s']:>9.2f}{row['size_mb']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
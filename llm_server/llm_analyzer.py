@@ -1,24 +1,26 @@
 import os
 import logging
 import re
+import numpy as np
 import torch
 import torch.nn as nn
 from typing import List, Dict, Any, Tuple, Optional
 from operator import itemgetter
 from huggingface_hub import hf_hub_download
-from langchain_community.document_loaders import CSVLoader
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
-from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI
 
-from transformers import ElectraModel, ElectraTokenizer
-from concurrent.futures import ThreadPoolExecutor # For potentially parallelizing KoELECTRA
+from transformers import ElectraModel, ElectraTokenizer, ElectraTokenizerFast, PreTrainedTokenizerBase
 
 import config
+import index_builder
+import llm_client
+import profiler
+from text_normalizer import normalize_text
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -29,11 +31,12 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 # --- Global Variables for Models and Components ---
 koelectra_model: Optional[nn.Module] = None
-koelectra_tokenizer: Optional[ElectraTokenizer] = None
-embeddings_model: Optional[HuggingFaceEmbeddings] = None
+koelectra_tokenizer: Optional[PreTrainedTokenizerBase] = None
+embeddings_model: Optional[Embeddings] = None
 vectorstore: Optional[FAISS] = None
+vectorstore_dir: Optional[str] = None # vectorstore를 읽어 온 버전 디렉터리 (FAISS_SAVE_PATH 링크가 가리키던 곳)
 chat_openai_model: Optional[ChatOpenAI] = None
-rag_chain: Optional[Any] = None
+prompt_chain: Optional[Any] = None # 예시 검색 + 프롬프트 조립 (LLM 호출은 llm_client가 담당)
 
 # --- KoELECTRA Model Definition ---
 class KOELECTRAMultiLabel(nn.Module):
@@ -51,7 +54,12 @@ def load_koelectra_components():
     global koelectra_model, koelectra_tokenizer
     try:
         logger.info(f"Loading KoELECTRA tokenizer: {config.KOELECTRA_BASE_MODEL_NAME}...")
-        koelectra_tokenizer = ElectraTokenizer.from_pretrained(config.KOELECTRA_BASE_MODEL_NAME)
+        try:
+            # Rust 기반 fast tokenizer: 배치 인코딩이 순수 Python 토크나이저보다 훨씬 빠름
+            koelectra_tokenizer = ElectraTokenizerFast.from_pretrained(config.KOELECTRA_BASE_MODEL_NAME)
+        except Exception as e:
+            logger.warning(f"Fast tokenizer unavailable, falling back to ElectraTokenizer: {e}")
+            koelectra_tokenizer = ElectraTokenizer.from_pretrained(config.KOELECTRA_BASE_MODEL_NAME)
 
         logger.info(f"Downloading fine-tuned KoELECTRA model from Hugging Face: {config.KOELECTRA_FINETUNED_REPO_ID}/{config.KOELECTRA_FINETUNED_FILENAME}...")
         model_path = hf_hub_download(repo_id=config.KOELECTRA_FINETUNED_REPO_ID, filename=config.KOELECTRA_FINETUNED_FILENAME)
@@ -67,35 +75,137 @@ def load_koelectra_components():
         logger.error(f"Error loading KoELECTRA components: {e}", exc_info=True)
         return False
 
-def get_koelectra_context(text: str) -> Tuple[str, List[float]]:
-    if koelectra_model is None or koelectra_tokenizer is None:
-        logger.warning("KoELECTRA model or tokenizer not loaded. Returning failure message.")
-        return "[KoELECTRA 모델 로드 실패]", []
+KOELECTRA_LABEL_NAMES = ["출신차별", "외모차별", "정치성향차별", "욕설", "연령차별", "성차별", "인종차별", "종교차별"]
+KOELECTRA_LABEL_THRESHOLD = 0.4
+
+def labels_from_mask(mask: int) -> List[str]:
+    return [label for bit, label in enumerate(KOELECTRA_LABEL_NAMES) if mask >> bit & 1]
+
+def _to_label_mask(hits: np.ndarray) -> np.ndarray:
+    """(댓글 수, 카테고리 수) bool 행렬 → 댓글별 카테고리 비트마스크 (bit i = KOELECTRA_LABEL_NAMES[i])."""
+    return hits.astype(np.int64) @ (1 << np.arange(hits.shape[1], dtype=np.int64))
+
+class KoelectraScores:
+    """KoelectraBatch의 댓글 한 개 보기. 프롬프트용 문자열은 context()를 부를 때 한 번만 만듭니다."""
+    __slots__ = ("batch", "index", "_context")
+
+    def __init__(self, batch: "KoelectraBatch", index: int):
+        self.batch = batch
+        self.index = index
+        self._context: Optional[str] = None
+
+    @property
+    def probs(self) -> np.ndarray:
+        return self.batch.probs[self.index]
+
+    @property
+    def loaded(self) -> bool:
+        return self.batch.loaded
+
+    @property
+    def label_mask(self) -> int:
+        return int(self.batch.label_mask[self.index])
+
+    @property
+    def bypass(self) -> bool:
+        return bool(self.batch.bypass_mask[self.index])
+
+    @property
+    def include_koelectra(self) -> bool:
+        return bool(self.batch.include_koelectra[self.index])
+
+    def probs_list(self) -> Optional[List[float]]:
+        return self.probs.tolist() if self.loaded else None
+
+    def context(self) -> str:
+        """LLM 프롬프트에 넣는 KoELECTRA 분석 문자열 (원문 + 카테고리별 확률)."""
+        if self._context is None:
+            if not self.loaded:
+                self._context = "[KoELECTRA 모델 로드 실패]"
+            else:
+                lines = [f'입력 문장: "{self.batch.texts[self.index]}"', "카테고리별 확률:"]
+                lines.extend(f" - {label:<10}: {prob:.3f}" for label, prob in zip(KOELECTRA_LABEL_NAMES, self.probs))
+                lines.append(self.summary())
+                self._context = "\n".join(lines)
+        return self._context
+
+    def summary(self) -> str:
+        if not self.loaded:
+            return "[KoELECTRA 모델 로드 실패]"
+        active = labels_from_mask(self.label_mask)
+        if not active:
+            return "판단 유보: 어떤 혐오 카테고리도 threshold를 넘지 않음."
+        return f"혐오 탐지됨! 속성: {', '.join(active)}"
+
+    def output(self) -> str:
+        """결과의 koelectra_output 값. 프롬프트에 들어간 경우에만 전체 문자열, 아니면 한 줄 요약."""
+        return self.context() if self.include_koelectra else self.summary()
+
+class KoelectraBatch:
+    """
+    KoELECTRA micro-batch 결과: (댓글 수, 카테고리 수) 확률 행렬과 댓글별 카테고리 비트마스크.
+    bypass 여부와 프롬프트에 KoELECTRA 결과를 넣을지는 배치 전체에 대해 한 번에 계산됩니다.
+    """
+
+    def __init__(self, texts: List[str], probs: Optional[np.ndarray]):
+        self.texts = texts
+        self.loaded = probs is not None
+        self.probs = probs if probs is not None else np.zeros((len(texts), len(KOELECTRA_LABEL_NAMES)), dtype=np.float32)
+        self.label_mask = _to_label_mask(self.probs >= KOELECTRA_LABEL_THRESHOLD)
+        if self.loaded:
+            self.bypass_mask = _to_label_mask(self.probs >= config.KOELECTRA_BYPASS_THRESHOLD)
+        else:
+            self.bypass_mask = np.zeros(len(texts), dtype=np.int64)
+        self.include_koelectra = self.loaded & (self.label_mask != 0)
+        self._rows = [KoelectraScores(self, i) for i in range(len(texts))]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index: int) -> KoelectraScores:
+        return self._rows[index]
 
-    label_names = ["출신차별", "외모차별", "정치성향차별", "욕설", "연령차별", "성차별", "인종차별", "종교차별"]
-    threshold = 0.4 
+    def __iter__(self):
+        return iter(self._rows)
 
-    inputs = koelectra_tokenizer(text, return_tensors="pt", truncation=True, padding="max_length", max_length=512)
+def classify_koelectra_batch(texts: List[str], normalized_texts: Optional[List[str]] = None) -> KoelectraBatch:
+    """
+    여러 댓글을 한 번의 forward로 분류합니다 (가장 긴 문장 길이에 맞춘 동적 패딩).
+    모델 입력은 정규화된 텍스트이고, 프롬프트용 문자열(KoelectraScores.context)에는 원문을 씁니다.
+    """
+    if koelectra_model is None or koelectra_tokenizer is None:
+        logger.warning("KoELECTRA model or tokenizer not loaded. Returning failure result.")
+        return KoelectraBatch(texts, None)
+    if not texts:
+        return KoelectraBatch(texts, np.zeros((0, len(KOELECTRA_LABEL_NAMES)), dtype=np.float32))
+
+    if normalized_texts is None:
+        normalized_texts = [normalize_text(text) for text in texts]
+    with profiler.region("koelectra_tokenize"):
+        inputs = koelectra_tokenizer(normalized_texts, return_tensors="pt", truncation=True, padding=True, max_length=512)
     input_ids = inputs["input_ids"].to(config.DEVICE)
     attention_mask = inputs["attention_mask"].to(config.DEVICE)
 
-    with torch.no_grad():
+    with torch.no_grad(), profiler.region("KOELECTRAMultiLabel"):
         logits = koelectra_model(input_ids, attention_mask)
-        probs = torch.sigmoid(logits).cpu().numpy()[0]
-        preds = (probs >= threshold).astype(int)
-
-    lines = [f'입력 문장: "{text}"', "카테고리별 확률:"]
-    for label, prob in zip(label_names, probs):
-        lines.append(f" - {label:<10}: {prob:.3f}")
-
-    active = [label for label, p_val in zip(label_names, preds) if p_val]
-    if not active:
-        lines.append("판단 유보: 어떤 혐오 카테고리도 threshold를 넘지 않음.")
-    else:
-        lines.append(f"혐오 탐지됨! 속성: {', '.join(active)}")
-    
-    context_str = "\n".join(lines)
-    return context_str, probs.tolist()
+        probs_batch = torch.sigmoid(logits).cpu().numpy()
+
+    return KoelectraBatch(texts, probs_batch)
+
+def build_bypass_result(scores: KoelectraScores) -> Optional[Dict[str, Any]]:
+    """KoELECTRA 확률이 bypass threshold 이상이면 LLM 없이 '혐오' 결과를 만들고, 아니면 None을 반환합니다."""
+    if not scores.bypass:
+        return None
+    detected = labels_from_mask(int(scores.batch.bypass_mask[scores.index]))
+    logger.debug(
+        f"KoELECTRA 확률이 threshold {config.KOELECTRA_BYPASS_THRESHOLD} 이상이므로 LLM 호출 생략: {scores.probs_list()}"
+    )
+    return {
+        "classification": "혐오",
+        "reason": f"KoELECTRA의 높은 확률로 인해 판단됨 (카테고리: {', '.join(detected)})",
+        "raw_llm_output": "[LLM 호출 생략됨]",
+        "koelectra_output": scores.summary()
+    }
 
 # --- Prompt Templates ---
 COMMON_PREFIX = """당신은 입력된 한국어 문장이 '혐오' 표현인지 '정상'적인 내용인지 분류하는 전문가입니다.
@@ -156,11 +266,16 @@ def safe_example_formatter(doc: Document) -> str:
         return f"입력: {user_comment}\n[최종 분류]: 포맷팅오류\n[판단 근거]: 포맷팅오류"
     
 def select_and_format_examples(data_input: Dict, db: FAISS, threshold: float, k: int) -> str:
-    user_comment = data_input[config.RAG_CHAIN_INPUT_KEY]
+    # 검색은 정규화된 텍스트로 (없으면 원문)
+    user_comment = data_input.get(config.RETRIEVAL_QUERY_KEY) or data_input[config.RAG_CHAIN_INPUT_KEY]
     if not db:
         return "[VectorStore 로드 실패]"
     try:
-        results_with_scores: List[Tuple[Document, float]] = db.similarity_search_with_score(user_comment, k=k)
+        # similarity_search_with_score와 같지만, 프로파일에서 임베딩과 FAISS 검색 시간을 나눠 보기 위해 두 단계로 호출
+        with profiler.region("embedder"):
+            query_vector = db.embeddings.embed_query(user_comment)
+        with profiler.region("faiss_search"):
+            results_with_scores: List[Tuple[Document, float]] = db.similarity_search_with_score_by_vector(query_vector, k=k)
         filtered_docs = [doc for doc, score in results_with_scores if score >= threshold]
         if not filtered_docs:
             return "" 
@@ -192,64 +307,67 @@ def assemble_final_prompt(input_dict: Dict) -> str:
     final_prompt_str = "\n\n".join(prompt_parts)
     return final_prompt_str
 
-def initialize_llm_components():
-    global embeddings_model, vectorstore, chat_openai_model, rag_chain
+def initialize_llm_components(with_openai: bool = True, build_index: bool = True):
+    """
+    모든 분석 구성 요소를 초기화합니다.
+    with_openai=False이면 OpenAI 클라이언트 없이 KoELECTRA, 임베딩, VectorStore, 프롬프트 체인만 준비합니다
+    (bulk_score 워커 프로세스처럼 프롬프트까지만 만드는 경우).
+    build_index=False이면 저장된 인덱스를 읽기만 하고, 없거나 설정이 맞지 않으면 실패합니다
+    (여러 워커 프로세스가 같은 경로에 동시에 인덱스를 쓰지 않도록).
+    """
+    global embeddings_model, vectorstore, vectorstore_dir, chat_openai_model, prompt_chain
     logger.info("LLM Analyzer: Initializing components...")
     if not load_koelectra_components():
         logger.error("Failed to load KoELECTRA, halting LLM initialization.")
         return False
     try:
-        logger.info(f"Loading embedding model: {config.EMBEDDING_MODEL_NAME}")
-        embeddings_model = HuggingFaceEmbeddings(
-            model_name=config.EMBEDDING_MODEL_NAME,
-            model_kwargs={'device': config.DEVICE},
-            encode_kwargs={'normalize_embeddings': True} 
-        )
+        embeddings_model = index_builder.create_embeddings_model()
         logger.info(f"Loading documents from: {config.CSV_FILE_PATH}")
         if not os.path.exists(config.CSV_FILE_PATH):
             logger.error(f"CSV file not found at: {config.CSV_FILE_PATH}")
             return False
-        loader = CSVLoader(
-            file_path=config.CSV_FILE_PATH,
-            encoding='utf-8',
-            csv_args={'delimiter': ','},
-            source_column=config.CONTENT_COLUMN_NAME,
-            metadata_columns=config.METADATA_COLUMN_NAMES
-        )
-        all_documents = loader.load()
-        for doc in all_documents:
-            doc.metadata = {k.strip(): v for k, v in doc.metadata.items()}
+        all_documents = index_builder.load_csv_documents(config.CSV_FILE_PATH)
         if not all_documents:
             logger.error("No documents loaded from CSV. Halting initialization.")
             return False
         logger.info(f"Loaded {len(all_documents)} documents.")
-        if os.path.exists(config.FAISS_SAVE_PATH) and os.listdir(config.FAISS_SAVE_PATH):
+        index_exists = os.path.exists(config.FAISS_SAVE_PATH) and os.listdir(config.FAISS_SAVE_PATH)
+        if index_exists and not index_builder.is_index_compatible(config.FAISS_SAVE_PATH):
+            logger.warning(f"FAISS index at '{config.FAISS_SAVE_PATH}' was built with different embedding settings. Rebuilding.")
+            index_exists = False
+        if index_exists:
             logger.info(f"Loading FAISS index from '{config.FAISS_SAVE_PATH}'.")
-            vectorstore = FAISS.load_local(config.FAISS_SAVE_PATH, embeddings_model, allow_dangerous_deserialization=True)
+            vectorstore_dir = index_builder.resolve_index_dir(config.FAISS_SAVE_PATH)
+            vectorstore = index_builder.load_vectorstore(vectorstore_dir, embeddings_model)
+            if vectorstore.index.ntotal != len(all_documents):
+                logger.warning(
+                    f"FAISS index has {vectorstore.index.ntotal} vectors but CSV has {len(all_documents)} rows. "
+                    f"Run 'python check_vectorDB.py diff' / 'rebuild'."
+                )
+        elif not build_index:
+            logger.error(f"No compatible FAISS index at '{config.FAISS_SAVE_PATH}' and building is disabled in this process.")
+            return False
         else:
-            logger.info(f"Creating new FAISS index at '{config.FAISS_SAVE_PATH}'.")
-            vectorstore = FAISS.from_documents(all_documents, embeddings_model)
-            vectorstore.save_local(config.FAISS_SAVE_PATH)
+            logger.info(f"Creating new FAISS index ({config.FAISS_INDEX_TYPE}) at '{config.FAISS_SAVE_PATH}'.")
+            vectorstore = index_builder.build_vectorstore(all_documents, embeddings_model)
+            with index_builder.index_write_lock(config.FAISS_SAVE_PATH):
+                vectorstore_dir = index_builder.publish_vectorstore(vectorstore, config.FAISS_SAVE_PATH)
         if not vectorstore:
              logger.error("FAISS index creation/loading failed.")
              return False
-        logger.info(f"Initializing OpenAI LLM: {config.OPENAI_MODEL_NAME}")
-        if not config.OPENAI_API_KEY:
-            logger.error("OPENAI_API_KEY not found in environment variables or .env file.")
-            return False
-        chat_openai_model = ChatOpenAI(
-            model_name=config.OPENAI_MODEL_NAME,
-            openai_api_key=config.OPENAI_API_KEY,
-            temperature=config.TEMPERATURE,
-            max_tokens=config.MAX_NEW_TOKENS,
-            model_kwargs={"top_p": config.TOP_P}
-        )
-        if not chat_openai_model:
-            logger.error("ChatOpenAI model creation failed.")
-            return False
-        rag_chain = (
+        if with_openai:
+            logger.info(f"Initializing OpenAI LLM: {config.OPENAI_MODEL_NAME}")
+            if not config.OPENAI_API_KEY:
+                logger.error("OPENAI_API_KEY not found in environment variables or .env file.")
+                return False
+            chat_openai_model = llm_client.get_chat_model()
+            if not chat_openai_model:
+                logger.error("ChatOpenAI model creation failed.")
+                return False
+        prompt_chain = (
             {
                 config.RAG_CHAIN_INPUT_KEY: itemgetter(config.RAG_CHAIN_INPUT_KEY),
+                config.RETRIEVAL_QUERY_KEY: itemgetter(config.RETRIEVAL_QUERY_KEY),
                 config.KOELECTRA_CONTEXT_KEY: itemgetter(config.KOELECTRA_CONTEXT_KEY),
                 config.INCLUDE_KOELECTRA_KEY: itemgetter(config.INCLUDE_KOELECTRA_KEY),
                 "selected_examples_str": RunnableLambda(
@@ -262,8 +380,6 @@ def initialize_llm_components():
                 )
             }
             | RunnableLambda(assemble_final_prompt)
-            | chat_openai_model
-            | StrOutputParser()
         )
         logger.info("LLM Analyzer: All components initialized successfully.")
         return True
@@ -271,6 +387,20 @@ def initialize_llm_components():
         logger.error(f"LLM Analyzer: Error during initialization: {e}", exc_info=True)
         return False
 
+def reload_vectorstore_if_changed() -> bool:
+    """
+    check_vectorDB.py rebuild나 다른 워커가 FAISS_SAVE_PATH를 새 버전으로 교체했으면 그 인덱스를 다시 읽습니다.
+    index_write_lock 안에서 불러야 확인과 이후 교체 사이에 다른 교체가 끼어들지 않습니다. 다시 읽었으면 True.
+    """
+    global vectorstore, vectorstore_dir
+    current_dir = index_builder.resolve_index_dir(config.FAISS_SAVE_PATH)
+    if current_dir == vectorstore_dir:
+        return False
+    logger.info(f"FAISS index at '{config.FAISS_SAVE_PATH}' was replaced ({vectorstore_dir} -> {current_dir}). Reloading.")
+    vectorstore = index_builder.load_vectorstore(current_dir, embeddings_model)
+    vectorstore_dir = current_dir
+    return True
+
 def parse_llm_output(llm_text: str) -> Tuple[str, str]:
     classification = "불명확"
     reason = "파싱 실패"
@@ -299,11 +429,75 @@ def parse_llm_output(llm_text: str) -> Tuple[str, str]:
         
     return classification, reason
 
+def get_top_retrieval_score(comment_text: str) -> float:
+    """사전에서 가장 비슷한 표현의 relevance score (0~1, 높을수록 유사). 실패 시 0."""
+    if not vectorstore:
+        return 0.0
+    try:
+        results = vectorstore.similarity_search_with_relevance_scores(normalize_text(comment_text), k=1)
+        return float(results[0][1]) if results else 0.0
+    except Exception as e:
+        logger.warning(f"Degraded mode retrieval failed: {e}")
+        return 0.0
+
+def build_degraded_result(comment_text: str, scores: KoelectraScores) -> Dict[str, Any]:
+    """LLM을 쓸 수 없을 때 KoELECTRA 확률과 사전 검색 점수만으로 빠르게 내리는 판정."""
+    max_prob = float(scores.probs.max(initial=0.0)) if scores.loaded else 0.0
+    retrieval_score = get_top_retrieval_score(comment_text)
+    is_hateful = max_prob >= config.DEGRADED_HATE_THRESHOLD or retrieval_score >= config.DEGRADED_RETRIEVAL_THRESHOLD
+    return {
+        "classification": "혐오" if is_hateful else "정상",
+        "reason": f"LLM 사용 불가로 간이 판정됨 (KoELECTRA 최대 확률: {max_prob:.2f}, 사전 유사도: {retrieval_score:.2f})",
+        "raw_llm_output": "[LLM 사용 불가 - degraded mode]",
+        "koelectra_output": scores.output(),
+        "degraded": True
+    }
+
+def build_prompt(comment_text: str, scores: Optional[KoelectraScores] = None) -> str:
+    """
+    예시 검색 + 프롬프트 조립 (LLM 호출 없음, CPU 단계).
+    KoELECTRA 문자열은 어떤 카테고리든 threshold를 넘어 프롬프트에 들어갈 때만 만듭니다. scores가 None이면 KoELECTRA 정보 없이 조립합니다.
+    """
+    include_koelectra = scores is not None and scores.include_koelectra
+    input_data = {
+        config.RAG_CHAIN_INPUT_KEY: comment_text,
+        config.RETRIEVAL_QUERY_KEY: normalize_text(comment_text),
+        config.KOELECTRA_CONTEXT_KEY: scores.context() if include_koelectra else "",
+        config.INCLUDE_KOELECTRA_KEY: include_koelectra
+    }
+    logger.debug(f"Invoking RAG chain with input: user_comment='{comment_text[:30]}...', include_koelectra={include_koelectra}")
+    return prompt_chain.invoke(input_data)
+
+def build_llm_result(comment_text: str, raw_llm_output: str, koelectra_output: str) -> Dict[str, Any]:
+    logger.debug(f"Raw LLM output for '{comment_text[:50]}...':\n{raw_llm_output}")
+    classification, reason = parse_llm_output(raw_llm_output)
+    logger.debug(f"Analyzed '{comment_text[:50]}...': Class='{classification}', Reason='{reason[:50]}...'")
+    return {
+        "classification": classification,
+        "reason": reason,
+        "raw_llm_output": raw_llm_output,
+        "koelectra_output": koelectra_output
+    }
+
+def run_llm_stage(comment_text: str, scores: KoelectraScores, low_priority: bool = False) -> Dict[str, Any]:
+    """
+    예시 검색 + 프롬프트 조립 후 LLM을 호출하고 결과를 파싱합니다.
+    LLM을 쓸 수 없으면(회로 차단/재시도 소진/한도 대기 초과) degraded 결과를 반환하고, 그 외 예외는 호출자에게 전달됩니다.
+    low_priority 호출은 OpenAI 한도가 부족하면 rate_governor.RateLimitShedError로 버려집니다.
+    """
+    prompt = build_prompt(comment_text, scores)
+    try:
+        raw_llm_output = llm_client.invoke(prompt, model=chat_openai_model, low_priority=low_priority)
+    except llm_client.LLMUnavailableError as e:
+        logger.warning(f"LLM unavailable, returning degraded verdict for '{comment_text[:30]}...': {e}")
+        return build_degraded_result(comment_text, scores)
+    return build_llm_result(comment_text, raw_llm_output, scores.output())
+
 def analyze_comment(comment_text: str) -> Dict[str, Any]:
-    if not all([rag_chain, koelectra_model, chat_openai_model, vectorstore, embeddings_model]):
+    if not all([prompt_chain, koelectra_model, chat_openai_model, vectorstore, embeddings_model]):
         logger.error("LLM Analyzer: One or more components not initialized. Cannot analyze.")
         missing_components = [name for name, comp in [
-            ("RAG chain", rag_chain), ("KoELECTRA model", koelectra_model),
+            ("Prompt chain", prompt_chain), ("KoELECTRA model", koelectra_model),
             ("ChatOpenAI model", chat_openai_model), ("Vectorstore", vectorstore),
             ("Embeddings model", embeddings_model)
         ] if not comp]
@@ -314,123 +508,22 @@ def analyze_comment(comment_text: str) -> Dict[str, Any]:
             "koelectra_output": ""
         }
 
-    koelectra_context_str = "[KoELECTRA 분석 정보 없음]"
-    try:
-        koelectra_context_str, probs = get_koelectra_context(comment_text)
-        include_koelectra = (
-            "[KoELECTRA 모델 로드 실패]" not in koelectra_context_str
-            and "판단 유보:" not in koelectra_context_str
-            and koelectra_context_str.strip() != ""
-        )
-        # threshold 기준: 확률 분포가 너무 높으면 KoELECTRA로만 판단
-        if any(p >= config.KOELECTRA_BYPASS_THRESHOLD for p in probs):
-
-            logger.info(
-                f"KoELECTRA 확률이 threshold {config.KOELECTRA_BYPASS_THRESHOLD} 이상이므로 LLM 호출 생략: {probs}"
-            )
-            active_labels = ["출신차별", "외모차별", "정치성향차별", "욕설", "연령차별", "성차별", "인종차별", "종교차별"]
-            detected = [label for label, v in zip(active_labels, probs) if v >= config.KOELECTRA_BYPASS_THRESHOLD]
-            return {
-                "classification": "혐오",
-                "reason": f"KoELECTRA의 높은 확률로 인해 판단됨 (카테고리: {', '.join(detected)})",
-                "raw_llm_output": "[LLM 호출 생략됨]",
-                "koelectra_output": koelectra_context_str
-            }
-
-        input_data = {
-            config.RAG_CHAIN_INPUT_KEY: comment_text,
-            config.KOELECTRA_CONTEXT_KEY: koelectra_context_str,
-            config.INCLUDE_KOELECTRA_KEY: include_koelectra
-        }
-        logger.debug(f"Invoking RAG chain with input: user_comment='{comment_text[:30]}...', include_koelectra={include_koelectra}")
-        raw_llm_output = rag_chain.invoke(input_data)
-        logger.debug(f"Raw LLM output for '{comment_text[:50]}...':\n{raw_llm_output}")
-        classification, reason = parse_llm_output(raw_llm_output)
-        logger.info(f"Analyzed '{comment_text[:50]}...': Class='{classification}', Reason='{reason[:50]}...'")
-        return {
-            "classification": classification,
-            "reason": reason,
-            "raw_llm_output": raw_llm_output,
-            "koelectra_output": koelectra_context_str
-        }
-    except Exception as e:
-        logger.error(f"LLM Analyzer: Error during RAG chain execution for '{comment_text[:50]}...': {e}", exc_info=True)
-        return {
-            "classification": "오류",
-            "reason": f"분석 중 오류 발생: {str(e)}",
-            "raw_llm_output": "",
-            "koelectra_output": koelectra_context_str
-        }
+    # KoELECTRA, 예시 검색, LLM 호출을 파이프라인에서 겹쳐 실행 (오류는 결과 dict로 반환됨)
+    import pipeline  # pipeline이 이 모듈을 import하므로 순환 import를 피해 여기서 가져옴
+    return pipeline.get_pipeline().analyze_batch([comment_text])[0]
 
-def analyze_comments_batch(comments: List[str], max_concurrency: int = 5) -> List[Dict[str, Any]]:
-    if not all([rag_chain, koelectra_model, chat_openai_model, vectorstore, embeddings_model]):
+def analyze_comments_batch(comments: List[str]) -> List[Dict[str, Any]]:
+    """
+    여러 댓글을 분석합니다. KoELECTRA는 micro-batch 단위로, LLM 호출은 비동기로 겹쳐 실행되며
+    동시 LLM 호출 수는 config.PIPELINE_LLM_CONCURRENCY로 제한됩니다.
+    """
+    if not all([prompt_chain, koelectra_model, chat_openai_model, vectorstore, embeddings_model]):
         logger.error("LLM Analyzer: One or more components not initialized. Cannot analyze batch.")
         error_reason = "분석기 초기화 실패. 필수 구성 요소 누락."
         return [dict(classification="오류", reason=error_reason, raw_llm_output="", koelectra_output="")] * len(comments)
 
-    logger.info(f"Starting batch analysis for {len(comments)} comments with max_concurrency={max_concurrency}.")
-
-    bypass_threshold = config.KOELECTRA_BYPASS_THRESHOLD
-    label_names = ["출신차별", "외모차별", "정치성향차별", "욕설", "연령차별", "성차별", "인종차별", "종교차별"]
-
-    final_results: List[Optional[Dict[str, Any]]] = [None] * len(comments)
-    rag_input_list: List[Dict[str, Any]] = []
-    rag_input_indices: List[int] = []
-
-    for i, comment_text in enumerate(comments):
-        if (i + 1) % 10 == 0 or (i + 1) == len(comments):
-            logger.info(f"Processing KoELECTRA for comment {i+1}/{len(comments)}...")
-
-        koelectra_context_str, probs = get_koelectra_context(comment_text)
-        max_prob = max(probs) if probs else 0
-
-        # ✅ KoELECTRA 확신도 높을 경우 GPT 생략
-        if any(p >= bypass_threshold for p in probs):
-            active = [label for label, p_val in zip(label_names, probs) if p_val >= bypass_threshold]
-            final_results[i] = {
-                "original_comment": comment_text,
-                "classification": "혐오",
-                "reason": f"KoELECTRA 확률 {bypass_threshold} 이상으로 판단됨 (카테고리: {', '.join(active)})",
-                "raw_llm_output": "[LLM 호출 생략됨]",
-                "koelectra_output": koelectra_context_str
-            }
-        else:
-            # GPT 호출 필요 → rag_chain 입력으로 추가
-            include_koelectra = "[KoELECTRA 모델 로드 실패]" not in koelectra_context_str and \
-                                "판단 유보:" not in koelectra_context_str and \
-                                koelectra_context_str.strip() != ""
-            rag_input_list.append({
-                config.RAG_CHAIN_INPUT_KEY: comment_text,
-                config.KOELECTRA_CONTEXT_KEY: koelectra_context_str,
-                config.INCLUDE_KOELECTRA_KEY: include_koelectra
-            })
-            rag_input_indices.append(i)
-
-    # ✅ GPT 호출
-    if rag_input_list:
-        logger.info(f"Invoking RAG chain for {len(rag_input_list)} comments...")
-        try:
-            raw_llm_outputs = rag_chain.batch(rag_input_list, config={"max_concurrency": max_concurrency})
-            for idx, raw_output in enumerate(raw_llm_outputs):
-                orig_idx = rag_input_indices[idx]
-                classification, reason = parse_llm_output(raw_output)
-                final_results[orig_idx] = {
-                    "original_comment": comments[orig_idx],
-                    "classification": classification,
-                    "reason": reason,
-                    "raw_llm_output": raw_output,
-                    "koelectra_output": rag_input_list[idx][config.KOELECTRA_CONTEXT_KEY]
-                }
-        except Exception as e:
-            logger.error(f"LLM Analyzer: Error during RAG chain batch execution: {e}", exc_info=True)
-            for idx in rag_input_indices:
-                final_results[idx] = {
-                    "original_comment": comments[idx],
-                    "classification": "오류",
-                    "reason": f"RAG 분석 중 오류: {str(e)}",
-                    "raw_llm_output": "",
-                    "koelectra_output": "[KoELECTRA 결과 있음]"
-                }
-
+    logger.info(f"Starting batch analysis for {len(comments)} comments.")
+    import pipeline  # 순환 import 방지
+    results = pipeline.get_pipeline().analyze_batch(comments)
     logger.info(f"Batch analysis finished for {len(comments)} comments.")
-    return final_results
+    return [{"original_comment": comment_text, **result} for comment_text, result in zip(comments, results)]
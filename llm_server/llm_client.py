@@ -0,0 +1,256 @@
+# llm_client.py
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import openai
+from langchain_openai import ChatOpenAI
+
+import config
+import rate_governor
+
+logger = logging.getLogger(__name__)
+
+# 재시도할 가치가 있는 일시적 오류
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMUnavailableError(Exception):
+    """재시도를 모두 소진했거나 회로 차단기가 열려 LLM을 사용할 수 없음."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """회로 차단기가 열려 있어 호출을 시도하지 않음."""
+
+
+class CircuitBreaker:
+    """
+    연속 실패가 failure_threshold에 도달하면 열림(open) 상태가 되어 reset_seconds 동안 호출을 즉시 거절합니다.
+    이후 한 번의 시험 호출(half-open)이 성공하면 닫히고, 실패하면 다시 열립니다.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self,
+                 failure_threshold: int = config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = config.CIRCUIT_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("LLM 회로 차단기 닫힘 (호출 성공).")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"LLM 회로 차단기 열림: 연속 실패 {self._failures}회, {self.reset_seconds}초 동안 degraded mode.")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """호출을 시도하지 못하고 끝난 경우, half-open 시험 호출 자리를 반납합니다."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self._opened_at < self.reset_seconds
+
+
+# --- 프로세스 전역 공유 객체 ---
+breaker = CircuitBreaker()
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_chat_models: Dict[Tuple[Any, ...], ChatOpenAI] = {}
+_models_lock = threading.Lock()
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.OPENAI_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=config.OPENAI_POOL_MAX_KEEPALIVE,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """모든 ChatOpenAI 인스턴스가 공유하는 keep-alive 연결 풀."""
+    global _http_client
+    with _models_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_pool_limits(), timeout=config.OPENAI_TIMEOUT_SECONDS)
+        return _http_client
+
+
+def get_http_async_client() -> httpx.AsyncClient:
+    """ainvoke용 비동기 연결 풀 (한 프로세스에서 하나의 이벤트 루프로 사용하는 것을 전제)."""
+    global _http_async_client
+    with _models_lock:
+        if _http_async_client is None:
+            _http_async_client = httpx.AsyncClient(limits=_pool_limits(), timeout=config.OPENAI_TIMEOUT_SECONDS)
+        return _http_async_client
+
+
+def get_chat_model(model_name: str = config.OPENAI_MODEL_NAME,
+                   temperature: float = config.TEMPERATURE,
+                   max_tokens: Optional[int] = config.MAX_NEW_TOKENS,
+                   top_p: Optional[float] = config.TOP_P) -> ChatOpenAI:
+    """설정 조합별로 하나씩만 만들어 재사용하는 ChatOpenAI. 재시도는 이 모듈이 직접 하므로 SDK 재시도는 끕니다."""
+    key = (model_name, temperature, max_tokens, top_p)
+    http_client = get_http_client()
+    http_async_client = get_http_async_client()
+    with _models_lock:
+        model = _chat_models.get(key)
+        if model is None:
+            model = ChatOpenAI(
+                model_name=model_name,
+                openai_api_key=config.OPENAI_API_KEY,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                model_kwargs={"top_p": top_p} if top_p is not None else {},
+                timeout=config.OPENAI_TIMEOUT_SECONDS,
+                max_retries=0,
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+            _chat_models[key] = model
+        return model
+
+
+def backoff_delay(attempt: int) -> float:
+    """지수 백오프 + full jitter."""
+    ceiling = min(config.OPENAI_RETRY_MAX_DELAY, config.OPENAI_RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def _acquire_rate_limit(prompt: str, model: ChatOpenAI, low_priority: bool) -> int:
+    """공유 RPM/TPM 한도를 확보하고, 차감한 토큰 수를 반환합니다 (governor 비활성화 시 0)."""
+    governor = rate_governor.get_governor()
+    if governor is None:
+        return 0
+    _, token_cost = rate_governor.estimate_request_cost(prompt, model.max_tokens)
+    try:
+        waited = governor.acquire(token_cost, low_priority=low_priority)
+    except rate_governor.RateLimitTimeoutError as e:
+        raise LLMUnavailableError(str(e)) from e
+    if waited > 0.05:
+        logger.info(f"OpenAI 한도 확보를 위해 {waited:.2f}초 대기함 (예상 토큰: {token_cost})")
+    return token_cost
+
+
+def _refund_unused_tokens(response: Any, reserved_tokens: int) -> None:
+    usage = getattr(response, 'usage_metadata', None) or {}
+    actual = usage.get('total_tokens')
+    governor = rate_governor.get_governor()
+    if governor is not None and reserved_tokens and actual is not None:
+        governor.refund(reserved_tokens - actual)
+
+
+def invoke(prompt: str, model: Optional[ChatOpenAI] = None, timeout: Optional[float] = None,
+           low_priority: bool = False) -> str:
+    """
+    회로 차단기 + 지터 재시도 + 공유 요청 한도로 감싼 LLM 호출. 응답 텍스트를 반환합니다.
+    차단기가 열려 있으면 CircuitOpenError, 재시도를 모두 소진하거나 한도 대기 시간을 넘으면 LLMUnavailableError,
+    낮은 우선순위 호출이 한도 때문에 버려지면 rate_governor.RateLimitShedError를 던집니다.
+    """
+    model = model or get_chat_model()
+    timeout = timeout or config.OPENAI_TIMEOUT_SECONDS
+    last_error: Optional[Exception] = None
+
+    for attempt in range(config.OPENAI_MAX_RETRIES + 1):
+        if not breaker.allow_request():
+            raise CircuitOpenError("LLM 회로 차단기가 열려 있습니다.")
+        try:
+            reserved_tokens = _acquire_rate_limit(prompt, model, low_priority)
+        except Exception:
+            breaker.release_trial()
+            raise
+        try:
+            response = model.invoke(prompt, timeout=timeout)
+        except RETRYABLE_ERRORS as e:
+            breaker.record_failure()
+            last_error = e
+            if attempt < config.OPENAI_MAX_RETRIES:
+                delay = backoff_delay(attempt)
+                logger.warning(f"LLM 호출 실패 ({type(e).__name__}), {delay:.2f}초 후 재시도 ({attempt + 1}/{config.OPENAI_MAX_RETRIES})")
+                time.sleep(delay)
+            continue
+        except Exception:
+            breaker.release_trial()
+            raise
+        breaker.record_success()
+        _refund_unused_tokens(response, reserved_tokens)
+        return response.content if hasattr(response, 'content') else str(response)
+
+    raise LLMUnavailableError(f"LLM 호출 재시도 {config.OPENAI_MAX_RETRIES}회 모두 실패: {last_error}") from last_error
+
+
+async def ainvoke(prompt: str, model: Optional[ChatOpenAI] = None, timeout: Optional[float] = None,
+                  low_priority: bool = False) -> str:
+    """invoke의 비동기 버전. 같은 회로 차단기와 요청 한도를 공유합니다."""
+    model = model or get_chat_model()
+    timeout = timeout or config.OPENAI_TIMEOUT_SECONDS
+    last_error: Optional[Exception] = None
+
+    for attempt in range(config.OPENAI_MAX_RETRIES + 1):
+        if not breaker.allow_request():
+            raise CircuitOpenError("LLM 회로 차단기가 열려 있습니다.")
+        try:
+            # governor는 SQLite 잠금/대기를 하므로 이벤트 루프를 막지 않도록 스레드에서 실행
+            reserved_tokens = await asyncio.to_thread(_acquire_rate_limit, prompt, model, low_priority)
+        except BaseException:
+            breaker.release_trial()
+            raise
+        try:
+            response = await model.ainvoke(prompt, timeout=timeout)
+        except RETRYABLE_ERRORS as e:
+            breaker.record_failure()
+            last_error = e
+            if attempt < config.OPENAI_MAX_RETRIES:
+                delay = backoff_delay(attempt)
+                logger.warning(f"LLM 비동기 호출 실패 ({type(e).__name__}), {delay:.2f}초 후 재시도 ({attempt + 1}/{config.OPENAI_MAX_RETRIES})")
+                await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            # 취소(CancelledError) 포함: 시험 호출 자리를 반납하고 그대로 전달
+            breaker.release_trial()
+            raise
+        breaker.record_success()
+        _refund_unused_tokens(response, reserved_tokens)
+        return response.content if hasattr(response, 'content') else str(response)
+
+    raise LLMUnavailableError(f"LLM 호출 재시도 {config.OPENAI_MAX_RETRIES}회 모두 실패: {last_error}") from last_error
@@ -0,0 +1,189 @@
+# pipeline.py
+"""
+CPU 단계(KoELECTRA, 예시 검색/프롬프트 조립)와 LLM 호출을 겹쳐 실행하는 파이프라인.
+
+- CPU 단계는 전용 스레드 풀에서, LLM 호출은 전용 이벤트 루프 스레드에서 llm_client.ainvoke로 실행합니다.
+  댓글 i의 LLM 응답을 기다리는 동안 댓글 i+1의 KoELECTRA/검색이 진행됩니다.
+- SPECULATIVE_LLM_ENABLED이면 KoELECTRA 결과를 기다리지 않고 'KoELECTRA 정보 없는' 프롬프트로 LLM을 먼저 호출합니다.
+  KoELECTRA가 bypass하거나 어떤 카테고리든 threshold를 넘어(프롬프트에 KoELECTRA 결과가 들어가야 해서) 결과를 쓸 수 없으면
+  미리 보낸 호출을 취소합니다. 응답 지연은 줄지만 취소된 호출만큼 OpenAI 사용량이 늘 수 있습니다.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+import llm_analyzer
+import llm_client
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisPipeline:
+    def __init__(self,
+                 cpu_workers: int = config.PIPELINE_CPU_WORKERS,
+                 llm_concurrency: int = config.PIPELINE_LLM_CONCURRENCY,
+                 speculative: bool = config.SPECULATIVE_LLM_ENABLED):
+        self.speculative = speculative
+        self.llm_concurrency = llm_concurrency
+        self._cpu_pool = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="pipeline-cpu")
+        self._loop = asyncio.new_event_loop()
+        self._llm_slots: Optional[asyncio.Semaphore] = None
+        self._thread = threading.Thread(target=self._run_loop, name="pipeline-llm", daemon=True)
+        self._ready = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.speculative_used = 0
+        self.speculative_cancelled = 0
+
+    # --- 수명 주기 ---
+    def start(self) -> None:
+        if not self._thread.is_alive():
+            self._thread.start()
+            self._ready.wait()
+            logger.info(f"AnalysisPipeline 시작: LLM 동시 호출 {self.llm_concurrency}개, 추측 호출 {'사용' if self.speculative else '미사용'}")
+
+    def stop(self) -> None:
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+        self._cpu_pool.shutdown(wait=False)
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._llm_slots = asyncio.Semaphore(self.llm_concurrency)
+        self._ready.set()
+        self._loop.run_forever()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {"speculative_used": self.speculative_used, "speculative_cancelled": self.speculative_cancelled}
+
+    def _count(self, used: bool) -> None:
+        with self._stats_lock:
+            if used:
+                self.speculative_used += 1
+            else:
+                self.speculative_cancelled += 1
+
+    # --- 단계별 코루틴 ---
+    async def _cpu(self, fn, *args):
+        return await self._loop.run_in_executor(self._cpu_pool, fn, *args)
+
+    async def _prompt_and_call(self, text: str, scores: Optional[llm_analyzer.KoelectraScores], low_priority: bool) -> str:
+        prompt = await self._cpu(llm_analyzer.build_prompt, text, scores)
+        async with self._llm_slots:
+            return await llm_client.ainvoke(prompt, model=llm_analyzer.chat_openai_model, low_priority=low_priority)
+
+    def _start_speculation(self, text: str, low_priority: bool,
+                           on_finished: Optional[Callable[[], None]] = None) -> Optional[asyncio.Task]:
+        if not self.speculative:
+            return None
+        task = self._loop.create_task(self._prompt_and_call(text, None, low_priority))
+        # 쓰지 않고 버린 추측 호출의 예외가 "never retrieved" 경고로 남지 않도록 소비
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        if on_finished is not None:
+            task.add_done_callback(lambda t: on_finished())
+        return task
+
+    def _cancel_speculation(self, speculation: Optional[asyncio.Task]) -> None:
+        if speculation is not None:
+            speculation.cancel()
+            self._count(used=False)
+
+    async def _llm_stage(self, text: str, scores: llm_analyzer.KoelectraScores, low_priority: bool,
+                         speculation: Optional[asyncio.Task]) -> Dict[str, Any]:
+        """llm_analyzer.run_llm_stage와 같은 결과를 만들되, 쓸 수 있으면 미리 보낸 추측 호출의 응답을 사용합니다."""
+        try:
+            if speculation is not None and not scores.include_koelectra:
+                # KoELECTRA 결과가 프롬프트에 들어가지 않으므로 추측 호출의 프롬프트와 동일
+                self._count(used=True)
+                raw_llm_output = await speculation
+            else:
+                self._cancel_speculation(speculation)
+                raw_llm_output = await self._prompt_and_call(text, scores, low_priority)
+        except llm_client.LLMUnavailableError as e:
+            logger.warning(f"LLM unavailable, returning degraded verdict for '{text[:30]}...': {e}")
+            return await self._cpu(llm_analyzer.build_degraded_result, text, scores)
+        return llm_analyzer.build_llm_result(text, raw_llm_output, scores.output())
+
+    async def _analyze_one(self, text: str, batch_future: "asyncio.Future[llm_analyzer.KoelectraBatch]",
+                           index: int, low_priority: bool) -> Dict[str, Any]:
+        speculation = self._start_speculation(text, low_priority)
+        scores: Optional[llm_analyzer.KoelectraScores] = None
+        try:
+            scores = (await batch_future)[index]
+            bypass_result = llm_analyzer.build_bypass_result(scores)
+            if bypass_result is not None:
+                self._cancel_speculation(speculation)
+                return bypass_result
+            return await self._llm_stage(text, scores, low_priority, speculation)
+        except Exception as e:
+            self._cancel_speculation(speculation)
+            logger.error(f"Pipeline: Error during analysis for '{text[:50]}...': {e}", exc_info=True)
+            return {
+                "classification": "오류",
+                "reason": f"분석 중 오류 발생: {str(e)}",
+                "raw_llm_output": "",
+                "koelectra_output": scores.summary() if scores is not None else "[KoELECTRA 분석 정보 없음]"
+            }
+
+    async def _analyze_batch(self, comments: List[str], low_priority: bool) -> List[Dict[str, Any]]:
+        tasks = []
+        batch_size = config.KOELECTRA_BATCH_SIZE
+        for start in range(0, len(comments), batch_size):
+            chunk = comments[start:start + batch_size]
+            # micro-batch마다 KoELECTRA를 CPU 풀에 걸어 두면, 앞 batch의 LLM 호출이 도는 동안 다음 batch가 분류됨
+            batch_future = asyncio.ensure_future(self._cpu(llm_analyzer.classify_koelectra_batch, chunk))
+            for offset, text in enumerate(chunk):
+                tasks.append(self._analyze_one(text, batch_future, offset, low_priority))
+        return await asyncio.gather(*tasks)
+
+    # --- 다른 스레드에서 부르는 API ---
+    def analyze_batch(self, comments: List[str], low_priority: bool = False) -> List[Dict[str, Any]]:
+        """댓글 목록을 파이프라인으로 분석합니다. 결과는 입력 순서대로이며 댓글 하나의 오류는 그 결과에만 기록됩니다."""
+        return asyncio.run_coroutine_threadsafe(self._analyze_batch(comments, low_priority), self._loop).result()
+
+    def start_speculation(self, text: str, low_priority: bool = False,
+                          on_finished: Optional[Callable[[], None]] = None) -> Optional[Future]:
+        """
+        KoELECTRA를 다른 곳(스케줄러)에서 돌리는 경우, 분류 전에 추측 호출만 먼저 시작합니다. 비활성화면 None.
+        on_finished는 추측 호출이 끝나거나 취소되면 (이벤트 루프 스레드에서) 한 번 불립니다.
+        """
+        if not self.speculative:
+            return None
+        return asyncio.run_coroutine_threadsafe(self._wrap_speculation(text, low_priority, on_finished), self._loop)
+
+    async def _wrap_speculation(self, text: str, low_priority: bool,
+                                on_finished: Optional[Callable[[], None]]) -> asyncio.Task:
+        # 이벤트 루프 안의 Task 객체 자체를 돌려주어 submit_llm_stage에서 await/cancel 할 수 있게 함
+        return self._start_speculation(text, low_priority, on_finished)
+
+    def cancel_speculation(self, speculation: Optional[Future]) -> None:
+        if speculation is not None:
+            speculation.add_done_callback(
+                lambda f: self._loop.call_soon_threadsafe(self._cancel_speculation, f.result())
+            )
+
+    def submit_llm_stage(self, text: str, scores: llm_analyzer.KoelectraScores, low_priority: bool = False,
+                         speculation: Optional[Future] = None) -> Future:
+        """KoELECTRA가 끝난(bypass되지 않은) 댓글의 검색/프롬프트 조립 + LLM 호출을 시작하고 결과 Future를 반환합니다."""
+        async def run() -> Dict[str, Any]:
+            task = await asyncio.wrap_future(speculation) if speculation is not None else None
+            return await self._llm_stage(text, scores, low_priority, task)
+        return asyncio.run_coroutine_threadsafe(run(), self._loop)
+
+
+# --- 프로세스 전역 파이프라인 ---
+_pipeline: Optional[AnalysisPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> AnalysisPipeline:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = AnalysisPipeline()
+            _pipeline.start()
+        return _pipeline
@@ -0,0 +1,171 @@
+# prefetch.py
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from scheduler import AnalysisScheduler, PRIORITY_PREFETCH
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchQuotaError(Exception):
+    """클라이언트의 사전 분석 한도를 넘는 요청."""
+
+
+class PrefetchJob:
+    """영상 하나의 댓글 묶음(여러 페이지 가능)에 대한 백그라운드 사전 분석 작업."""
+
+    def __init__(self, client_id: str, video_id: str):
+        self.job_id = uuid.uuid4().hex
+        self.client_id = client_id
+        self.video_id = video_id
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cancelled = False
+        self.futures: List[Future] = []
+        self.done = 0
+        self.failed = 0
+
+    @property
+    def total(self) -> int:
+        return len(self.futures)
+
+    @property
+    def status(self) -> str:
+        if self.cancelled:
+            return "cancelled"
+        if self.done + self.failed >= self.total:
+            return "completed"
+        return "running"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "jobId": self.job_id,
+            "videoId": self.video_id,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "pending": max(self.total - self.done - self.failed, 0),
+        }
+
+
+class PrefetchManager:
+    """
+    /prefetch 엔드포인트가 사용하는 사전 분석 작업 관리자.
+
+    댓글은 스케줄러에 prefetch 우선순위로 제출되므로 화면에 보이는 댓글 분석을 방해하지 않고,
+    결과는 스케줄러의 판정 캐시에 저장되어 이후 /analyze 요청에서 바로 재사용됩니다.
+    """
+
+    def __init__(self, analysis_scheduler: AnalysisScheduler):
+        self.scheduler = analysis_scheduler
+        self._jobs: Dict[str, PrefetchJob] = {}
+        # (client_id, video_id) -> [지금까지 제출한 댓글 수, 마지막 제출 시각]. 작업이 끝나도 남아 있어야 영상당 한도가 유지됨
+        self._video_usage: Dict[Tuple[str, str], List[float]] = {}
+        # 캐시 적중 시 add_done_callback이 submit 안에서 바로 호출되므로 재진입 가능한 락 사용
+        self._lock = threading.RLock()
+
+    def submit(self, client_id: str, video_id: str, texts: List[str], job_id: Optional[str] = None) -> PrefetchJob:
+        """새 작업을 만들거나(job_id 없음), 같은 클라이언트의 기존 작업에 다음 페이지를 추가합니다."""
+        with self._lock:
+            self._prune_finished_jobs()
+            if job_id:
+                job = self._jobs.get(job_id)
+                if job is None or job.client_id != client_id:
+                    raise KeyError(job_id)
+                if job.cancelled:
+                    raise PrefetchQuotaError("이미 취소된 사전 분석 작업입니다.")
+            else:
+                active_jobs = [j for j in self._jobs.values() if j.client_id == client_id and j.status == "running"]
+                if len(active_jobs) >= config.PREFETCH_MAX_ACTIVE_JOBS_PER_CLIENT:
+                    raise PrefetchQuotaError(
+                        f"클라이언트당 동시 사전 분석 작업은 최대 {config.PREFETCH_MAX_ACTIVE_JOBS_PER_CLIENT}개입니다."
+                    )
+
+            # 다음 페이지 요청은 작업을 만들 때의 영상 기준으로 계산
+            quota_key = (client_id, job.video_id if job_id else video_id)
+            usage = self._video_usage.setdefault(quota_key, [0, 0.0])
+            remaining = config.PREFETCH_MAX_COMMENTS_PER_VIDEO - int(usage[0])
+            if len(texts) > remaining:
+                raise PrefetchQuotaError(
+                    f"영상당 사전 분석 댓글은 최대 {config.PREFETCH_MAX_COMMENTS_PER_VIDEO}개입니다 (남은 한도: {remaining}개)."
+                )
+            if not job_id:
+                job = PrefetchJob(client_id, video_id)
+                self._jobs[job.job_id] = job
+            usage[0] += len(texts)
+            usage[1] = time.time()
+
+            if not texts:
+                # 댓글 없는 작업은 완료 콜백이 불리지 않으므로 여기서 끝난 것으로 표시해야 정리 대상이 됨
+                if job.finished_at is None:
+                    job.finished_at = time.time()
+                return job
+            job.finished_at = None
+            for text in texts:
+                future = self.scheduler.submit(text, client_id, PRIORITY_PREFETCH)
+                job.futures.append(future)
+                future.add_done_callback(lambda f, j=job: self._on_done(j, f))
+
+        logger.info(f"사전 분석 작업 {job.job_id[:8]} (video: {video_id}): {len(texts)}개 추가, 총 {job.total}개")
+        return job
+
+    def get(self, job_id: str, client_id: Optional[str] = None) -> Optional[PrefetchJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (client_id is not None and job.client_id != client_id):
+            return None
+        return job
+
+    def cancel(self, job_id: str, client_id: Optional[str] = None) -> Optional[PrefetchJob]:
+        """아직 시작되지 않은 댓글 분석을 모두 취소합니다. 이미 진행 중인 댓글은 끝까지 처리되어 캐시에 남습니다."""
+        job = self.get(job_id, client_id)
+        if job is None:
+            return None
+        job.cancelled = True
+        cancelled_count = sum(1 for future in list(job.futures) if future.cancel())
+        job.finished_at = time.time()
+        logger.info(f"사전 분석 작업 {job_id[:8]} 취소: 대기 중이던 {cancelled_count}개 취소됨")
+        return job
+
+    def _on_done(self, job: PrefetchJob, future: Future) -> None:
+        with self._lock:
+            if future.cancelled():
+                pass
+            elif future.exception() is not None or future.result().get("classification") == "오류":
+                job.failed += 1
+            else:
+                job.done += 1
+            if job.status != "running" and job.finished_at is None:
+                job.finished_at = time.time()
+
+    def _prune_finished_jobs(self) -> None:
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > config.PREFETCH_JOB_RETENTION_SECONDS
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        stale_usage = [key for key, (_, last_used) in self._video_usage.items()
+                       if now - last_used > config.PREFETCH_VIDEO_QUOTA_WINDOW_SECONDS]
+        for key in stale_usage:
+            del self._video_usage[key]
+
+
+def extract_prefetch_texts(comments: Any) -> Tuple[List[str], int]:
+    """요청 본문의 comments(문자열 또는 {text: ...} 객체 배열)에서 유효한 텍스트와 무시한 개수를 뽑습니다."""
+    texts: List[str] = []
+    skipped = 0
+    for comment in comments:
+        text = comment.get('text') if isinstance(comment, dict) else comment
+        if isinstance(text, str) and text.strip():
+            texts.append(text)
+        else:
+            skipped += 1
+    return texts, skipped
@@ -0,0 +1,281 @@
+# profiler.py
+"""
+관리자용 온디맨드 프로파일러.
+
+- 요청 하나(/analyze?profile=1) 또는 지정한 시간 동안(모든 워커 프로세스) 파이썬 스택을 샘플링해
+  speedscope(https://www.speedscope.app) 형식 JSON으로 저장합니다.
+- 같은 구간 동안 KoELECTRA/임베딩/FAISS 검색 구간 시간과 torch 연산별 시간을 함께 모읍니다.
+- 프로파일링 중이 아닐 때 region()은 미리 만든 nullcontext를 돌려줄 뿐이라 분석 경로에 추가 비용이 없습니다.
+  시간 구간 프로파일 요청은 별도 감시 스레드가 트리거 파일을 주기적으로 확인하는 방식으로 전달됩니다.
+"""
+import contextlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_FILENAME = "window-trigger.json"
+ARTIFACT_NAME_PATTERN = re.compile(r"^[\w.-]+\.json$")
+
+# 대기 중인 스레드(큐/조건 변수/소켓 대기)의 샘플은 flamegraph를 흐리기만 하므로 제외
+_IDLE_FUNCTIONS = {"wait", "_wait_for_tstate_lock", "select", "poll", "epoll", "accept", "get", "sleep", "run_forever",
+                   "_run_once", "_worker"}
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "socket.py", "socketserver.py", "thread.py", "base_events.py")
+
+_NULL_CONTEXT = contextlib.nullcontext()
+_active_session: Optional["ProfileSession"] = None
+_session_lock = threading.Lock()
+
+
+class ProfileSession:
+    """샘플링 스레드 하나와 구간/torch 연산 집계를 가진 프로파일링 세션."""
+
+    def __init__(self, name: str, interval: float = config.PROFILE_SAMPLE_INTERVAL_SECONDS):
+        self.name = name
+        self.interval = interval
+        self.started_at = time.time()
+        self.duration = 0.0
+        self._frames: List[Dict[str, Any]] = []
+        self._frame_index: Dict[Tuple[str, str, int], int] = {}
+        self._samples: Dict[int, List[List[int]]] = defaultdict(list)
+        self._weights: Dict[int, List[float]] = defaultdict(list)
+        self._thread_names: Dict[int, str] = {}
+        self._regions: Dict[str, List[float]] = defaultdict(list)
+        self._torch_ops: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])  # 연산 이름 -> [호출 수, self CPU ms]
+        self._stats_lock = threading.Lock()
+        self._torch_lock = threading.Lock()  # torch 프로파일러는 동시에 하나만 켤 수 있음
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+
+    # --- 스택 샘플링 ---
+    def _frame_id(self, frame) -> int:
+        code = frame.f_code
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = len(self._frames)
+            self._frame_index[key] = index
+            self._frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+        return index
+
+    @staticmethod
+    def _is_idle(frame) -> bool:
+        return frame.f_code.co_name in _IDLE_FUNCTIONS and frame.f_code.co_filename.endswith(_IDLE_FILES)
+
+    def _sample_loop(self) -> None:
+        sampler_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id or self._is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_id(frame))
+                    frame = frame.f_back
+                stack.reverse()  # speedscope는 루트 → 리프 순서
+                self._samples[thread_id].append(stack)
+                self._weights[thread_id].append(weight)
+                self._thread_names[thread_id] = names.get(thread_id, str(thread_id))
+
+    # --- 구간/torch 연산 ---
+    @contextlib.contextmanager
+    def region(self, name: str):
+        started = time.perf_counter()
+        capture_ops = config.PROFILE_TORCH_OPS and self._torch_lock.acquire(blocking=False)
+        prof = None
+        try:
+            if capture_ops:
+                import torch
+
+                with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU]) as prof:
+                    with torch.profiler.record_function(name):
+                        yield
+            else:
+                yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._stats_lock:
+                self._regions[name].append(elapsed_ms)
+            if capture_ops:
+                try:
+                    if prof is not None:
+                        self._add_torch_ops(prof)
+                finally:
+                    self._torch_lock.release()
+
+    def _add_torch_ops(self, prof) -> None:
+        with self._stats_lock:
+            for event in prof.key_averages():
+                entry = self._torch_ops[event.key]
+                entry[0] += event.count
+                entry[1] += event.self_cpu_time_total / 1000
+
+    # --- 수명 주기 ---
+    def start(self) -> None:
+        self._started_perf = time.perf_counter()
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+        self.duration = time.perf_counter() - self._started_perf
+
+    def torch_summary(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            regions = {
+                name: {"count": len(times), "total_ms": round(sum(times), 2), "max_ms": round(max(times), 2)}
+                for name, times in self._regions.items()
+            }
+            ops = sorted(self._torch_ops.items(), key=lambda item: item[1][1], reverse=True)[:config.PROFILE_TOP_TORCH_OPS]
+        return {
+            "regions": regions,
+            "torch_ops": [{"op": op, "count": count, "self_cpu_ms": round(ms, 2)} for op, (count, ms) in ops],
+        }
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        profiles = []
+        for thread_id, samples in self._samples.items():
+            weights = self._weights[thread_id]
+            profiles.append({
+                "type": "sampled",
+                "name": self._thread_names.get(thread_id, str(thread_id)),
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.name} (pid {os.getpid()})",
+            "exporter": "llm_server.profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self._frames},
+            "profiles": profiles,
+        }
+
+
+# --- 분석 코드에서 쓰는 구간 표시 ---
+def region(name: str):
+    """프로파일링 중이면 이 구간의 시간과 torch 연산을 기록합니다. 아니면 아무 일도 하지 않습니다."""
+    session = _active_session
+    if session is None:
+        return _NULL_CONTEXT
+    return session.region(name)
+
+
+# --- 세션 관리 ---
+def start_session(name: str) -> Optional[ProfileSession]:
+    """이 프로세스에서 이미 프로파일링 중이면 None."""
+    global _active_session
+    with _session_lock:
+        if _active_session is not None:
+            return None
+        session = ProfileSession(name)
+        session.start()
+        _active_session = session
+        return session
+
+
+def finish_session(session: ProfileSession) -> Dict[str, Any]:
+    """세션을 끝내고 speedscope/torch 요약 파일을 저장한 뒤, 응답에 넣을 요약을 반환합니다."""
+    global _active_session
+    with _session_lock:
+        if _active_session is session:
+            _active_session = None
+    session.stop()
+
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(session.started_at))
+    base_name = f"{stamp}-{session.name}-pid{os.getpid()}"
+    speedscope_name = f"{base_name}.speedscope.json"
+    torch_name = f"{base_name}.torch.json"
+    summary = session.torch_summary()
+    with open(os.path.join(config.PROFILE_DIR, speedscope_name), "w", encoding="utf-8") as f:
+        json.dump(session.to_speedscope(), f)
+    with open(os.path.join(config.PROFILE_DIR, torch_name), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    logger.info(f"프로파일 저장: {speedscope_name} ({session.duration:.2f}초)")
+    return {"duration_seconds": round(session.duration, 3), "speedscope": speedscope_name, "torch": torch_name, **summary}
+
+
+# --- 여러 워커에 걸친 시간 구간 프로파일 (트리거 파일) ---
+def request_window(seconds: float) -> Dict[str, Any]:
+    """모든 워커의 감시 스레드가 읽을 트리거 파일을 씁니다."""
+    seconds = min(max(seconds, 1.0), config.PROFILE_MAX_WINDOW_SECONDS)
+    trigger = {"id": uuid.uuid4().hex[:12], "until": time.time() + seconds, "seconds": seconds}
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    tmp_path = os.path.join(config.PROFILE_DIR, f".{TRIGGER_FILENAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(trigger, f)
+    os.replace(tmp_path, os.path.join(config.PROFILE_DIR, TRIGGER_FILENAME))
+    return trigger
+
+
+def _run_window(trigger: Dict[str, Any]) -> None:
+    remaining = trigger["until"] - time.time()
+    if remaining <= 0:
+        return
+    session = start_session(f"window-{trigger['id']}")
+    if session is None:
+        logger.warning(f"이미 프로파일링 중이라 시간 구간 프로파일 {trigger['id']}을(를) 건너뜁니다.")
+        return
+    time.sleep(remaining)
+    finish_session(session)
+
+
+def _watch_trigger_file() -> None:
+    trigger_path = os.path.join(config.PROFILE_DIR, TRIGGER_FILENAME)
+    seen_id = None
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.path.getmtime(trigger_path)
+            if mtime != last_mtime:
+                last_mtime = mtime
+                with open(trigger_path, encoding="utf-8") as f:
+                    trigger = json.load(f)
+                # 워커가 시작하기 전에 남아 있던 트리거는 id만 기억하고 이미 끝난 구간은 무시됨
+                if trigger.get("id") != seen_id:
+                    seen_id = trigger.get("id")
+                    _run_window(trigger)
+        except (OSError, ValueError, KeyError):
+            pass
+        time.sleep(config.PROFILE_TRIGGER_POLL_SECONDS)
+
+
+_watcher_started = False
+
+
+def start_trigger_watcher() -> None:
+    global _watcher_started
+    if _watcher_started or not config.ADMIN_TOKEN:
+        return
+    _watcher_started = True
+    threading.Thread(target=_watch_trigger_file, name="profiler-trigger-watcher", daemon=True).start()
+
+
+# --- 저장된 결과 ---
+def list_artifacts() -> List[Dict[str, Any]]:
+    if not os.path.isdir(config.PROFILE_DIR):
+        return []
+    artifacts = []
+    for name in sorted(os.listdir(config.PROFILE_DIR), reverse=True):
+        if ARTIFACT_NAME_PATTERN.match(name) and name != TRIGGER_FILENAME:
+            path = os.path.join(config.PROFILE_DIR, name)
+            artifacts.append({"name": name, "bytes": os.path.getsize(path), "modified": os.path.getmtime(path)})
+    return artifacts
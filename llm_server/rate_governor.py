@@ -0,0 +1,184 @@
+# rate_governor.py
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+import config
+
+try:
+    import tiktoken
+except ImportError:  # 선택 의존성: 없으면 문자 수 기반 추정 사용
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+RPM_BUCKET = "rpm"
+TPM_BUCKET = "tpm"
+LOCK_RETRY_SECONDS = (0.01, 0.1) # DB가 잠겨 있을 때 다시 시도하기 전 대기 범위 (워커끼리 겹치지 않도록 임의 선택)
+
+
+class RateLimitShedError(Exception):
+    """낮은 우선순위 작업이 한도 때문에 버려짐 (재시도하지 않음)."""
+
+
+class RateLimitTimeoutError(Exception):
+    """허용된 최대 대기 시간 안에 한도를 확보하지 못함."""
+
+
+def _is_lock_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """프롬프트 토큰 수 추정. tiktoken이 있으면 정확히 세고, 없으면 한글은 글자당 1토큰, 그 외는 4글자당 1토큰으로 계산."""
+    global _encoding
+    if tiktoken is not None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    _encoding = tiktoken.encoding_for_model(config.OPENAI_MODEL_NAME)
+                except KeyError:
+                    _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii) // 4 + 1
+
+
+class RateGovernor:
+    """
+    SQLite 파일에 상태를 두는 RPM/TPM 토큰 버킷.
+
+    같은 DB 파일을 쓰는 모든 워커 프로세스가 하나의 한도를 공유합니다.
+    버킷 용량은 분당 한도(1분치 burst 허용)이며, 초당 limit/60 만큼 다시 채워집니다.
+    """
+
+    def __init__(self,
+                 db_path: str = config.RATE_GOVERNOR_DB_PATH,
+                 rpm_limit: int = config.OPENAI_RPM_LIMIT,
+                 tpm_limit: int = config.OPENAI_TPM_LIMIT):
+        self.db_path = db_path
+        self.limits = {RPM_BUCKET: float(rpm_limit), TPM_BUCKET: float(tpm_limit)}
+        self._local = threading.local()
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")  # 읽기/쓰기 잠금 경합과 fsync 비용을 줄임
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            now = time.time()
+            for name, limit in self.limits.items():
+                conn.execute("INSERT OR IGNORE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)", (name, limit, now))
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        """스레드마다 연결을 하나씩 재사용합니다 (sqlite3 연결은 스레드 간 공유 불가)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _try_take(self, token_cost: float) -> float:
+        """한도가 있으면 차감하고 0을, 없으면 필요한 대기 시간(초)을 반환합니다."""
+        conn = self._thread_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # 프로세스 간 배타적 갱신
+            now = time.time()
+            levels = {}
+            for name, limit in self.limits.items():
+                tokens, updated = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                levels[name] = min(limit, tokens + max(now - updated, 0.0) * limit / 60.0)
+
+            needed = {RPM_BUCKET: 1.0, TPM_BUCKET: token_cost}
+            wait = max(
+                (needed[name] - levels[name]) * 60.0 / self.limits[name]
+                for name in self.limits
+            )
+            if wait <= 0:
+                for name in self.limits:
+                    levels[name] -= needed[name]
+            for name, level in levels.items():
+                conn.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?", (level, now, name))
+            conn.execute("COMMIT")
+            return max(wait, 0.0)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, token_cost: int, low_priority: bool = False, max_wait: Optional[float] = None) -> float:
+        """
+        요청 1건 + token_cost 토큰을 확보할 때까지 기다립니다. 실제로 기다린 시간을 반환합니다.
+        낮은 우선순위 작업은 RATE_GOVERNOR_SHED_WAIT_SECONDS보다 오래 기다려야 하면 RateLimitShedError,
+        그 외에는 max_wait를 넘으면 RateLimitTimeoutError를 던집니다.
+        """
+        max_wait = config.RATE_GOVERNOR_MAX_WAIT_SECONDS if max_wait is None else max_wait
+        token_cost = min(float(token_cost), self.limits[TPM_BUCKET])
+        started = time.monotonic()
+        while True:
+            try:
+                wait = self._try_take(token_cost)
+            except sqlite3.OperationalError as e:
+                # 여러 워커가 동시에 갱신하면 busy timeout이 지나도 잠겨 있을 수 있음: 대기 예산 안에서 다시 시도
+                if not _is_lock_error(e):
+                    raise
+                retry = random.uniform(*LOCK_RETRY_SECONDS)
+                if time.monotonic() - started + retry > max_wait:
+                    raise RateLimitTimeoutError(f"OpenAI 한도 DB 잠금이 풀리지 않아 대기 시간 초과: {e}") from e
+                logger.debug(f"한도 DB 잠김, {retry:.2f}초 후 다시 시도: {e}")
+                time.sleep(retry)
+                continue
+            if wait <= 0:
+                return time.monotonic() - started
+            if low_priority and wait > config.RATE_GOVERNOR_SHED_WAIT_SECONDS:
+                raise RateLimitShedError(f"OpenAI 한도 부족으로 낮은 우선순위 작업을 버림 (예상 대기 {wait:.1f}초)")
+            if time.monotonic() - started + wait > max_wait:
+                raise RateLimitTimeoutError(f"OpenAI 한도 확보 대기 시간 초과 (예상 대기 {wait:.1f}초)")
+            time.sleep(min(wait, 1.0))
+
+    def refund(self, token_count: int) -> None:
+        """추정치보다 실제 사용량이 적었으면 차이만큼 TPM 버킷에 돌려줍니다."""
+        if token_count <= 0:
+            return
+        try:
+            self._thread_connection().execute(
+                "UPDATE buckets SET tokens = MIN(tokens + ?, ?) WHERE name = ?",
+                (float(token_count), self.limits[TPM_BUCKET], TPM_BUCKET)
+            )
+        except sqlite3.OperationalError as e:
+            # 반환은 최선 노력: 이미 받은 응답을 오류로 만들지 않도록 잠겨 있으면 건너뜀 (다음 충전 때 메워짐)
+            if not _is_lock_error(e):
+                raise
+            logger.warning(f"한도 DB 잠김으로 토큰 {token_count}개 반환 건너뜀: {e}")
+
+
+_governor: Optional[RateGovernor] = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> Optional[RateGovernor]:
+    global _governor
+    if not config.RATE_GOVERNOR_ENABLED:
+        return None
+    with _governor_lock:
+        if _governor is None:
+            _governor = RateGovernor()
+        return _governor
+
+
+def estimate_request_cost(prompt: str, max_tokens: Optional[int]) -> Tuple[int, int]:
+    """(프롬프트 토큰 추정치, 출력 토큰 상한 포함 총 비용)."""
+    prompt_tokens = estimate_tokens(prompt)
+    return prompt_tokens, prompt_tokens + (max_tokens or config.MAX_NEW_TOKENS)
@@ -0,0 +1,361 @@
+# resources.py
+"""
+CPU 스레드 배치와 메모리 예산 관리.
+
+KoELECTRA와 임베딩 모델이 같은 머신(또는 여러 워커 프로세스)에서 각자 모든 코어를 쓰려고 하면
+스레드가 코어 수보다 많아져 지연 시간이 튑니다. 이 모듈은 워커마다 코어 묶음과 모델별 스레드 수를 정해 적용하고,
+프로세스 RSS가 예산을 넘으면 새 요청을 거절(503)할 수 있게 합니다.
+
+    python resources.py sweep --workers 1,2,4 --threads 1,2,4 --batches 20   # 이 머신에 맞는 배치 추천
+"""
+import argparse
+import csv
+import ctypes
+import gc
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import faiss
+import numpy as np
+import torch
+
+import config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil  # 선택 사항: 없으면 /proc/self/statm을 읽음
+except ImportError:
+    psutil = None
+
+_applied_plan: Optional[Dict[str, int]] = None
+
+
+# --- 코어/스레드 배치 ---
+def available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def worker_core_slice(worker_index: int, worker_count: int, cores: Optional[List[int]] = None) -> List[int]:
+    """코어를 워커 수로 나눈 연속 구간 중 worker_index번째. 코어가 워커보다 적으면 돌아가며 하나씩 배정합니다."""
+    cores = cores if cores is not None else available_cores()
+    worker_count = max(1, worker_count)
+    per_worker = len(cores) // worker_count
+    if per_worker == 0:
+        return [cores[worker_index % len(cores)]]
+    start = (worker_index % worker_count) * per_worker
+    return cores[start:start + per_worker]
+
+
+def pin_worker_cpus(worker_index: int = config.WORKER_INDEX, worker_count: int = config.WORKER_COUNT,
+                    cores: Optional[List[int]] = None) -> List[int]:
+    """
+    현재 프로세스를 worker_index에 해당하는 코어 묶음에 고정합니다.
+    리눅스에서는 호출한 스레드에만 적용되고 이후 만들어지는 스레드가 물려받으므로, 모델 로드/스레드 풀 생성 전에 호출해야 합니다.
+    """
+    cores = worker_core_slice(worker_index, worker_count, cores)
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    else:
+        logger.warning("이 플랫폼은 CPU affinity 설정을 지원하지 않습니다.")
+    return cores
+
+
+def thread_plan(cores: Optional[int] = None) -> Dict[str, int]:
+    """
+    모델별 스레드 수. 0(자동)이면 이 워커의 코어를 CPU 단계 동시 실행 수(PIPELINE_CPU_WORKERS)로 나눕니다.
+    torch 기반 모델(KoELECTRA, hf/torch/int8 임베딩)은 프로세스 하나의 intra-op 풀을 공유하므로 'torch' 값을 함께 쓰고,
+    ONNX 임베딩은 자체 세션 스레드('embedding')를 씁니다.
+    """
+    cores = cores if cores is not None else len(available_cores())
+    auto = max(1, cores // max(1, config.PIPELINE_CPU_WORKERS))
+    return {
+        "torch": config.KOELECTRA_NUM_THREADS or auto,
+        "torch_interop": config.TORCH_INTEROP_THREADS,
+        "embedding": config.EMBEDDING_NUM_THREADS or auto,
+        "faiss": config.FAISS_NUM_THREADS,
+    }
+
+
+def apply_thread_limits(plan: Dict[str, int]) -> None:
+    global _applied_plan
+    _applied_plan = dict(plan)
+    # 이후 만들어지는 자식 프로세스/라이브러리가 OpenMP·MKL 스레드를 코어 수만큼 띄우지 않도록 환경 변수도 맞춤
+    os.environ["OMP_NUM_THREADS"] = str(plan["torch"])
+    os.environ["MKL_NUM_THREADS"] = str(plan["torch"])
+    # 요청 단위로 이미 병렬 처리하므로 fast tokenizer 내부 병렬화는 끔 (fork 이후 교착 경고도 방지)
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    torch.set_num_threads(plan["torch"])
+    try:
+        torch.set_num_interop_threads(plan["torch_interop"])
+    except RuntimeError:
+        # inter-op 풀이 이미 시작된 뒤에는 바꿀 수 없음 (같은 프로세스에서 두 번째 호출 등)
+        pass
+    faiss.omp_set_num_threads(plan["faiss"])
+
+
+def embedding_threads() -> int:
+    """ONNX 임베딩 세션에 줄 스레드 수 (적용된 배치가 있으면 그 값)."""
+    return (_applied_plan or thread_plan())["embedding"]
+
+
+def apply_resource_limits(worker_index: int = config.WORKER_INDEX, worker_count: int = config.WORKER_COUNT) -> Dict[str, Any]:
+    """서버/워커 시작 시 한 번 호출합니다. 적용한 배치를 반환합니다."""
+    cores = pin_worker_cpus(worker_index, worker_count) if config.CPU_AFFINITY_ENABLED else available_cores()
+    plan = thread_plan(len(cores))
+    apply_thread_limits(plan)
+    layout = {"worker": f"{worker_index}/{worker_count}", "cores": cores, **plan}
+    logger.info(f"CPU 배치 적용: {layout}")
+    return layout
+
+
+# --- 메모리 예산 ---
+def current_rss_mb() -> float:
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0.0  # 측정할 수 없으면 제한하지 않음
+
+
+def release_free_memory() -> None:
+    """
+    순환 참조를 정리하고 glibc가 들고 있는 빈 힙 영역을 OS에 돌려줍니다.
+    캐시를 비워도 CPython/glibc는 해제한 메모리를 OS에 바로 돌려주지 않아 RSS가 줄지 않기 때문입니다.
+    """
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass  # glibc가 아닌 환경
+
+
+def recycle_worker() -> None:
+    """
+    현재 워커에 SIGTERM을 보내 스스로 종료합니다. gunicorn/systemd 같은 관리자가 새 워커를 띄운다는 전제이며,
+    관리자 없이 `python app.py`로 띄운 경우에는 서버가 그대로 내려가므로 MEMORY_RECYCLE_AFTER_SECONDS를 켜지 마세요.
+    """
+    logger.error(f"메모리 예산 초과가 계속되어 워커(pid {os.getpid()})를 재시작합니다.")
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+class MemoryGuard:
+    """
+    프로세스 RSS가 예산(MB)을 넘었는지 확인합니다. 측정은 check_interval초에 한 번만 합니다.
+
+    - 예산을 넘으면 on_pressure(예: 판정 캐시 비우기) 후 release_free_memory()로 RSS를 실제로 줄여 보고,
+      그래도 넘으면 over_budget()이 True가 됩니다.
+    - 한 번 넘은 뒤에는 RSS가 예산 x recovery_ratio 아래로 내려와야 다시 요청을 받습니다 (경계에서 켜졌다 꺼졌다 하지 않도록).
+    - recycle_after초 넘게 계속 초과 상태이면 on_recycle(기본: 워커 종료 → 관리자가 재시작)을 한 번 호출합니다.
+    """
+
+    def __init__(self, budget_mb: float = config.MEMORY_BUDGET_MB,
+                 check_interval: float = config.MEMORY_CHECK_INTERVAL_SECONDS,
+                 on_pressure: Optional[Callable[[], None]] = None,
+                 recovery_ratio: float = config.MEMORY_RECOVERY_RATIO,
+                 recycle_after: float = config.MEMORY_RECYCLE_AFTER_SECONDS,
+                 on_recycle: Callable[[], None] = recycle_worker):
+        self.budget_mb = budget_mb
+        self.check_interval = check_interval
+        self.on_pressure = on_pressure
+        self.recovery_ratio = recovery_ratio
+        self.recycle_after = recycle_after
+        self.on_recycle = on_recycle
+        self.last_rss_mb = 0.0
+        self._last_checked = 0.0
+        self._over = False
+        self._over_since: Optional[float] = None
+        self._recycle_requested = False
+        self._lock = threading.Lock()
+
+    def over_budget(self) -> bool:
+        if not self.budget_mb:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_checked < self.check_interval:
+                return self._over
+            self._last_checked = now
+            self.last_rss_mb = current_rss_mb()
+            if self.last_rss_mb > self.budget_mb:
+                logger.warning(f"메모리 사용량 {self.last_rss_mb:.0f}MB가 예산 {self.budget_mb:.0f}MB를 넘어 캐시 등을 정리합니다.")
+                if self.on_pressure is not None:
+                    self.on_pressure()
+                release_free_memory()
+                self.last_rss_mb = current_rss_mb()
+
+            was_over = self._over
+            if was_over:
+                self._over = self.last_rss_mb > self.budget_mb * self.recovery_ratio
+            else:
+                self._over = self.last_rss_mb > self.budget_mb
+            if self._over and not was_over:
+                self._over_since = now
+                logger.error(f"메모리 예산 초과 ({self.last_rss_mb:.0f}MB > {self.budget_mb:.0f}MB): 새 분석 요청을 거절합니다.")
+            elif was_over and not self._over:
+                self._over_since = None
+                self._recycle_requested = False
+                logger.info(f"메모리 사용량이 예산 안으로 돌아옴 ({self.last_rss_mb:.0f}MB).")
+
+            if (self._over and self.recycle_after and not self._recycle_requested
+                    and now - self._over_since >= self.recycle_after):
+                self._recycle_requested = True
+                self.on_recycle()
+            return self._over
+
+
+# --- 배치 sweep 벤치마크 ---
+def _load_sample_texts(path: Optional[str], limit: int) -> List[str]:
+    if path:
+        with open(path, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        with open(config.CSV_FILE_PATH, encoding="utf-8", newline="") as f:
+            texts = [row[config.CONTENT_COLUMN_NAME] for row in csv.DictReader(f) if row.get(config.CONTENT_COLUMN_NAME)]
+    return texts[:limit]
+
+
+def _sweep_worker(worker_index: int, worker_count: int, cores: List[int], threads: int, texts: List[str], batches: int,
+                  barrier, results) -> None:
+    import embeddings_backend
+    import llm_analyzer
+
+    cores = pin_worker_cpus(worker_index, worker_count, cores)
+    apply_thread_limits({"torch": threads, "torch_interop": 1, "embedding": threads, "faiss": 1})
+    llm_analyzer.load_koelectra_components()
+    embeddings_model = embeddings_backend.create_embeddings_model()
+
+    batch_size = config.KOELECTRA_BATCH_SIZE
+    batch_texts = [[texts[(i * batch_size + j) % len(texts)] for j in range(batch_size)] for i in range(batches)]
+
+    def run_batch(chunk: List[str]) -> float:
+        # micro-batch 하나에 서버가 하는 CPU 작업: KoELECTRA 분류 + 예시 검색용 쿼리 임베딩
+        batch_start = time.perf_counter()
+        llm_analyzer.classify_koelectra_batch(chunk)
+        for text in chunk:
+            embeddings_model.embed_query(text)
+        return time.perf_counter() - batch_start
+
+    run_batch(batch_texts[0])  # 워밍업
+    barrier.wait()
+    started = time.perf_counter()
+    # 서버처럼 PIPELINE_CPU_WORKERS개의 CPU 단계가 동시에 모델을 호출하는 상황을 재현
+    with ThreadPoolExecutor(max_workers=config.PIPELINE_CPU_WORKERS) as executor:
+        latencies = list(executor.map(run_batch, batch_texts))
+    results.put({"cores": len(cores), "elapsed": time.perf_counter() - started,
+                 "comments": sum(len(c) for c in batch_texts), "latencies": latencies})
+
+
+def _collect_sweep_results(processes, results, timeout: float) -> Optional[List[Dict[str, Any]]]:
+    """
+    워커마다 결과 하나씩 모읍니다. 워커가 비정상 종료하거나 timeout초 안에 끝나지 않으면 남은 워커를 정리하고 None.
+    (죽은 워커를 기다리며 results.get()에서 영원히 멈추거나, 남은 워커가 barrier에서 멈추는 것을 막음)
+    """
+    collected: List[Dict[str, Any]] = []
+    deadline = time.monotonic() + timeout
+    while len(collected) < len(processes):
+        try:
+            collected.append(results.get(timeout=1.0))
+            continue
+        except queue.Empty:
+            pass
+        crashed = [p for p in processes if p.exitcode not in (None, 0)]
+        finished_without_result = all(p.exitcode is not None for p in processes)
+        if crashed or finished_without_result or time.monotonic() > deadline:
+            reason = (f"워커 비정상 종료 (exitcode {[p.exitcode for p in crashed]})" if crashed
+                      else "시간 초과" if time.monotonic() > deadline else "결과 없이 종료")
+            print(f"⚠️ 측정 실패: {reason}")
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            return None
+    return collected
+
+
+def sweep(worker_options: List[int], thread_options: List[int], cores: int, texts: List[str], batches: int,
+          timeout: float = 600.0) -> List[Dict[str, Any]]:
+    import multiprocessing as mp
+
+    ctx = mp.get_context("spawn")  # torch/OpenMP 상태를 물려받지 않도록 spawn 사용
+    core_ids = available_cores()[:cores]
+    rows = []
+    for worker_count in worker_options:
+        for threads in thread_options:
+            if worker_count * threads > cores:
+                continue
+            barrier = ctx.Barrier(worker_count)
+            results = ctx.Queue()
+            processes = [
+                ctx.Process(target=_sweep_worker, args=(i, worker_count, core_ids, threads, texts, batches, barrier, results))
+                for i in range(worker_count)
+            ]
+            for process in processes:
+                process.start()
+            worker_results = _collect_sweep_results(processes, results, timeout)
+            for process in processes:
+                process.join()
+            if worker_results is None:
+                print(f"workers={worker_count} threads={threads}: 건너뜀")
+                continue
+
+            latencies = np.concatenate([r["latencies"] for r in worker_results])
+            wall = max(r["elapsed"] for r in worker_results)
+            rows.append({
+                "workers": worker_count,
+                "threads": threads,
+                "throughput": sum(r["comments"] for r in worker_results) / wall,
+                "p50_ms": float(np.percentile(latencies, 50) * 1000),
+                "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            })
+            print(f"workers={worker_count} threads={threads}: {rows[-1]['throughput']:.1f}댓글/초, "
+                  f"batch p50 {rows[-1]['p50_ms']:.0f}ms / p95 {rows[-1]['p95_ms']:.0f}ms")
+    return rows
+
+
+def recommend(rows: List[Dict[str, Any]], max_p95_ms: float) -> Optional[Dict[str, Any]]:
+    """p95 지연 한도 안에서 처리량이 가장 높은 배치. 한도를 만족하는 배치가 없으면 p95가 가장 낮은 배치."""
+    within = [r for r in rows if r["p95_ms"] <= max_p95_ms]
+    if within:
+        return max(within, key=lambda r: r["throughput"])
+    return min(rows, key=lambda r: r["p95_ms"], default=None)
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="CPU 스레드/워커 배치 sweep 벤치마크")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sweep_parser = sub.add_parser("sweep", help="워커 수 x 스레드 수 조합별 처리량/지연 측정 후 추천")
+    sweep_parser.add_argument("--cores", type=int, default=len(available_cores()), help="사용할 코어 수 (기본: 현재 사용 가능한 전부)")
+    sweep_parser.add_argument("--workers", default="1,2,4")
+    sweep_parser.add_argument("--threads", default="1,2,4")
+    sweep_parser.add_argument("--batches", type=int, default=20, help="워커당 측정할 KoELECTRA micro-batch 수")
+    sweep_parser.add_argument("--input", default=None, help="한 줄에 댓글 하나인 샘플 파일 (기본: 사전 CSV의 예시표현)")
+    sweep_parser.add_argument("--max-p95-ms", type=float, default=500.0, help="허용할 micro-batch p95 지연")
+    sweep_parser.add_argument("--timeout", type=float, default=600.0, help="조합 하나당 최대 측정 시간(초), 넘으면 건너뜀")
+    args = parser.parse_args()
+
+    texts = _load_sample_texts(args.input, limit=2000)
+    rows = sweep([int(w) for w in args.workers.split(",")], [int(t) for t in args.threads.split(",")],
+                 args.cores, texts, args.batches, args.timeout)
+    best = recommend(rows, args.max_p95_ms)
+    if best is None:
+        print("측정 가능한 조합이 없습니다 (workers x threads가 코어 수보다 큼).")
+        return
+    print(f"\n추천 배치 ({args.cores}코어, p95 ≤ {args.max_p95_ms:.0f}ms):")
+    print(f"  WORKER_COUNT={best['workers']} CPU_AFFINITY_ENABLED=True KOELECTRA_NUM_THREADS={best['threads']} "
+          f"EMBEDDING_NUM_THREADS={best['threads']}  (워커마다 WORKER_INDEX=0..{best['workers'] - 1})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# scheduler.py
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Deque, Dict, List, Optional
+
+import audit_log
+import config
+import llm_analyzer
+import pipeline
+from rate_governor import RateLimitShedError
+from text_normalizer import normalize_text
+from verdict_cache import VerdictCache
+
+logger = logging.getLogger(__name__)
+
+# 댓글별 우선순위 힌트 (크롬 확장이 보내는 값). 앞에 있을수록 먼저 처리됩니다.
+PRIORITY_VISIBLE = "visible"
+PRIORITY_PREFETCH = "prefetch"
+PRIORITY_ORDER = [PRIORITY_VISIBLE, PRIORITY_PREFETCH]
+
+
+class AnalysisJob:
+    """스케줄러를 통과하는 댓글 한 개 단위의 작업."""
+
+    def __init__(self, text: str, client_id: str, priority: str):
+        self.text = text
+        self.normalized_text = normalize_text(text) # 캐시 키와 KoELECTRA 입력에 함께 사용
+        self.client_id = client_id
+        self.priority = priority if priority in PRIORITY_ORDER else PRIORITY_VISIBLE
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+        self.koelectra: Optional[llm_analyzer.KoelectraScores] = None
+        self.speculation: Optional[Future] = None # KoELECTRA 전에 미리 보낸 LLM 호출 (SPECULATIVE_LLM_ENABLED일 때)
+
+
+class FairQueue:
+    """
+    우선순위 클래스 + 클라이언트별 가중 공정 큐.
+
+    높은 우선순위 클래스(visible)에 작업이 있으면 항상 먼저 꺼내고,
+    같은 클래스 안에서는 클라이언트마다 가상 시간(virtual time)을 두어
+    '처리한 작업 수 / 가중치'가 가장 작은 클라이언트부터 꺼냅니다.
+    한 클라이언트가 수백 개를 몰아 넣어도 다른 클라이언트의 작업이 사이사이 처리됩니다.
+    """
+
+    def __init__(self, client_weights: Optional[Dict[str, float]] = None):
+        self._client_weights = client_weights or {}
+        self._queues: Dict[str, Dict[str, Deque[AnalysisJob]]] = {p: {} for p in PRIORITY_ORDER}
+        self._vtime: Dict[str, float] = {} # 대기 중인 작업이 있는 클라이언트만 보관 (페이지마다 새 client_id가 생기므로)
+        self._floor = 0.0 # 마지막으로 꺼낸 작업의 가상 시간. 대기 중인 클라이언트가 없을 때 새 클라이언트의 시작점
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _weight(self, client_id: str) -> float:
+        return max(self._client_weights.get(client_id, 1.0), 1e-6)
+
+    def put(self, job: AnalysisJob) -> None:
+        with self._cond:
+            client_queues = self._queues[job.priority]
+            if job.client_id not in client_queues:
+                client_queues[job.client_id] = deque()
+            if job.client_id not in self._vtime:
+                # 새로 들어온(또는 한동안 쉬던) 클라이언트가 밀린 몫을 한꺼번에 쓰지 못하도록 현재 최소 가상 시간에서 시작
+                self._vtime[job.client_id] = min(self._vtime.values(), default=self._floor)
+            client_queues[job.client_id].append(job)
+            self._size += 1
+            self._cond.notify()
+
+    def _has_pending(self, client_id: str) -> bool:
+        return any(self._queues[p].get(client_id) for p in PRIORITY_ORDER)
+
+    def _pop_one(self) -> Optional[AnalysisJob]:
+        for priority in PRIORITY_ORDER:
+            client_queues = self._queues[priority]
+            candidates = [c for c, q in client_queues.items() if q]
+            if not candidates:
+                continue
+            client_id = min(candidates, key=self._vtime.__getitem__)
+            job = client_queues[client_id].popleft()
+            if not client_queues[client_id]:
+                del client_queues[client_id]
+            vtime = self._vtime[client_id]
+            self._floor = max(self._floor, vtime)
+            if self._has_pending(client_id):
+                self._vtime[client_id] = vtime + 1.0 / self._weight(client_id)
+            else:
+                del self._vtime[client_id]
+            self._size -= 1
+            return job
+        return None
+
+    def pop(self, max_items: int = 1, timeout: Optional[float] = None) -> List[AnalysisJob]:
+        """최대 max_items개를 스케줄 순서대로 꺼냅니다. 비어 있으면 timeout까지 기다립니다."""
+        with self._cond:
+            if self._size == 0:
+                self._cond.wait(timeout)
+            jobs = []
+            while len(jobs) < max_items:
+                job = self._pop_one()
+                if job is None:
+                    break
+                jobs.append(job)
+            return jobs
+
+    def wake_all(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+
+class AnalysisScheduler:
+    """
+    분석 파이프라인 앞단의 스케줄러.
+
+    1단계(KoELECTRA)는 공정 큐에서 micro-batch 단위로 꺼내 한 번에 분류하고,
+    LLM이 필요한 댓글은 2단계 공정 큐로 넘깁니다. 2단계는 같은 정책으로 꺼내 pipeline에 넘기며,
+    예시 검색은 pipeline의 CPU 스레드 풀에서, LLM 호출은 비동기로 최대 llm_workers개까지 동시에 진행됩니다.
+    """
+
+    def __init__(self,
+                 batch_size: int = config.KOELECTRA_BATCH_SIZE,
+                 llm_workers: int = config.LLM_WORKER_COUNT,
+                 client_weights: Optional[Dict[str, float]] = None,
+                 cache: Optional[VerdictCache] = None):
+        client_weights = client_weights if client_weights is not None else config.SCHEDULER_CLIENT_WEIGHTS
+        self.batch_size = batch_size
+        self.llm_workers = llm_workers
+        self.classify_queue = FairQueue(client_weights)
+        self.llm_queue = FairQueue(client_weights)
+        self.cache = cache if cache is not None else VerdictCache()
+        self.pipeline = pipeline.get_pipeline()
+        self.audit_log = audit_log.get_audit_log()
+        self._llm_slots = threading.BoundedSemaphore(llm_workers)
+        # 추측 호출은 _llm_slots를 거치지 않고 분류 전에 나가므로 별도 한도로 묶음 (한도가 차면 추측 없이 진행)
+        self._speculation_slots = threading.BoundedSemaphore(max(config.SPECULATIVE_LLM_MAX_IN_FLIGHT, 1))
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._classify_loop, name="scheduler-koelectra", daemon=True),
+            threading.Thread(target=self._llm_dispatch_loop, name="scheduler-llm-dispatch", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"AnalysisScheduler 시작: KoELECTRA batch={self.batch_size}, LLM 동시 처리={self.llm_workers}")
+
+    def stop(self) -> None:
+        self._running = False
+        self.classify_queue.wake_all()
+        self.llm_queue.wake_all()
+
+    def submit(self, text: str, client_id: str, priority: str = PRIORITY_VISIBLE) -> Future:
+        job = AnalysisJob(text, client_id, priority)
+        cached = self.cache.get(text)
+        if cached is not None:
+            # 사전 분석 등으로 이미 판정된 댓글은 큐를 거치지 않고 바로 완료
+            job.future.set_running_or_notify_cancel()
+            job.future.set_result(cached)
+            self._audit(job, audit_log.TIER_CACHE, cached)
+            return job.future
+        self.classify_queue.put(job)
+        return job.future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "classify_queue": len(self.classify_queue),
+            "llm_queue": len(self.llm_queue),
+            "cache": self.cache.stats(),
+            "pipeline": self.pipeline.stats(),
+            "audit_log": self.audit_log.stats() if self.audit_log is not None else None
+        }
+
+    def _complete(self, job: AnalysisJob, result: Dict[str, Any], tier: str) -> None:
+        self.cache.put(job.text, result)
+        job.future.set_result(result)
+        self._audit(job, tier, result)
+
+    def _fail(self, job: AnalysisJob, error: Exception, tier: str = audit_log.TIER_ERROR) -> None:
+        job.future.set_exception(error)
+        self._audit(job, tier)
+
+    def _audit(self, job: AnalysisJob, tier: str, result: Optional[Dict[str, Any]] = None) -> None:
+        if self.audit_log is not None:
+            probs = job.koelectra.probs_list() if job.koelectra is not None else None
+            self.audit_log.record(job.text, tier, result, probs=probs, latency=time.monotonic() - job.enqueued_at,
+                                  client_id=job.client_id, priority=job.priority)
+
+    def _classify_loop(self) -> None:
+        while self._running:
+            jobs = self.classify_queue.pop(self.batch_size, timeout=1.0)
+            # 취소된 작업(예: 사전 분석 취소)은 여기서 걸러냄
+            jobs = [job for job in jobs if job.future.set_running_or_notify_cancel()]
+            if not jobs:
+                continue
+            for job in jobs:
+                job.speculation = self._start_speculation(job)
+            try:
+                batch = llm_analyzer.classify_koelectra_batch(
+                    [job.text for job in jobs], [job.normalized_text for job in jobs]
+                )
+            except Exception as e:
+                logger.error(f"KoELECTRA micro-batch 처리 중 오류 ({len(jobs)}개): {e}", exc_info=True)
+                for job in jobs:
+                    self.pipeline.cancel_speculation(job.speculation)
+                    self._fail(job, e)
+                continue
+
+            # bypass 여부는 배치 전체에 대해 이미 계산되어 있음
+            for job, scores, bypass in zip(jobs, batch, batch.bypass_mask != 0):
+                job.koelectra = scores
+                if bypass:
+                    self.pipeline.cancel_speculation(job.speculation)
+                    self._complete(job, llm_analyzer.build_bypass_result(scores), audit_log.TIER_BYPASS)
+                else:
+                    self.llm_queue.put(job)
+
+    def _start_speculation(self, job: AnalysisJob) -> Optional[Future]:
+        """
+        화면에 보이는 댓글만 추측 호출합니다. 사전 분석 댓글까지 추측 호출하면 공정 큐/우선순위와 LLM_WORKER_COUNT를
+        건너뛴 호출이 OpenAI 한도를 먼저 써 버립니다.
+        """
+        if not self.pipeline.speculative or job.priority != PRIORITY_VISIBLE:
+            return None
+        if not self._speculation_slots.acquire(blocking=False):
+            return None
+        try:
+            return self.pipeline.start_speculation(job.text, on_finished=self._speculation_slots.release)
+        except Exception:
+            self._speculation_slots.release()
+            raise
+
+    def _llm_dispatch_loop(self) -> None:
+        while self._running:
+            # 동시 처리 자리가 날 때만 꺼내야 공정 큐의 순서가 실제 처리 순서가 됨
+            if not self._llm_slots.acquire(timeout=1.0):
+                continue
+            jobs = self.llm_queue.pop(1, timeout=1.0)
+            if not jobs:
+                self._llm_slots.release()
+                continue
+            job = jobs[0]
+            try:
+                llm_future = self.pipeline.submit_llm_stage(
+                    job.text,
+                    job.koelectra,
+                    low_priority=job.priority == PRIORITY_PREFETCH,
+                    speculation=job.speculation
+                )
+            except Exception as e:
+                self._llm_slots.release()
+                logger.error(f"LLM 단계 시작 중 오류 (client={job.client_id}): {e}", exc_info=True)
+                self._fail(job, e)
+                continue
+            llm_future.add_done_callback(lambda f, job=job: self._on_llm_done(job, f))
+
+    def _on_llm_done(self, job: AnalysisJob, llm_future: Future) -> None:
+        self._llm_slots.release()
+        try:
+            result = llm_future.result()
+            self._complete(job, result, audit_log.TIER_DEGRADED if result.get("degraded") else audit_log.TIER_LLM)
+        except RateLimitShedError as e:
+            # 사전 분석은 버려도 화면에 보일 때 다시 분석되므로 조용히 실패 처리
+            logger.info(f"낮은 우선순위 작업 버림 (client={job.client_id}): {e}")
+            self._fail(job, e, audit_log.TIER_SHED)
+        except Exception as e:
+            logger.error(f"LLM 단계 처리 중 오류 (client={job.client_id}): {e}", exc_info=True)
+            self._fail(job, e)
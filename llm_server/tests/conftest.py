@@ -0,0 +1,93 @@
+# conftest.py
+"""
+테스트 공통 설정.
+
+llm_server의 모듈은 `import config`처럼 평평하게 임포트하므로 llm_server 디렉터리를 경로에 추가합니다.
+torch/transformers/langchain/faiss/OpenAI SDK 등 무거운 의존성이 설치되지 않은 환경에서는
+임포트 시점에 필요한 이름만 가진 대역 모듈을 등록하여 모델 없이 도는 로직을 테스트할 수 있게 합니다.
+대역 객체를 실제로 사용(호출/생성)하면 바로 오류가 나므로 모델이 필요한 코드가 조용히 통과하지 않습니다.
+설치된 패키지는 그대로 사용합니다.
+"""
+import contextlib
+import importlib.util
+import sys
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _unavailable(qualname: str):
+    """임포트 시점에는 이름(기반 클래스, 타입 힌트)으로만 쓰이고, 사용하면 오류를 내는 대역 클래스."""
+
+    def __init__(self, *args, **kwargs):
+        raise RuntimeError(f"{qualname} 대역입니다 (테스트 환경에 패키지가 설치되지 않음)")
+
+    return type(qualname.rsplit(".", 1)[-1], (), {"__init__": __init__, "__module__": qualname.rsplit(".", 1)[0]})
+
+
+def _inert(qualname: str):
+    """모듈을 임포트할 때 바로 생성되는 객체(프롬프트 템플릿 등)용 대역. 인자만 받아 두고 아무것도 하지 않음."""
+
+    def __init__(self, *args, **kwargs):
+        self.args, self.kwargs = args, kwargs
+
+    return type(qualname.rsplit(".", 1)[-1], (), {"__init__": __init__, "__module__": qualname.rsplit(".", 1)[0]})
+
+
+def _stub(name: str, classes=(), inert=(), errors=(), **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    for cls in classes:
+        setattr(module, cls, _unavailable(f"{name}.{cls}"))
+    for cls in inert:
+        setattr(module, cls, _inert(f"{name}.{cls}"))
+    for error in errors:
+        setattr(module, error, type(error, (Exception,), {"__module__": name}))
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def _stub_if_missing(package: str, stub_modules) -> None:
+    if importlib.util.find_spec(package) is None:
+        stub_modules()
+
+
+def _stub_torch():
+    _stub("torch", cuda=types.SimpleNamespace(is_available=lambda: False), no_grad=contextlib.nullcontext,
+          get_num_threads=lambda: 1, set_num_threads=lambda n: None, set_num_interop_threads=lambda n: None)
+    _stub("torch.nn", classes=("Module", "Linear", "Dropout"))
+
+
+def _stub_langchain():
+    _stub("langchain_core")
+    _stub("langchain_core.embeddings", classes=("Embeddings",))
+    _stub("langchain_core.prompts", inert=("PromptTemplate",))
+    _stub("langchain_core.runnables", classes=("RunnablePassthrough", "RunnableLambda"))
+    _stub("langchain_core.documents", classes=("Document",))
+
+
+def _stub_langchain_community():
+    _stub("langchain_community")
+    _stub("langchain_community.vectorstores", classes=("FAISS",))
+    _stub("langchain_community.docstore")
+    _stub("langchain_community.docstore.in_memory", classes=("InMemoryDocstore",))
+    _stub("langchain_community.document_loaders", classes=("CSVLoader",))
+    _stub("langchain_community.embeddings", classes=("HuggingFaceEmbeddings",))
+
+
+_stub_if_missing("dotenv", lambda: _stub("dotenv", load_dotenv=lambda *args, **kwargs: False))
+_stub_if_missing("torch", _stub_torch)
+_stub_if_missing("faiss", lambda: _stub("faiss", classes=("Index",)))
+_stub_if_missing("transformers", lambda: _stub("transformers", classes=(
+    "ElectraModel", "ElectraTokenizer", "ElectraTokenizerFast", "PreTrainedTokenizerBase", "AutoModel", "AutoTokenizer")))
+_stub_if_missing("huggingface_hub", lambda: _stub("huggingface_hub", classes=("hf_hub_download",)))
+_stub_if_missing("langchain_core", _stub_langchain)
+_stub_if_missing("langchain_community", _stub_langchain_community)
+_stub_if_missing("langchain_openai", lambda: _stub("langchain_openai", classes=("ChatOpenAI",)))
+_stub_if_missing("httpx", lambda: _stub("httpx", classes=("Client", "AsyncClient", "Limits", "Timeout")))
+_stub_if_missing("openai", lambda: _stub("openai", errors=(
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError", "APIStatusError", "BadRequestError")))
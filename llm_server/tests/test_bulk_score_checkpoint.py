@@ -0,0 +1,83 @@
+# test_bulk_score_checkpoint.py
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import bulk_score
+
+
+def _bypass(texts):
+    return [{"classification": "혐오", "reason": "bypass", "tier": "bypass", "probs": None} for _ in texts]
+
+
+@pytest.fixture
+def bulk_args(tmp_path, monkeypatch):
+    """모델/워커 프로세스 없이 run()을 돌리도록 풀과 인덱스 준비, chunk 준비 단계를 바꿔 둠."""
+    monkeypatch.setattr(bulk_score, "ProcessPoolExecutor",
+                        lambda max_workers, initializer, initargs: ThreadPoolExecutor(max_workers))
+    monkeypatch.setattr(bulk_score.index_builder, "ensure_saved_index", lambda *args, **kwargs: True)
+    input_path = tmp_path / "comments.csv"
+    input_path.write_text("id,text\n" + "".join(f"c{i},댓글 {i}\n" for i in range(5)), encoding="utf-8")
+    args = argparse.Namespace(input=str(input_path), output=str(tmp_path / "results.jsonl"), text_column="text",
+                              id_column="id", checkpoint=None, chunk_size=2, workers=1, llm_concurrency=2, llm_window=3)
+    return args
+
+
+def _read_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["row"] for line in f]
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "ckpt.json")
+    assert bulk_score.load_checkpoint(path) == {"rows_done": 0, "output_bytes": 0}
+    bulk_score.save_checkpoint(path, 42, 1024)
+    assert bulk_score.load_checkpoint(path) == {"rows_done": 42, "output_bytes": 1024}
+
+
+def test_worker_failure_stops_and_resume_finishes(bulk_args, monkeypatch):
+    def broken_on_second_chunk(texts):
+        if "댓글 2" in texts:
+            raise BrokenProcessPool("worker died")
+        return _bypass(texts)
+
+    monkeypatch.setattr(bulk_score, "prepare_chunk", broken_on_second_chunk)
+    with pytest.raises(RuntimeError):
+        asyncio.run(bulk_score.run(bulk_args))
+    checkpoint = bulk_score.load_checkpoint(bulk_args.output + ".ckpt.json")
+    assert checkpoint["rows_done"] == 2  # 실패한 chunk 앞에서 멈춤
+    assert _read_rows(bulk_args.output) == [0, 1]
+
+    # 중단 직전에 쓰다 만 결과는 재개 시 잘라냄
+    with open(bulk_args.output, "a", encoding="utf-8") as f:
+        f.write('{"row": 2, "id": "c2"')
+
+    monkeypatch.setattr(bulk_score, "prepare_chunk", _bypass)
+    asyncio.run(bulk_score.run(bulk_args))
+    assert _read_rows(bulk_args.output) == [0, 1, 2, 3, 4]
+    assert bulk_score.load_checkpoint(bulk_args.output + ".ckpt.json")["rows_done"] == 5
+
+
+def test_llm_calls_overlap_across_chunks_and_rows_stay_ordered(bulk_args, monkeypatch):
+    bulk_args.llm_concurrency = 4
+    active = {"now": 0, "max": 0}
+
+    async def fake_ainvoke(prompt):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.05 if prompt == "댓글 0" else 0.01)  # 첫 chunk가 가장 늦게 끝남
+        active["now"] -= 1
+        return "[최종 분류]: 정상"
+
+    monkeypatch.setattr(bulk_score, "prepare_chunk",
+                        lambda texts: [{"prompt": t, "koelectra_output": "", "probs": None} for t in texts])
+    monkeypatch.setattr(bulk_score.llm_client, "ainvoke", fake_ainvoke)
+    monkeypatch.setattr(bulk_score.llm_analyzer, "build_llm_result",
+                        lambda text, raw, koelectra_output: {"classification": "정상", "reason": raw})
+    asyncio.run(bulk_score.run(bulk_args))
+    assert active["max"] > bulk_args.chunk_size  # chunk 경계에서 다음 chunk의 호출이 이미 진행 중
+    assert _read_rows(bulk_args.output) == [0, 1, 2, 3, 4]
@@ -0,0 +1,68 @@
+# test_circuit_breaker.py
+import pytest
+
+import llm_client
+from llm_client import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_client.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # 성공하면 연속 실패 수 초기화
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.is_open
+    assert not breaker.allow_request()
+
+
+def test_half_open_allows_single_trial_then_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    _open(breaker)
+    clock[0] += 30
+    assert not breaker.is_open
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()  # 시험 호출은 한 번만
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_half_open_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    _open(breaker)
+    clock[0] += 30
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    clock[0] += 29
+    assert not breaker.allow_request()
+    clock[0] += 1
+    assert breaker.allow_request()
+
+
+def test_release_trial_frees_half_open_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    _open(breaker)
+    clock[0] += 30
+    assert breaker.allow_request()
+    breaker.release_trial()
+    assert breaker.allow_request()
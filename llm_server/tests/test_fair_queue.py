@@ -0,0 +1,71 @@
+# test_fair_queue.py
+import pytest
+
+
+from scheduler import AnalysisJob, FairQueue, PRIORITY_PREFETCH, PRIORITY_VISIBLE
+
+
+def _put(queue, client_id, count, priority=PRIORITY_VISIBLE):
+    for i in range(count):
+        queue.put(AnalysisJob(f"{client_id}-{i}", client_id, priority))
+
+
+def _clients(jobs):
+    return [job.client_id for job in jobs]
+
+
+def test_visible_before_prefetch():
+    queue = FairQueue()
+    _put(queue, "a", 3, PRIORITY_PREFETCH)
+    _put(queue, "b", 2, PRIORITY_VISIBLE)
+    jobs = queue.pop(max_items=5)
+    assert [job.priority for job in jobs] == [PRIORITY_VISIBLE] * 2 + [PRIORITY_PREFETCH] * 3
+    assert len(queue) == 0
+
+
+def test_unknown_priority_treated_as_visible():
+    assert AnalysisJob("댓글", "a", "urgent").priority == PRIORITY_VISIBLE
+
+
+def test_clients_interleave_by_virtual_time():
+    queue = FairQueue()
+    _put(queue, "heavy", 6)
+    _put(queue, "light", 2)
+    assert _clients(queue.pop(max_items=8)) == ["heavy", "light", "heavy", "light", "heavy", "heavy", "heavy", "heavy"]
+
+
+def test_client_weights():
+    queue = FairQueue({"paid": 2.0})
+    _put(queue, "paid", 6)
+    _put(queue, "free", 6)
+    order = _clients(queue.pop(max_items=9))
+    assert order.count("paid") == 6
+    assert order.count("free") == 3
+
+
+def test_late_client_starts_at_current_virtual_time():
+    queue = FairQueue()
+    _put(queue, "a", 8)
+    assert _clients(queue.pop(max_items=4)) == ["a"] * 4
+    # 늦게 온 클라이언트가 a가 이미 처리한 몫만큼 몰아서 꺼내지 않아야 함
+    _put(queue, "b", 4)
+    order = _clients(queue.pop(max_items=4))
+    assert order.count("a") == 2
+    assert order.count("b") == 2
+
+
+def test_pop_empty_times_out():
+    assert FairQueue().pop(max_items=3, timeout=0.01) == []
+
+
+def test_idle_clients_are_forgotten():
+    queue = FairQueue()
+    for client_id in ("a", "b", "c"):
+        _put(queue, client_id, 2)
+    queue.pop(max_items=5)
+    assert list(queue._vtime) == ["c"]  # 대기 작업이 남은 클라이언트만 보관
+    queue.pop(max_items=1)
+    assert queue._vtime == {}
+    # 모두 비운 뒤 새로 온 클라이언트는 마지막으로 꺼낸 가상 시간에서 시작
+    _put(queue, "d", 1)
+    assert queue._vtime["d"] == queue._floor > 0
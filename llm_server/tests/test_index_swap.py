@@ -0,0 +1,67 @@
+# test_index_swap.py
+import os
+
+import pytest
+
+import config
+import index_builder
+import llm_analyzer
+
+
+def _write_version(path, content):
+    os.makedirs(path)
+    with open(os.path.join(path, "index.faiss"), "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def _read_current(target):
+    with open(os.path.join(target, "index.faiss"), encoding="utf-8") as f:
+        return f.read()
+
+
+def _staged(tmp_path, content):
+    path = str(tmp_path / f"staging-{content}")
+    _write_version(path, content)
+    return path
+
+
+@pytest.fixture
+def fake_save(monkeypatch):
+    monkeypatch.setattr(index_builder, "save_vectorstore", lambda vectorstore, path: _write_version(path, vectorstore))
+
+
+def test_swap_replaces_legacy_directory_and_previous_versions(tmp_path):
+    target = str(tmp_path / "faissDB")
+    _write_version(target, "legacy")
+    first = index_builder.swap_in_staging(_staged(tmp_path, "v1"), target)
+    assert os.path.islink(target)
+    assert _read_current(target) == "v1"
+    # 같은 초에 다시 교체해도 버전 디렉터리 이름이 겹치지 않음
+    second = index_builder.swap_in_staging(_staged(tmp_path, "v2"), target)
+    assert first != second
+    assert _read_current(target) == "v2"
+    assert not os.path.exists(first)  # 이전 버전은 정리됨
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(target), os.path.basename(second)]
+
+
+def test_publish_never_writes_through_the_link(tmp_path, fake_save):
+    target = str(tmp_path / "faissDB")
+    first = index_builder.publish_vectorstore("v1", target)
+    index_builder.publish_vectorstore("v2", target)
+    assert _read_current(target) == "v2"
+    assert not os.path.exists(first)
+    assert not [name for name in os.listdir(tmp_path) if "staging" in name]
+
+
+def test_reload_when_link_points_to_new_version(tmp_path, monkeypatch, fake_save):
+    target = str(tmp_path / "faissDB")
+    monkeypatch.setattr(config, "FAISS_SAVE_PATH", target)
+    monkeypatch.setattr(index_builder, "load_vectorstore", lambda path, embeddings_model: _read_current(path))
+    monkeypatch.setattr(llm_analyzer, "vectorstore", "v1")
+    monkeypatch.setattr(llm_analyzer, "vectorstore_dir", index_builder.publish_vectorstore("v1", target))
+    assert not llm_analyzer.reload_vectorstore_if_changed()
+
+    index_builder.publish_vectorstore("rebuilt", target)  # 다른 프로세스(rebuild)가 교체
+    assert llm_analyzer.reload_vectorstore_if_changed()
+    assert llm_analyzer.vectorstore == "rebuilt"
+    assert llm_analyzer.vectorstore_dir == index_builder.resolve_index_dir(target)
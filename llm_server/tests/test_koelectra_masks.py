@@ -0,0 +1,56 @@
+# test_koelectra_masks.py
+import numpy as np
+import pytest
+
+import config
+import llm_analyzer
+from llm_analyzer import KOELECTRA_LABEL_NAMES, KoelectraBatch, labels_from_mask
+
+LABEL_COUNT = len(KOELECTRA_LABEL_NAMES)
+
+
+def _probs(*rows):
+    probs = np.zeros((len(rows), LABEL_COUNT), dtype=np.float32)
+    for i, row in enumerate(rows):
+        for label, prob in row.items():
+            probs[i, KOELECTRA_LABEL_NAMES.index(label)] = prob
+    return probs
+
+
+@pytest.mark.parametrize("mask", [0, 1, 0b1001, (1 << LABEL_COUNT) - 1])
+def test_label_mask_round_trip(mask):
+    probs = np.array([[0.9 if mask >> bit & 1 else 0.1 for bit in range(LABEL_COUNT)]], dtype=np.float32)
+    batch = KoelectraBatch(["댓글"], probs)
+    assert batch[0].label_mask == mask
+    assert sum(1 << KOELECTRA_LABEL_NAMES.index(label) for label in labels_from_mask(mask)) == mask
+
+
+def test_label_and_bypass_masks_per_row():
+    high = config.KOELECTRA_BYPASS_THRESHOLD
+    batch = KoelectraBatch(["정상", "욕설", "확실한 혐오"], _probs(
+        {},
+        {"욕설": 0.5},
+        {"욕설": high, "인종차별": 0.6},
+    ))
+    assert [labels_from_mask(s.label_mask) for s in batch] == [[], ["욕설"], ["욕설", "인종차별"]]
+    assert [labels_from_mask(int(m)) for m in batch.bypass_mask] == [[], [], ["욕설"]]
+    assert [s.bypass for s in batch] == [False, False, True]
+    assert [s.include_koelectra for s in batch] == [False, True, True]
+    assert batch[1].summary() == "혐오 탐지됨! 속성: 욕설"
+    assert batch[0].output() == batch[0].summary()  # 프롬프트에 넣지 않으면 한 줄 요약만
+
+
+def test_not_loaded_never_bypasses():
+    batch = KoelectraBatch(["a", "b"], None)
+    assert not batch.loaded
+    assert list(batch.bypass_mask) == [0, 0]
+    assert not any(s.include_koelectra for s in batch)
+    assert batch[0].probs_list() is None
+    assert llm_analyzer.build_bypass_result(batch[0]) is None
+
+
+def test_context_built_once():
+    batch = KoelectraBatch(["혐오 댓글"], _probs({"욕설": 0.5}))
+    context = batch[0].context()
+    assert '입력 문장: "혐오 댓글"' in context
+    assert batch[0].context() is context
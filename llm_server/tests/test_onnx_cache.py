@@ -0,0 +1,48 @@
+# test_onnx_cache.py
+import os
+
+import pytest
+
+import config
+import embeddings_backend
+
+
+class FakeORTModel:
+    """export 횟수를 세는 ORTModelForFeatureExtraction 대역."""
+
+    exports = 0
+
+    def __init__(self, source):
+        self.source = source
+
+    @classmethod
+    def from_pretrained(cls, name_or_path, export=False, session_options=None):
+        if export:
+            cls.exports += 1
+        return cls(name_or_path)
+
+    def save_pretrained(self, path):
+        os.makedirs(path)
+        open(os.path.join(path, "model.onnx"), "w").close()
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ONNX_CACHE_DIR", str(tmp_path))
+    FakeORTModel.exports = 0
+
+
+def test_export_once_and_reuse():
+    first = embeddings_backend._load_onnx_model(FakeORTModel, "org/model", None)
+    second = embeddings_backend._load_onnx_model(FakeORTModel, "org/model", None)
+    assert FakeORTModel.exports == 1
+    assert first.source == second.source == embeddings_backend.onnx_export_dir("org/model")
+
+
+def test_cache_key_does_not_depend_on_output_dim(monkeypatch):
+    # 차원 축소는 추론 뒤에 하므로 EMBEDDING_DIM을 바꿔도 같은 export를 씀
+    for dim in (0, 256, 128):
+        monkeypatch.setattr(config, "EMBEDDING_DIM", dim)
+        embeddings_backend._load_onnx_model(FakeORTModel, "org/model", None)
+    assert FakeORTModel.exports == 1
+    assert not [name for name in os.listdir(config.ONNX_CACHE_DIR) if ".tmp-" in name]
@@ -0,0 +1,94 @@
+# test_prefetch.py
+from concurrent.futures import Future
+
+import pytest
+
+import config
+from prefetch import PrefetchManager, PrefetchQuotaError
+from scheduler import PRIORITY_PREFETCH
+
+
+class FakeScheduler:
+    """제출된 댓글마다 대기 중인 Future를 돌려주는 스케줄러 대역."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, text, client_id, priority):
+        future = Future()
+        self.submitted.append((text, client_id, priority, future))
+        return future
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(config, "PREFETCH_MAX_COMMENTS_PER_VIDEO", 3)
+    monkeypatch.setattr(config, "PREFETCH_MAX_ACTIVE_JOBS_PER_CLIENT", 5)
+    return PrefetchManager(FakeScheduler())
+
+
+def test_submits_with_prefetch_priority(manager):
+    job = manager.submit("client", "video", ["a", "b"])
+    assert [(t, c, p) for t, c, p, _ in manager.scheduler.submitted] == [
+        ("a", "client", PRIORITY_PREFETCH), ("b", "client", PRIORITY_PREFETCH)
+    ]
+    assert job.to_dict()["pending"] == 2
+
+
+def test_quota_is_per_client_and_video(manager):
+    job = manager.submit("client", "video", ["a", "b"])
+    with pytest.raises(PrefetchQuotaError):
+        manager.submit("client", "video", ["c", "d"], job_id=job.job_id)
+    # 새 작업을 만들어도 같은 영상의 한도를 함께 씀
+    with pytest.raises(PrefetchQuotaError):
+        manager.submit("client", "video", ["c", "d"])
+    manager.submit("client", "video", ["c"], job_id=job.job_id)
+    manager.submit("client", "other-video", ["a", "b", "c"])
+    manager.submit("other-client", "video", ["a", "b", "c"])
+    assert job.total == 3
+
+
+def test_quota_resets_after_window(manager, monkeypatch):
+    import prefetch
+
+    now = [1000.0]
+    monkeypatch.setattr(prefetch.time, "time", lambda: now[0])
+    monkeypatch.setattr(config, "PREFETCH_VIDEO_QUOTA_WINDOW_SECONDS", 60)
+    manager.submit("client", "video", ["a", "b", "c"])
+    with pytest.raises(PrefetchQuotaError):
+        manager.submit("client", "video", ["d"])
+    now[0] += 61
+    manager.submit("client", "video", ["d"])
+
+
+def test_progress_and_completion(manager):
+    job = manager.submit("client", "video", ["a", "b"])
+    first, second = (future for *_, future in manager.scheduler.submitted)
+    first.set_result({"classification": "정상"})
+    assert job.status == "running"
+    second.set_result({"classification": "오류"})
+    assert (job.done, job.failed, job.status) == (1, 1, "completed")
+    assert job.finished_at is not None
+
+
+def test_empty_job_finishes_immediately(manager):
+    job = manager.submit("client", "video", [])
+    assert job.status == "completed"
+    assert job.finished_at is not None
+
+
+def test_cancel_pending_comments(manager):
+    job = manager.submit("client", "video", ["a", "b"])
+    assert manager.cancel(job.job_id, "other-client") is None
+    assert manager.cancel(job.job_id, "client") is job
+    assert job.status == "cancelled"
+    assert all(future.cancelled() for future in job.futures)
+    assert job.finished_at is not None
+    with pytest.raises(PrefetchQuotaError):
+        manager.submit("client", "video", ["c"], job_id=job.job_id)
+
+
+def test_next_page_requires_owner(manager):
+    job = manager.submit("client", "video", ["a"])
+    with pytest.raises(KeyError):
+        manager.submit("other-client", "video", ["b"], job_id=job.job_id)
@@ -0,0 +1,107 @@
+# test_rate_governor.py
+import sqlite3
+
+import pytest
+
+import config
+import rate_governor
+from rate_governor import RateGovernor, RateLimitShedError, RateLimitTimeoutError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_governor.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def governor(tmp_path, clock):
+    # 버킷 용량은 분당 한도: 요청 2건, 토큰 600개 (초당 요청 1/30건, 토큰 10개씩 채워짐)
+    return RateGovernor(str(tmp_path / "rate_governor.db"), rpm_limit=2, tpm_limit=600)
+
+
+def test_request_bucket_refill(governor, clock):
+    assert governor._try_take(10) == 0
+    assert governor._try_take(10) == 0
+    assert governor._try_take(10) == pytest.approx(30.0)
+    clock[0] += 15
+    assert governor._try_take(10) == pytest.approx(15.0)
+    clock[0] += 15
+    assert governor._try_take(10) == 0
+
+
+def test_token_bucket_refill_and_refund(governor, clock):
+    assert governor._try_take(500) == 0
+    assert governor._try_take(300) == pytest.approx(20.0)  # 100개 남음, 200개 더 필요
+    clock[0] += 20
+    assert governor._try_take(300) == 0
+    governor.refund(250)
+    # 토큰은 돌려받아 충분하고, 요청 버킷(2/3건 남음)만 1건이 될 때까지 기다림
+    assert governor._try_take(250) == pytest.approx(10.0)
+    clock[0] += 11
+    assert governor._try_take(250) == 0
+
+
+def test_state_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / "rate_governor.db")
+    first = RateGovernor(path, rpm_limit=2, tpm_limit=600)
+    second = RateGovernor(path, rpm_limit=2, tpm_limit=600)
+    assert first._try_take(10) == 0
+    assert second._try_take(10) == 0
+    assert first._try_take(10) > 0
+
+
+def test_low_priority_is_shed(governor, monkeypatch):
+    monkeypatch.setattr(config, "RATE_GOVERNOR_SHED_WAIT_SECONDS", 2)
+    governor.acquire(10)
+    governor.acquire(10)
+    with pytest.raises(RateLimitShedError):
+        governor.acquire(10, low_priority=True)
+
+
+def test_wait_beyond_max_wait_times_out(governor):
+    governor.acquire(10)
+    governor.acquire(10)
+    with pytest.raises(RateLimitTimeoutError):
+        governor.acquire(10, max_wait=5)
+
+
+def test_cost_above_limit_is_capped(governor):
+    # 한도보다 큰 요청은 영원히 기다리지 않도록 한도만큼만 차감
+    assert governor.acquire(10_000, max_wait=0) >= 0
+
+
+def _locked_then(governor, monkeypatch, failures):
+    real_try_take = governor._try_take
+    calls = {"count": 0}
+
+    def flaky_try_take(token_cost):
+        calls["count"] += 1
+        if failures is None or calls["count"] <= failures:
+            raise sqlite3.OperationalError("database is locked")
+        return real_try_take(token_cost)
+
+    monkeypatch.setattr(governor, "_try_take", flaky_try_take)
+    return calls
+
+
+def test_lock_contention_is_retried(governor, monkeypatch):
+    calls = _locked_then(governor, monkeypatch, failures=2)
+    assert governor.acquire(10, max_wait=5) >= 0
+    assert calls["count"] == 3
+
+
+def test_persistent_lock_times_out(governor, monkeypatch):
+    _locked_then(governor, monkeypatch, failures=None)
+    with pytest.raises(RateLimitTimeoutError):
+        governor.acquire(10, max_wait=0.3)
+
+
+def test_refund_skipped_when_locked(governor, monkeypatch):
+    class LockedConnection:
+        def execute(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(governor, "_thread_connection", lambda: LockedConnection())
+    governor.refund(100)  # 오류 없이 건너뜀
@@ -0,0 +1,40 @@
+# test_text_normalizer.py
+import pytest
+
+import config
+from text_normalizer import normalize_text
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    normalize_text.cache_clear()
+    yield
+    normalize_text.cache_clear()
+
+
+def test_repeated_jamo_keeps_compatibility_jamo():
+    normalized = normalize_text("ㅋㅋㅋㅋㅋ 진짜 웃기네ㅎㅎㅎ")
+    assert normalized == "ㅋㅋ 진짜 웃기네ㅎㅎ"
+    # NFKC를 그대로 적용하면 'ㅋ'(U+314B)이 조합용 자모 U+110F로 바뀜
+    assert "ㅋ" in normalized
+    assert "ᄏ" not in normalized
+
+
+def test_full_width_and_invisible_characters():
+    assert normalize_text("ＡＢＣ１２３") == "ABC123"
+    assert normalize_text("바​보") == "바보"
+    assert normalize_text("﻿  너무   하네  ") == "너무 하네"
+
+
+def test_emoji_and_repeated_punctuation():
+    assert normalize_text("좋아요😀👍🏻!!!!") == "좋아요 !!"
+    assert normalize_text("진짜???") == "진짜??"
+
+
+def test_emoji_only_falls_back_to_original():
+    assert normalize_text(" 😀😀 ") == "😀😀"
+
+
+def test_disabled_only_strips(monkeypatch):
+    monkeypatch.setattr(config, "TEXT_NORMALIZATION_ENABLED", False)
+    assert normalize_text(" ㅋㅋㅋㅋ😀 ") == "ㅋㅋㅋㅋ😀"
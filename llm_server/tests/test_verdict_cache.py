@@ -0,0 +1,54 @@
+# test_verdict_cache.py
+import pytest
+
+import verdict_cache
+from verdict_cache import VerdictCache, make_cache_key
+
+HATE = {"classification": "혐오", "reason": "욕설"}
+NORMAL = {"classification": "정상", "reason": "문제 없음"}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(verdict_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_normalized_variants_share_key():
+    assert make_cache_key("웃기네ㅋㅋㅋㅋ😀") == make_cache_key("웃기네ㅋㅋ")
+
+
+def test_ttl_expiry(clock):
+    cache = VerdictCache(max_size=10, ttl_seconds=60)
+    cache.put("댓글", HATE)
+    clock[0] += 59
+    assert cache.get("댓글") == HATE
+    clock[0] += 2
+    assert cache.get("댓글") is None
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 1}
+
+
+def test_lru_eviction_keeps_recently_used(clock):
+    cache = VerdictCache(max_size=2, ttl_seconds=60)
+    cache.put("a", HATE)
+    cache.put("b", NORMAL)
+    assert cache.get("a") == HATE  # a를 최근 사용으로 갱신
+    cache.put("c", NORMAL)
+    assert cache.get("b") is None
+    assert cache.get("a") == HATE
+    assert cache.get("c") == NORMAL
+
+
+def test_degraded_and_error_results_not_cached(clock):
+    cache = VerdictCache(max_size=10, ttl_seconds=60)
+    cache.put("a", {**HATE, "degraded": True})
+    cache.put("b", {"classification": "오류", "reason": "LLM 오류"})
+    assert cache.stats()["size"] == 0
+
+
+def test_get_returns_copy(clock):
+    cache = VerdictCache(max_size=10, ttl_seconds=60)
+    cache.put("a", HATE)
+    cache.get("a")["classification"] = "정상"
+    assert cache.get("a") == HATE
@@ -0,0 +1,55 @@
+# text_normalizer.py
+"""
+분석 파이프라인 맨 앞에서 한 번만 적용하는 한국어 댓글 정규화.
+
+정규화한 텍스트는 KoELECTRA 입력, 판정 캐시 키, 사전 예시 검색에 공통으로 쓰이고,
+LLM 프롬프트와 응답에는 원문을 그대로 사용합니다.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+import config
+
+# 한글 호환 자모(ㄱ~ㆎ). NFKC를 그대로 적용하면 'ㅋ'이 조합용 자모(U+110F)로 바뀌어 토큰화가 달라지므로 제외
+_COMPAT_JAMO = "\u3131-\u318e"
+_NON_JAMO_RUN = re.compile(f"[^{_COMPAT_JAMO}]+")
+
+# zero-width 문자, soft hyphen, BOM 등 보이지 않는 문자 (필터 우회에 자주 쓰임)
+_INVISIBLE = re.compile("[\u00ad\u180e\u200b-\u200f\u202a-\u202e\u2060-\u2064\ufeff]")
+
+# 이모지와 관련 수식 문자 (variation selector, 피부색, 태그 문자 포함)
+_EMOJI = re.compile(
+    "["
+    "\U0001f000-\U0001faff"
+    "\u2600-\u27bf"
+    "\u2b00-\u2bff"
+    "\ufe0e\ufe0f"
+    "\U000e0020-\U000e007f"
+    "]+"
+)
+
+# ㅋㅋㅋㅋ, ㅎㅎㅎ, ㅠㅠㅠ 등 3번 이상 반복은 2번으로
+_REPEATED_JAMO = re.compile("([ㅋㅎㅠㅜㄷㄱ])\\1{2,}")
+_REPEATED_PUNCT = re.compile("([!?.~])\\1{2,}")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _nfkc_keep_jamo(text: str) -> str:
+    # 전각 문자/호환 문자는 NFKC로 펴되, 호환 자모는 건드리지 않음
+    return _NON_JAMO_RUN.sub(lambda m: unicodedata.normalize("NFKC", m.group()), unicodedata.normalize("NFC", text))
+
+
+@lru_cache(maxsize=config.TEXT_NORMALIZE_CACHE_SIZE)
+def normalize_text(text: str) -> str:
+    """댓글 텍스트를 정규화합니다. 같은 입력에 여러 번 불려도 한 번만 계산합니다."""
+    if not config.TEXT_NORMALIZATION_ENABLED:
+        return text.strip()
+    normalized = _nfkc_keep_jamo(text)
+    normalized = _INVISIBLE.sub("", normalized)
+    normalized = _EMOJI.sub(" ", normalized)
+    normalized = _REPEATED_JAMO.sub(r"\1\1", normalized)
+    normalized = _REPEATED_PUNCT.sub(r"\1\1", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    # 이모지만 있는 댓글처럼 정규화 후 비어 버리면 원문을 사용
+    return normalized or text.strip()
@@ -2,12 +2,13 @@ import logging
 import csv
 import os
 from typing import List, Dict, Optional
-from langchain_openai import ChatOpenAI
 from langchain_core.documents import Document # VectorDB 업데이트를 위해 필요
 
 # 필요한 모듈 및 설정값 import
 import config
-import llm_analyzer # LLM 모델(chat_openai_model)과 vectorstore, embeddings_model 접근
+import llm_analyzer # vectorstore, embeddings_model 접근
+import llm_client # 공유 OpenAI 클라이언트 (연결 풀, 재시도, 회로 차단기)
+import index_builder # 인덱스 저장 시 index_meta.json도 함께 갱신
 from db import get_reason_list_for_word, erase_db # DB 함수 접근
 
 logger = logging.getLogger(__name__)
@@ -17,9 +18,9 @@ def generate_csv_entry_from_report(word: str, reasons: List[str]) -> Optional[Di
     """
     GPT-4.1 api를  사용하여 신고된 단어와 사유들을 기반으로 CSV에 추가할 새로운 항목을 생성합니다.
     """
-    #GPT-4.1 모델 사용 (llm_analyzer와 독립)
+    #GPT-4.1 모델 사용 (llm_analyzer와 다른 설정이지만 연결 풀은 공유)
     try:
-        definition_gen_model = ChatOpenAI(model="gpt-4.1", temperature=0.3)
+        definition_gen_model = llm_client.get_chat_model(model_name="gpt-4.1", temperature=0.3, max_tokens=None, top_p=None)
     except Exception as e:
         logger.error("모델 초기화 실패", exc_info=True)
         return None
@@ -53,9 +54,7 @@ CSV 형식의 데이터를 한 줄 생성해주세요.
     logger.debug(f"프롬프트:\n{prompt_str}")
 
     try:
-        response = definition_gen_model.invoke(prompt_str)
-        generated_csv_line = response.content if hasattr(response, 'content') else str(response)
-        generated_csv_line = generated_csv_line.strip()
+        generated_csv_line = llm_client.invoke(prompt_str, model=definition_gen_model).strip()
         logger.info(f"응답 (단어: {word}): {generated_csv_line}")
 
         # --- 여기를 수정합니다 ---
@@ -84,6 +83,16 @@ CSV 형식의 데이터를 한 줄 생성해주세요.
         logger.error(f"LLM 호출 또는 파싱 중 오류 (단어: {word})", exc_info=True)
         return None
     
+def expression_exists_in_csv(word: str, csv_filepath: str) -> bool:
+    """CSV에 같은 예시표현이 이미 있는지 확인합니다 (같은 단어가 여러 번 추가되는 것을 방지)."""
+    if not os.path.exists(csv_filepath):
+        return False
+    with open(csv_filepath, newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            if (row.get("예시표현") or "").strip() == word.strip():
+                return True
+    return False
+
 def append_to_csv(new_entry: Dict[str, str], csv_filepath: str) -> bool:
     """
     주어진 항목을 CSV 파일에 추가합니다.
@@ -120,7 +129,9 @@ def update_faiss_vectorstore(new_entry: Dict[str, str]) -> bool:
         return False
 
     try:
-        page_content = new_entry.get(config.CONTENT_COLUMN_NAME, new_entry.get("예시표현"))
+        expression = new_entry.get(config.CONTENT_COLUMN_NAME, new_entry.get("예시표현"))
+        # CSVLoader로 만든 문서와 같은 "예시표현: xxx" 형식으로 저장 (재생성/비교 시 내용이 일치하도록)
+        page_content = f"{config.CONTENT_COLUMN_NAME}: {expression}"
         metadata = {
             k: v for k, v in new_entry.items() 
             if k in config.METADATA_COLUMN_NAMES or k in ["범주", "간략 정의/맥락", "label"]
@@ -133,15 +144,13 @@ def update_faiss_vectorstore(new_entry: Dict[str, str]) -> bool:
         new_doc = Document(page_content=page_content, metadata=metadata)
         
         logger.info(f"VectorDB에 새 문서 추가 시도: {new_doc}")
-        llm_analyzer.vectorstore.add_documents([new_doc]) # llm_analyzer의 vectorstore 사용
-        llm_analyzer.vectorstore.save_local(config.FAISS_SAVE_PATH) # llm_analyzer의 vectorstore 사용
+        with index_builder.index_write_lock(config.FAISS_SAVE_PATH):
+            # 이 프로세스가 읽은 뒤 인덱스가 재생성/교체되었으면 새 버전에 추가해야 오래된 인덱스로 덮어쓰지 않음
+            llm_analyzer.reload_vectorstore_if_changed()
+            llm_analyzer.vectorstore.add_documents([new_doc]) # llm_analyzer의 vectorstore 사용
+            # 링크가 가리키는 현재 버전을 제자리에서 고치지 않고 새 버전으로 저장한 뒤 교체
+            llm_analyzer.vectorstore_dir = index_builder.publish_vectorstore(llm_analyzer.vectorstore, config.FAISS_SAVE_PATH)
         logger.info(f"VectorDB 업데이트 완료 및 '{config.FAISS_SAVE_PATH}'에 저장됨.")
-        
-        # 중요: llm_analyzer.vectorstore가 변경되었으므로, 만약 다른 곳에서 이 객체를 직접 참조한다면
-        # save_local 이후에 llm_analyzer.vectorstore = FAISS.load_local(...) 등으로
-        # llm_analyzer 모듈 내의 전역 변수 자체를 업데이트 해줘야 할 수 있습니다.
-        # 현재는 add_documents가 in-memory 객체를 변경하고 save_local이 디스크에 반영하므로,
-        # 다음 initialize_llm_components 호출 전까지는 현재 Flask 프로세스 내에서는 반영된 상태입니다.
 
         return True
     except Exception as e:
@@ -159,6 +168,12 @@ def process_triggered_report(word: str):
         logger.error(f"단어 '{word}'의 신고 사유를 가져오는 데 실패했습니다.")
         return False # 처리 실패
 
+    # 이미 사전에 있는 단어는 다시 추가하지 않고 신고 기록만 정리
+    if expression_exists_in_csv(word, config.CSV_FILE_PATH):
+        logger.info(f"단어 '{word}'는 이미 CSV에 있습니다. 추가하지 않고 신고 기록만 삭제합니다.")
+        erase_db(word)
+        return True
+
     # 1. LLM을 통해 새로운 CSV 항목 생성
     new_entry_dict = generate_csv_entry_from_report(word, reasons_list)
     if not new_entry_dict:
@@ -167,15 +182,21 @@ def process_triggered_report(word: str):
 
     logger.info(f"LLM으로부터 생성된 새 항목 (단어: {word}): {new_entry_dict}")
     
-    # 2. mz_hate_speech.csv 파일에 추가
+    # 2. mz_hate_speech.csv 파일에 추가 (VectorDB 업데이트 실패 시 되돌리기 위해 기존 크기를 기억)
+    csv_size_before = os.path.getsize(config.CSV_FILE_PATH) if os.path.exists(config.CSV_FILE_PATH) else 0
     if not append_to_csv(new_entry_dict, config.CSV_FILE_PATH):
         logger.error(f"CSV 파일 업데이트 실패 (단어: {word}). 처리 중단.")
         return False # 처리 실패
     
     # 3. VectorDB 업데이트
     if not update_faiss_vectorstore(new_entry_dict):
-        logger.error(f"VectorDB 업데이트 실패 (단어: {word}). CSV는 추가되었으나 DB는 이전 상태일 수 있음. 처리 중단.")
-        # 심각한 오류: 데이터 불일치 가능성. 롤백 또는 관리자 알림 필요.
+        logger.error(f"VectorDB 업데이트 실패 (단어: {word}). CSV에 추가한 줄을 되돌리고 처리 중단.")
+        # CSV와 인덱스가 어긋나지 않도록 추가한 줄을 잘라냄. 그래도 어긋났다면 check_vectorDB.py diff/rebuild로 복구
+        try:
+            with open(config.CSV_FILE_PATH, 'r+b') as csvfile:
+                csvfile.truncate(csv_size_before)
+        except Exception as e:
+            logger.error(f"CSV 롤백 실패 (단어: {word}): {e}", exc_info=True)
         return False # 처리 실패
         
     # 4. DB에서 해당 단어의 신고 기록 삭제
@@ -0,0 +1,61 @@
+# verdict_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import config
+from text_normalizer import normalize_text
+
+# 캐시에 저장할 수 있는 (재사용해도 되는) 분류 결과
+CACHEABLE_CLASSIFICATIONS = ("혐오", "정상")
+
+
+def make_cache_key(text: str) -> str:
+    # 이모지/ㅋㅋ 반복/공백만 다른 댓글도 같은 판정을 재사용하도록 정규화된 텍스트로 키를 만듦
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """정규화된 댓글 텍스트 해시 → 판정 결과를 보관하는 스레드 안전 LRU + TTL 캐시."""
+
+    def __init__(self, max_size: int = config.VERDICT_CACHE_SIZE, ttl_seconds: float = config.VERDICT_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str) -> Optional[Dict[str, Any]]:
+        key = make_cache_key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, text: str, result: Dict[str, Any]) -> None:
+        # degraded(간이) 판정은 LLM이 복구되면 다시 받아야 하므로 캐시하지 않음
+        if result.get("classification") not in CACHEABLE_CLASSIFICATIONS or result.get("degraded"):
+            return
+        key = make_cache_key(text)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}